@@ -40,6 +40,7 @@ async def main(
             query = accounts.delete_oauth(session.sonolus_id, "discord")
             async with app.db_acquire() as conn:
                 await conn.execute(query)
+            app.session_cache.invalidate_account(session.sonolus_id)
             return JSONResponse(content={}, status_code=403)
         token = refreshed
     else:
@@ -51,6 +52,7 @@ async def main(
         query = accounts.delete_oauth(session.sonolus_id, "discord")
         async with app.db_acquire() as conn:
             await conn.execute(query)
+        app.session_cache.invalidate_account(session.sonolus_id)
         return JSONResponse(content={}, status_code=403)
     user_data = await user_resp.json()
 
@@ -101,5 +103,7 @@ async def refresh_discord_token(sonolus_id: str, oauth: dict, app: ChartFastAPI)
     pool = app.db
     async with pool.acquire() as conn:
         await conn.execute(query)
+    # or the next request reads the old, now revoked, token from the cache
+    app.session_cache.invalidate_account(sonolus_id)
 
     return refreshed
@@ -6,6 +6,7 @@ from fastapi import APIRouter, Request, HTTPException, status, Query
 
 from database import accounts, charts
 from helpers.session import get_session, Session
+from helpers.responses import FastJSONResponse
 from helpers.models import NotificationRequest, Notification, ReadUpdate
 
 router = APIRouter()
@@ -35,7 +36,7 @@ async def main(
     )
     for notif in notifs:
         notif["timestamp"] = int(notif["created_at"].timestamp() * 1000)
-    return {"notifications": notifs}
+    return FastJSONResponse({"notifications": notifs})
 
 
 @router.post("/")
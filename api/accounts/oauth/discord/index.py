@@ -73,6 +73,8 @@ async def auth_discord(
         "discord",
     )
     await app.db.execute(query)
+    # oauth_details is part of the cached session account
+    app.session_cache.invalidate_account(sonolus_id)
     query = accounts.link_discord_id(sonolus_id, discord_id=user_data["id"])
 
     return JSONResponse({"user": user_data, "guilds": guilds_data, "token": token})
@@ -7,6 +7,7 @@ from fastapi import APIRouter, Request, HTTPException, status
 from database import accounts, external
 
 from helpers.models import ExternalServiceUserProfileWithType
+from helpers.shared_cache import account_tag
 
 router = APIRouter()
 
@@ -42,6 +43,7 @@ async def main(request: Request, data: ExternalServiceUserProfileWithType):
     ).hexdigest()
     session_key = f"{encoded_key}.{signature}"
     account_query, query = accounts.create_account_if_not_exists_and_new_session(
+        session_key_data["id"],
         session_key,
         data.id,
         int(data.handle),
@@ -56,6 +58,10 @@ async def main(request: Request, data: ExternalServiceUserProfileWithType):
         await conn.execute(query2)
         result = await conn.fetchrow(query)
         if result:
+            # issuing a session can evict an older one from its slot
+            app.session_cache.invalidate_account(data.id)
+            # the username is refreshed from the profile too
+            await app.cache.invalidate(account_tag(data.id))
             return {"session": result.session_key, "expiry": int(result.expires)}
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
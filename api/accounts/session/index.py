@@ -7,6 +7,7 @@ from fastapi import APIRouter, Request, HTTPException, status
 from database import accounts
 
 from helpers.models import ServiceUserProfileWithType
+from helpers.shared_cache import account_tag
 
 router = APIRouter()
 
@@ -41,13 +42,22 @@ async def main(request: Request, data: ServiceUserProfileWithType):
     ).hexdigest()
     session_key = f"{encoded_key}.{signature}"
     account_query, query = accounts.create_account_if_not_exists_and_new_session(
-        session_key, data.id, int(data.handle), data.name, data.type
+        session_key_data["id"],
+        session_key,
+        data.id,
+        int(data.handle),
+        data.name,
+        data.type,
     )
 
     async with app.db_acquire() as conn:
         await conn.execute(account_query)
         result = await conn.fetchrow(query)
         if result:
+            # issuing a session can evict an older one from its slot
+            app.session_cache.invalidate_account(data.id)
+            # the username is refreshed from the profile too
+            await app.cache.invalidate(account_tag(data.id))
             return {"session": result.session_key, "expiry": int(result.expires)}
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -10,7 +10,8 @@ from helpers.session import get_session, Session
 from helpers.hashing import calculate_sha256
 from helpers.constants import MAX_FILE_SIZES
 
-from PIL import Image
+from helpers.images import convert_images
+from helpers.shared_cache import account_tag
 import io
 
 router = APIRouter()
@@ -32,6 +33,9 @@ async def main_delete(request: Request, id: str):
 
     async with app.db_acquire() as conn:
         await conn.execute(query)
+    app.session_cache.invalidate_account(id)
+    await app.cache.invalidate(account_tag(id))
+    app.count_cache.clear()
 
     return {"result": "success"}
 
@@ -104,6 +108,8 @@ async def delete_profile_hash(
 
     async with app.db_acquire() as conn:
         await conn.execute(query)
+    app.session_cache.invalidate_account(id)
+    await app.cache.invalidate(account_tag(id))
 
     return {"result": "success"}
 
@@ -139,6 +145,8 @@ async def delete_banner_hash(
 
     async with app.db_acquire() as conn:
         await conn.execute(query)
+    app.session_cache.invalidate_account(id)
+    await app.cache.invalidate(account_tag(id))
 
     return {"result": "success"}
 
@@ -163,6 +171,8 @@ async def update_description(
 
     async with app.db_acquire() as conn:
         await conn.execute(query)
+    app.session_cache.invalidate_account(id)
+    await app.cache.invalidate(account_tag(id))
 
     return {"result": "success"}
 
@@ -194,25 +204,12 @@ async def upload_profile(
         )
 
     # Convert to PNG and WebP with resizing
-    def convert_images(content: bytes) -> tuple[bytes, bytes]:
-        image = Image.open(io.BytesIO(content))
-        image = image.convert("RGB")
-        image = image.resize(PROFILE_SIZE, Image.Resampling.LANCZOS)
-
-        # PNG
-        png_buffer = io.BytesIO()
-        image.save(png_buffer, format="PNG")
-        png_bytes = png_buffer.getvalue()
-
-        # WebP
-        webp_buffer = io.BytesIO()
-        image.save(webp_buffer, format="WEBP")
-        webp_bytes = webp_buffer.getvalue()
-
-        return png_bytes, webp_bytes
-
     try:
-        png_bytes, webp_bytes = await app.run_blocking(convert_images, file_content)
+        png_bytes, webp_bytes = await app.run_cpu(
+            convert_images, file_content, PROFILE_SIZE
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -258,6 +255,8 @@ async def upload_profile(
     query = accounts.update_profile_hash(id, file_hash)
     async with app.db_acquire() as conn:
         await conn.execute(query)
+    app.session_cache.invalidate_account(id)
+    await app.cache.invalidate(account_tag(id))
 
     return {"result": "success", "hash": file_hash}
 
@@ -289,25 +288,12 @@ async def upload_banner(
         )
 
     # Convert to PNG and WebP with resizing
-    def convert_images(content: bytes) -> tuple[bytes, bytes]:
-        image = Image.open(io.BytesIO(content))
-        image = image.convert("RGB")
-        image = image.resize(BANNER_SIZE, Image.Resampling.LANCZOS)
-
-        # PNG
-        png_buffer = io.BytesIO()
-        image.save(png_buffer, format="PNG")
-        png_bytes = png_buffer.getvalue()
-
-        # WebP
-        webp_buffer = io.BytesIO()
-        image.save(webp_buffer, format="WEBP")
-        webp_bytes = webp_buffer.getvalue()
-
-        return png_bytes, webp_bytes
-
     try:
-        png_bytes, webp_bytes = await app.run_blocking(convert_images, file_content)
+        png_bytes, webp_bytes = await app.run_cpu(
+            convert_images, file_content, BANNER_SIZE
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -353,5 +339,7 @@ async def upload_banner(
     query = accounts.update_banner_hash(id, file_hash)
     async with app.db_acquire() as conn:
         await conn.execute(query)
+    app.session_cache.invalidate_account(id)
+    await app.cache.invalidate(account_tag(id))
 
     return {"result": "success", "hash": file_hash}
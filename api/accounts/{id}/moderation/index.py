@@ -5,6 +5,7 @@ from fastapi import APIRouter, Request, HTTPException, status
 from helpers.delete import delete_from_s3
 
 from database import accounts
+from helpers.shared_cache import account_tag
 
 router = APIRouter()
 
@@ -22,6 +23,10 @@ async def ban_user(request: Request, id: str, delete: bool = False):
         await conn.execute(query)
         if delete:
             await conn.conn.execute("DELETE FROM charts WHERE author = $1", id)
+    app.session_cache.invalidate_account(id)
+    await app.cache.invalidate(account_tag(id))
+    if delete:
+        app.count_cache.clear()
 
     if delete:
         await delete_from_s3(app, id)
@@ -40,5 +45,7 @@ async def unban_user(request: Request, id: str):
 
     async with app.db_acquire() as conn:
         await conn.execute(query)
+    app.session_cache.invalidate_account(id)
+    await app.cache.invalidate(account_tag(id))
 
     return {"result": "success"}
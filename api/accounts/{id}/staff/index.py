@@ -3,6 +3,7 @@ from core import ChartFastAPI
 from fastapi import APIRouter, Request, HTTPException, status
 
 from database import accounts
+from helpers.shared_cache import account_tag
 
 router = APIRouter()
 
@@ -18,6 +19,8 @@ async def mod_user(request: Request, id: str):
 
     async with app.db_acquire() as conn:
         await conn.execute(query)
+    app.session_cache.invalidate_account(id)
+    await app.cache.invalidate(account_tag(id))
 
     return {"result": "success"}
 
@@ -33,6 +36,8 @@ async def unmod_user(request: Request, id: str):
 
     async with app.db_acquire() as conn:
         await conn.execute(query)
+    app.session_cache.invalidate_account(id)
+    await app.cache.invalidate(account_tag(id))
 
     return {"result": "success"}
 
@@ -48,6 +53,8 @@ async def admin_user(request: Request, id: str):
 
     async with app.db_acquire() as conn:
         await conn.execute(query)
+    app.session_cache.invalidate_account(id)
+    await app.cache.invalidate(account_tag(id))
 
     return {"result": "success"}
 
@@ -63,5 +70,7 @@ async def unadmin_user(request: Request, id: str):
 
     async with app.db_acquire() as conn:
         await conn.execute(query)
+    app.session_cache.invalidate_account(id)
+    await app.cache.invalidate(account_tag(id))
 
     return {"result": "success"}
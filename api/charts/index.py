@@ -1,3 +1,4 @@
+import asyncio
 from typing import Optional, List, Literal
 
 from fastapi import APIRouter, Request, HTTPException, status as fstatus, Query
@@ -6,6 +7,14 @@ from core import ChartFastAPI
 from database import charts
 
 from helpers.session import get_session, Session
+from helpers.responses import FastJSONResponse
+from helpers.http_cache import validated_json
+from helpers.pagination import (
+    ChartListCursor,
+    CURSOR_SORT_COLUMNS,
+    encode_cursor,
+    decode_cursor,
+)
 
 router = APIRouter()
 
@@ -39,14 +48,20 @@ async def main(
         "abc",
         "random",
         "published_at",
+        "relevance",
     ] = Query("created_at"),
     sort_order: Literal["desc", "asc"] = Query("desc"),
     status: Literal["PUBLIC", "PUBLIC_MINE", "UNLISTED", "PRIVATE", "ALL"] = Query(
         "PUBLIC"
     ),
     meta_includes: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
     session: Session = get_session(enforce_auth=False),
 ):
+    """
+    Pass cursor (empty for the first page) to page with next/prev tokens
+    instead of page numbers. Cursor responses have no pageCount.
+    """
     app: ChartFastAPI = request.app
 
     sonolus_id = session.sonolus_id
@@ -80,20 +95,60 @@ async def main(
             detail="Cannot request personal chart list AND specify sonolus_handle_is, even if they are the same. Choose one!",
         )
     item_page_count = 10
+    list_cursor = None
+    if cursor is not None and type != "random":
+        if sort_by not in CURSOR_SORT_COLUMNS:
+            raise HTTPException(
+                status_code=fstatus.HTTP_400_BAD_REQUEST,
+                detail=f"cursor is only supported for sort_by {', '.join(CURSOR_SORT_COLUMNS)}.",
+            )
+        if cursor:
+            try:
+                list_cursor = decode_cursor(cursor)
+            except ValueError:
+                raise HTTPException(
+                    status_code=fstatus.HTTP_400_BAD_REQUEST,
+                    detail="Invalid cursor.",
+                )
+            if (list_cursor.sort_by, list_cursor.sort_order) != (sort_by, sort_order):
+                raise HTTPException(
+                    status_code=fstatus.HTTP_400_BAD_REQUEST,
+                    detail="Cursor does not match sort_by/sort_order.",
+                )
+        else:
+            list_cursor = ChartListCursor(
+                sort_by=sort_by, sort_order=sort_order, direction="next"
+            )
     if type == "random":
         if use_owned_by:
             raise HTTPException(
                 status_code=fstatus.HTTP_400_BAD_REQUEST,
                 detail="Can't use random for non-public charts.",
             )
-        query = charts.get_random_charts(
-            item_page_count // 2, sonolus_id=sonolus_id, staff_pick=staff_pick
-        )
-        async with app.db_acquire() as conn:
-            rows = await conn.fetch(query)
+        return_count = item_page_count // 2
+        # oversample a little, the pool may include charts changed since its snapshot
+        ids = await app.chart_pool.sample(app, return_count * 2, bucket=staff_pick)
+        rows = []
+        if ids:
+            async with app.db_acquire() as conn:
+                rows = await conn.fetch(
+                    charts.get_chart_by_id_batch(ids, sonolus_id=sonolus_id)
+                )
+        # batch lookup comes back in index order, restore the random draw order
+        order = {chart_id: i for i, chart_id in enumerate(ids)}
+        rows = [
+            row
+            for row in sorted(rows, key=lambda row: order[row.id])
+            if row.status == "PUBLIC"
+            and (staff_pick is None or row.staff_pick == staff_pick)
+        ][:return_count]
         # it does convert almost-dict to model to dict, but that adds a layer of "security"
-        data = [row.model_dump() for row in rows] if rows else []
-        return {"data": data, "asset_base_url": app.s3_asset_base_url}
+        data = [row.model_dump(exclude={"log_like_score"}) for row in rows]
+        return FastJSONResponse(
+            {"data": data, "asset_base_url": app.s3_asset_base_url},
+            # a new draw every time
+            headers={"Cache-Control": "no-store"},
+        )
     if type == "quick":
         if sort_by == "abc":
             sort_order = "asc" if sort_order == "desc" else "desc"
@@ -105,6 +160,7 @@ async def main(
             sort_order=sort_order,
             sonolus_id=sonolus_id,
             staff_pick=staff_pick,
+            cursor=list_cursor,
         )
     else:
         if sort_by == "abc":
@@ -133,23 +189,75 @@ async def main(
             sonolus_handle_is=sonolus_handle_is,
             sonolus_id=sonolus_id,
             owned_by=sonolus_id if use_owned_by else None,
+            cursor=list_cursor,
         )
 
-    async with app.db_acquire() as conn:
-        count = (await conn.fetchrow(count_query)).model_dump()
-        if count["total_count"] == 0:
-            data = []
-            page_count = 0
-        elif page * item_page_count >= count["total_count"]:
-            data = []
-            page_count = (count["total_count"] + item_page_count - 1) // item_page_count
-        else:
+    if list_cursor:
+        async with app.db_acquire() as conn:
             rows = await conn.fetch(list_query)
-            data = [row.model_dump() for row in rows]
-            page_count = (count["total_count"] + item_page_count - 1) // item_page_count
-
-    return {
-        "pageCount": page_count,
-        "data": data,
-        "asset_base_url": app.s3_asset_base_url,
-    }
+
+        has_more = len(rows) > item_page_count
+        rows = rows[:item_page_count]
+        if list_cursor.direction == "prev":
+            rows.reverse()
+        # paging backwards always has rows after it, and vice versa
+        has_next = has_more if list_cursor.direction == "next" else True
+        has_prev = has_more if list_cursor.direction == "prev" else bool(cursor)
+
+        def token(row, direction: str) -> str:
+            return encode_cursor(
+                ChartListCursor(
+                    sort_by=sort_by,
+                    sort_order=sort_order,
+                    value=getattr(row, CURSOR_SORT_COLUMNS[sort_by]),
+                    id=row.id,
+                    direction=direction,
+                )
+            )
+
+        return validated_json(
+            request,
+            "charts",
+            {
+                "data": [row.model_dump() for row in rows],
+                "next": token(rows[-1], "next") if rows and has_next else None,
+                "prev": token(rows[0], "prev") if rows and has_prev else None,
+                "asset_base_url": app.s3_asset_base_url,
+            },
+            private=bool(session.auth),
+        )
+
+    async def fetch_count() -> int:
+        async with app.db_acquire() as conn:
+            total_count = (await conn.fetchrow(count_query)).total_count
+        app.count_cache.set(count_query, total_count)
+        return total_count
+
+    async def fetch_rows() -> list:
+        async with app.db_acquire() as conn:
+            return await conn.fetch(list_query)
+
+    total_count = app.count_cache.get(count_query)
+    if total_count is None:
+        # nothing to skip the page query with, so run both at once
+        total_count, rows = await asyncio.gather(fetch_count(), fetch_rows())
+    elif page * item_page_count >= total_count:
+        rows = []
+    else:
+        rows = await fetch_rows()
+
+    data = [row.model_dump() for row in rows]
+    page_count = (total_count + item_page_count - 1) // item_page_count
+
+    # anonymous listings are the same for everyone, logged in ones carry
+    # liked flags and owned_by / liked_by filters
+    return validated_json(
+        request,
+        "charts",
+        {
+            "pageCount": page_count,
+            "data": data,
+            "asset_base_url": app.s3_asset_base_url,
+        },
+        private=bool(session.auth),
+    )
@@ -8,7 +8,9 @@ from typing import Literal
 from fastapi import APIRouter, Query, Request
 
 from core import ChartFastAPI
-from database import accounts, charts, leaderboards
+from database import charts, leaderboards
+from helpers.responses import FastJSONResponse
+from helpers.shared_cache import cached_public_accounts
 
 router = APIRouter()
 
@@ -18,9 +20,14 @@ async def get_records(
 ):
     async with app.db_acquire() as conn:
         if random:
-            records = await conn.fetch(
-                leaderboards.get_random_leaderboard_records(limit)
-            )
+            ids = await app.record_pool.sample(app, limit * 2)
+            records = []
+            if ids:
+                records = await conn.fetch(
+                    leaderboards.get_leaderboard_records_by_id_batch(ids)
+                )
+            order = {record_id: i for i, record_id in enumerate(ids)}
+            records = sorted(records, key=lambda record: order[record.id])[:limit]
         else:
             leaderboard_query, count_query = leaderboards.get_public_records(
                 limit, page
@@ -28,7 +35,9 @@ async def get_records(
             records = await conn.fetch(leaderboard_query)
 
     if not records:
-        return {"data": [], "pageCount": 0} if not random else {"data": []}
+        return FastJSONResponse(
+            {"data": [], "pageCount": 0} if not random else {"data": []}
+        )
 
     chart_ids = list(set([record.chart_id for record in records]))
     submitter_ids = list(set([record.submitter for record in records]))
@@ -38,8 +47,7 @@ async def get_records(
             return await c.fetch(charts.get_chart_by_id_batch(chart_ids))
 
     async def _fetch_accounts():
-        async with app.db_acquire() as c:
-            return await c.fetch(accounts.get_public_account_batch(submitter_ids))
+        return await cached_public_accounts(app, submitter_ids)
 
     async def _fetch_count():
         if random or limit == 3:
@@ -47,11 +55,10 @@ async def get_records(
         async with app.db_acquire() as c:
             return await c.fetchrow(count_query)
 
-    chart_list, account_list, count_result = await asyncio.gather(
+    chart_list, account_dict, count_result = await asyncio.gather(
         _fetch_charts(), _fetch_accounts(), _fetch_count()
     )
     chart_dict = {chart.id: chart for chart in chart_list}
-    account_dict = {account.sonolus_id: account for account in account_list}
 
     response = {"data": []}
     for record in records:
@@ -65,7 +72,7 @@ async def get_records(
     if count_result:
         response["pageCount"] = math.ceil(count_result.total_count / 10)
 
-    return response
+    return FastJSONResponse(response)
 
 
 @router.get("/random/")
@@ -1,22 +1,23 @@
-import uuid, io, asyncio, json, time, gzip
+import uuid, asyncio, json, time
 
 from datetime import datetime, timedelta, timezone
 
-from fastapi import APIRouter, Request, HTTPException, status, UploadFile, Form
+from fastapi import APIRouter, Request, HTTPException, status, UploadFile, Form, Depends
 from fastapi.responses import JSONResponse
 
-from database import charts, accounts
+from database import accounts, upload_jobs
 
-from helpers.models import ChartUploadData, Chart
-from helpers.hashing import calculate_sha1
-from helpers.file_checks import get_and_check_file
-from helpers.backgrounds import generate_backgrounds_resize_jacket
-from helpers.audio import ensure_cbr_mp3
+from helpers.models import ChartUploadData
+from helpers.uploads import (
+    StagedFile,
+    StagingArea,
+    get_staging_area,
+    upload_staged_file,
+)
+from helpers.upload_jobs import JOB_FILE_TYPES, job_file_key
 from helpers.session import get_session, Session
 from helpers.constants import MAX_FILE_SIZES, MAX_TEXT_SIZES, MAX_RATINGS
 
-import sonolus_converters
-
 from typing import Optional
 
 from pydantic import ValidationError
@@ -38,6 +39,7 @@ async def main(
     session: Session = get_session(
         enforce_auth=True, enforce_type="external", allow_banned_users=False
     ),
+    staging: StagingArea = Depends(get_staging_area),
 ):
     app: ChartFastAPI = request.app
     try:
@@ -128,200 +130,49 @@ async def main(
             )
 
     chart_id = str(uuid.uuid4()).replace("-", "")
-
-    file_read_tasks = [
-        get_and_check_file(jacket_image, "image"),
-        chart_file.read(),
-        get_and_check_file(audio_file, "audio/mpeg"),
-    ]
-
-    if preview_file:
-        file_read_tasks.append(get_and_check_file(preview_file, "audio/mpeg"))
-    if background_image:
-        file_read_tasks.append(get_and_check_file(background_image, "image/png"))
-
-    file_results = await asyncio.gather(*file_read_tasks)
-
-    jacket_bytes_original = file_results[0]
-    chart_bytes_raw = file_results[1]
-    audio_bytes = await app.run_blocking(ensure_cbr_mp3, file_results[2])
-
-    result_idx = 3
-    preview_bytes = None
-    background_bytes = None
-
+    job_id = str(uuid.uuid4())
+
+    # files are only checked, hashed and stored here. worker.py does the
+    # actual processing and creates the chart, see helpers/upload_jobs.py
+    stage_tasks = {
+        "jacket": staging.stage(
+            jacket_image,
+            "image",
+            MAX_FILE_SIZES["jacket"],
+            content_type=JOB_FILE_TYPES["jacket"],
+        ),
+        "chart": staging.stage(
+            chart_file,
+            None,
+            MAX_FILE_SIZES["chart"],
+            content_type=JOB_FILE_TYPES["chart"],
+        ),
+        "audio": staging.stage(audio_file, "audio/mpeg", MAX_FILE_SIZES["audio"]),
+    }
     if preview_file:
-        # preview_bytes = await app.run_blocking(ensure_cbr_mp3, file_results[result_idx])
-        preview_bytes = file_results[result_idx]
-        result_idx += 1
-    if background_image:
-        background_bytes = file_results[result_idx]
-
-    result = sonolus_converters.detect(chart_bytes_raw)
-    if not result:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid file format."
-        )
-
-    def convert_chart() -> bytes:
-        if result[0] == "sus":
-            converted = io.BytesIO()
-            score = sonolus_converters.sus.load(
-                io.TextIOWrapper(io.BytesIO(chart_bytes_raw), encoding="utf-8")
-            )
-            sonolus_converters.next_sekai.export(converted, score)
-        elif result[0] == "usc":
-            converted = io.BytesIO()
-            score = sonolus_converters.usc.load(
-                io.TextIOWrapper(io.BytesIO(chart_bytes_raw), encoding="utf-8")
-            )
-            sonolus_converters.next_sekai.export(converted, score)
-        elif result[0] == "lvd":
-            if not result[1].endswith("pysekai"):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Incorrect LevelData: {result[1]} (expected: pysekai)",
-                )
-            if not result[1].startswith("compress_"):
-                compressed_data = io.BytesIO()
-                with gzip.GzipFile(
-                    fileobj=compressed_data, mode="wb", filename="LevelData", mtime=0
-                ) as f:
-                    f.write(chart_bytes_raw)
-                compressed_data.seek(0)
-                return compressed_data.getvalue()
-            return chart_bytes_raw
-        return converted.read()
-
-    try:
-        (v1, v3, jacket_bytes), chart_bytes = await asyncio.gather(
-            app.run_blocking(generate_backgrounds_resize_jacket, jacket_bytes_original),
-            app.run_blocking(convert_chart),
+        stage_tasks["preview"] = staging.stage(
+            preview_file, "audio/mpeg", MAX_FILE_SIZES["preview"]
         )
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
-
-    hash_tasks = [
-        app.run_blocking(calculate_sha1, jacket_bytes),
-        app.run_blocking(calculate_sha1, v1),
-        app.run_blocking(calculate_sha1, v3),
-        app.run_blocking(calculate_sha1, chart_bytes),
-        app.run_blocking(calculate_sha1, audio_bytes),
-    ]
-
-    if preview_bytes:
-        hash_tasks.append(app.run_blocking(calculate_sha1, preview_bytes))
-    if background_bytes:
-        hash_tasks.append(app.run_blocking(calculate_sha1, background_bytes))
-
-    hashes = await asyncio.gather(*hash_tasks)
-
-    jacket_hash = hashes[0]
-    v1_hash = hashes[1]
-    v3_hash = hashes[2]
-    chart_hash = hashes[3]
-    audio_hash = hashes[4]
-
-    hash_idx = 5
-    preview_hash = None
-    background_hash = None
-
-    if preview_bytes:
-        preview_hash = hashes[hash_idx]
-        hash_idx += 1
-    if background_bytes:
-        background_hash = hashes[hash_idx]
-
-    s3_uploads = [
-        {
-            "path": f"{session.sonolus_id}/{chart_id}/{v1_hash}",
-            "hash": v1_hash,
-            "bytes": v1,
-            "content-type": "image/png",
-        },
-        {
-            "path": f"{session.sonolus_id}/{chart_id}/{v3_hash}",
-            "hash": v3_hash,
-            "bytes": v3,
-            "content-type": "image/png",
-        },
-        {
-            "path": f"{session.sonolus_id}/{chart_id}/{jacket_hash}",
-            "hash": jacket_hash,
-            "bytes": jacket_bytes,
-            "content-type": "image/png",
-        },
-        {
-            "path": f"{session.sonolus_id}/{chart_id}/{chart_hash}",
-            "hash": chart_hash,
-            "bytes": chart_bytes,
-            "content-type": "application/gzip",
-        },
-        {
-            "path": f"{session.sonolus_id}/{chart_id}/{audio_hash}",
-            "hash": audio_hash,
-            "bytes": audio_bytes,
-            "content-type": "audio/mpeg",
-        },
-    ]
-
-    if preview_file and preview_bytes:
-        s3_uploads.append(
-            {
-                "path": f"{session.sonolus_id}/{chart_id}/{preview_hash}",
-                "hash": preview_hash,
-                "bytes": preview_bytes,
-                "content-type": "audio/mpeg",
-            }
+    if background_image:
+        stage_tasks["background"] = staging.stage(
+            background_image, "image/png", MAX_FILE_SIZES["background"]
         )
 
-    if background_image and background_bytes:
-        s3_uploads.append(
-            {
-                "path": f"{session.sonolus_id}/{chart_id}/{background_hash}",
-                "hash": background_hash,
-                "bytes": background_bytes,
-                "content-type": "image/png",
-            }
-        )
+    staged: dict[str, StagedFile] = dict(
+        zip(stage_tasks, await asyncio.gather(*stage_tasks.values()))
+    )
 
     async with app.s3_session_getter() as s3:
         bucket = await s3.Bucket(app.s3_bucket)
-        tasks = []
-        alr_added_hashes = []
-        for file in s3_uploads:
-            if file["hash"] in alr_added_hashes:
-                continue
-            alr_added_hashes.append(file["hash"])
-            path = file["path"]
-            file_bytes = file["bytes"]
-            content_type = file["content-type"]
-            task = bucket.upload_fileobj(
-                Fileobj=io.BytesIO(file_bytes),
-                Key=path,
-                ExtraArgs={"ContentType": content_type},
+        await asyncio.gather(
+            *(
+                upload_staged_file(bucket, file, job_file_key(job_id, name))
+                for name, file in staged.items()
             )
-            tasks.append(task)
-        await asyncio.gather(*tasks)
-
-    query = charts.create_chart(
-        chart=Chart(
-            id=chart_id,
-            author=session.sonolus_id,
-            rating=data.rating,
-            chart_author=data.author,
-            title=data.title,
-            artists=data.artists,
-            jacket_file_hash=jacket_hash,
-            music_file_hash=audio_hash,
-            chart_file_hash=chart_hash,
-            background_v1_file_hash=v1_hash,
-            background_v3_file_hash=v3_hash,
-            tags=data.tags or [],
-            description=data.description,
-            preview_file_hash=preview_hash,
-            background_file_hash=background_hash,
         )
+
+    query = upload_jobs.create_upload_job(
+        job_id, chart_id, session.sonolus_id, data.model_dump_json(), list(staged)
     )
     query2 = accounts.update_cooldown(
         sonolus_id=session.sonolus_id,
@@ -329,11 +180,13 @@ async def main(
     )
 
     async with app.db_acquire() as conn:
-        result = await conn.fetchrow(query)
-        if result:
-            await conn.execute(query2)
-            return {"id": result.id}
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Error while processing upload result.",
-        )
+        await conn.execute(query)
+        await conn.execute(query2)
+    # cached account still holds the old cooldown
+    app.session_cache.invalidate_account(session.sonolus_id)
+
+    # poll /charts/{id}/upload_status/ for the result
+    return JSONResponse(
+        content={"id": chart_id, "status": "queued"},
+        status_code=status.HTTP_202_ACCEPTED,
+    )
@@ -5,8 +5,10 @@ from typing import Optional
 
 from core import ChartFastAPI
 
-from database import accounts, comments, staff_actions
+from database import comments, staff_actions
 from helpers.session import get_session, Session
+from helpers.comments import format_comment
+from helpers.shared_cache import cached_public_accounts, chart_tag
 
 from helpers.models import CommentRequest
 
@@ -46,6 +48,8 @@ async def main(
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Chart not found."
             )
+    # comment_count
+    await app.cache.invalidate(chart_tag(id))
     return {"result": "success"}
 
 
@@ -89,6 +93,7 @@ async def main(
                     previous_value=result.content,
                 )
             )
+    await app.cache.invalidate(chart_tag(id))
     d = result.model_dump()
     if user.mod:
         d["mod"] = True
@@ -134,33 +139,13 @@ async def main(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Chart not found."
             )
 
-        account_dict = {
-            account.sonolus_id: account
-            for account in await conn.fetch(
-                accounts.get_public_account_batch(
-                    list(set([comment.commenter for comment in result]))
-                )
-            )
-        }
+        account_dict = await cached_public_accounts(
+            app, [comment.commenter for comment in result], conn
+        )
 
     data = [
-        {
-            **row.model_dump(),
-            "created_at": int(row.created_at.timestamp() * 1000),
-            "deleted_at": (
-                int(row.deleted_at.timestamp() * 1000) if row.deleted_at else None
-            ),
-            "account": account_dict.get(row.commenter),
-        }
-        for row in result
+        format_comment(row, account_dict.get(row.commenter), user) for row in result
     ]
-    for comment in data:
-        if comment["deleted_at"]:
-            comment["content"] = (
-                f"[DELETED]\nMod View:\n{'-'*10}\n{comment['content']}"
-                if (user and user.mod)
-                else "[DELETED]"
-            )
     ret = {"data": data, "pageCount": page_count}
     if user and user.mod:
         ret["mod"] = True
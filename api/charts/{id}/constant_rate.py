@@ -9,6 +9,7 @@ from helpers.models import ChartConstantData
 from typing import Optional
 
 from helpers.session import get_session, Session
+from helpers.shared_cache import chart_tag
 from helpers.constants import MAX_RATINGS
 
 from core import ChartFastAPI
@@ -67,4 +68,5 @@ async def main(
                 new_value=str(data.constant),
             )
         )
+    await app.cache.invalidate(chart_tag(id))
     return {"result": "success"}
@@ -3,6 +3,7 @@ from fastapi import APIRouter, Request, HTTPException, status
 
 from database import charts
 from helpers.session import get_session, Session
+from helpers.shared_cache import chart_tag
 
 from core import ChartFastAPI
 
@@ -31,6 +32,9 @@ async def main(
     async with app.db_acquire() as conn:
         exists = await conn.fetchrow(query)
     if exists:
+        app.count_cache.clear()
+        app.chart_pool.mark_stale()
+        await app.cache.invalidate(chart_tag(id))
         async with app.s3_session_getter() as s3:
             bucket = await s3.Bucket(app.s3_bucket)
             tasks = []
@@ -1,21 +1,21 @@
-import io, asyncio, gzip
+import asyncio
 
 from fastapi import APIRouter, Request, HTTPException, status, UploadFile, Form
 
 from database import charts, leaderboards
 
-import sonolus_converters
-
 from helpers.models import ChartEditData
 from helpers.hashing import calculate_sha1
-from helpers.backgrounds import generate_backgrounds_resize_jacket
-from helpers.audio import ensure_cbr_mp3
+from helpers.jacket_renders import render_jacket
+from helpers.chart_conversion import convert_chart
 from helpers.constants import MAX_FILE_SIZES, MAX_TEXT_SIZES, MAX_RATINGS
 
 from typing import Optional
 from helpers.file_checks import get_and_check_file
+from helpers.blob_store import put_chart_files
 
 from helpers.session import get_session, Session
+from helpers.shared_cache import chart_tag
 
 from pydantic import ValidationError
 
@@ -194,12 +194,10 @@ async def main(
             file_results[file_type] = result
 
     if "audio" in file_results:
-        file_results["audio"] = await app.run_blocking(
-            ensure_cbr_mp3, file_results["audio"]
-        )
+        file_results["audio"] = await app.cbr_encoder.ensure_cbr(file_results["audio"])
     # if "preview" in file_results:
-    #     file_results["preview"] = await app.run_blocking(
-    #         ensure_cbr_mp3, file_results["preview"]
+    #     file_results["preview"] = await app.cbr_encoder.ensure_cbr(
+    #         file_results["preview"]
     #     )
 
     chart_hash = None
@@ -215,55 +213,13 @@ async def main(
 
     if "chart" in file_results:
         chart_bytes_raw = file_results["chart"]
-        result = sonolus_converters.detect(chart_bytes_raw)
-        if not result:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid file format.",
-            )
-
-        def convert_chart() -> bytes:
-            if result[0] == "sus":
-                converted = io.BytesIO()
-                score = sonolus_converters.sus.load(
-                    io.TextIOWrapper(io.BytesIO(chart_bytes_raw), encoding="utf-8")
-                )
-                sonolus_converters.next_sekai.export(converted, score)
-            elif result[0] == "usc":
-                converted = io.BytesIO()
-                score = sonolus_converters.usc.load(
-                    io.TextIOWrapper(io.BytesIO(chart_bytes_raw), encoding="utf-8")
-                )
-                sonolus_converters.next_sekai.export(converted, score)
-            elif result[0] == "lvd":
-                if not result[1].endswith("pysekai"):
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail=f"Incorrect LevelData: {result[1]} (expected: pysekai)",
-                    )
-                if not result[1].startswith("compress_"):
-                    compressed_data = io.BytesIO()
-                    with gzip.GzipFile(
-                        fileobj=compressed_data,
-                        mode="wb",
-                        filename="LevelData",
-                        mtime=0,
-                    ) as f:
-                        f.write(chart_bytes_raw)
-                    compressed_data.seek(0)
-                    return compressed_data.getvalue()
-                return chart_bytes_raw
-            return converted.read()
-
-        processing_tasks.append(app.run_blocking(convert_chart))
+        processing_tasks.append(app.run_cpu(convert_chart, chart_bytes_raw))
         processing_types.append("chart")
         chart_updated = True
 
     if "jacket" in file_results:
         jacket_bytes_original = file_results["jacket"]
-        processing_tasks.append(
-            app.run_blocking(generate_backgrounds_resize_jacket, jacket_bytes_original)
-        )
+        processing_tasks.append(render_jacket(app, jacket_bytes_original))
         processing_types.append("jacket")
 
     if processing_tasks:
@@ -275,8 +231,15 @@ async def main(
                     chart_bytes = processing_results[result_idx]
                     result_idx += 1
                 elif proc_type == "jacket":
-                    v1, v3, jacket_bytes = processing_results[result_idx]
+                    render, rendered = processing_results[result_idx]
                     result_idx += 1
+                    # None: the same jacket was rendered before, copied within S3
+                    v1, v3, jacket_bytes = rendered or (None, None, None)
+                    jacket_hash = render.jacket_hash
+                    v1_hash = render.v1_hash
+                    v3_hash = render.v3_hash
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
@@ -287,14 +250,6 @@ async def main(
         hash_tasks.append(app.run_blocking(calculate_sha1, chart_bytes))
         hash_types.append("chart")
 
-    if "jacket" in file_results:
-        hash_tasks.append(app.run_blocking(calculate_sha1, jacket_bytes))
-        hash_types.append("jacket")
-        hash_tasks.append(app.run_blocking(calculate_sha1, v1))
-        hash_types.append("v1")
-        hash_tasks.append(app.run_blocking(calculate_sha1, v3))
-        hash_types.append("v3")
-
     if "audio" in file_results:
         hash_tasks.append(app.run_blocking(calculate_sha1, file_results["audio"]))
         hash_types.append("audio")
@@ -312,12 +267,6 @@ async def main(
         for hash_type, hash_value in zip(hash_types, hash_results):
             if hash_type == "chart":
                 chart_hash = hash_value
-            elif hash_type == "jacket":
-                jacket_hash = hash_value
-            elif hash_type == "v1":
-                v1_hash = hash_value
-            elif hash_type == "v3":
-                v3_hash = hash_value
             elif hash_type == "audio":
                 audio_hash = hash_value
             elif hash_type == "preview":
@@ -425,8 +374,11 @@ async def main(
         for hash_key in old_deletes
         if hash_key in old_chart_data.model_fields
     )
-    deleted_hashes = deleted_candidate_hashes - kept_hashes
+    # a new file may reuse an old hash under another field, don't delete it
+    uploaded_hashes = set(file["hash"] for file in s3_uploads)
+    deleted_hashes = deleted_candidate_hashes - kept_hashes - uploaded_hashes
 
+    register_blobs = None
     if deleted_hashes or s3_uploads:
         async with app.s3_session_getter() as s3:
             bucket = await s3.Bucket(app.s3_bucket)
@@ -439,20 +391,11 @@ async def main(
                 obj = await bucket.Object(key)
                 task = obj.delete()
                 tasks.append(task)
-            alr_added_hashes = []
-            for file in s3_uploads:
-                if file["hash"] in alr_added_hashes:
-                    continue
-                alr_added_hashes.append(file["hash"])
-                path = file["path"]
-                file_bytes = file["bytes"]
-                content_type = file["content-type"]
-                task = bucket.upload_fileobj(
-                    Fileobj=io.BytesIO(file_bytes),
-                    Key=path,
-                    ExtraArgs={"ContentType": content_type},
+            if s3_uploads:
+                # reverting to an older file may find it still in place
+                tasks.insert(
+                    0, put_chart_files(app, bucket, s3_uploads, check_existing=True)
                 )
-                tasks.append(task)
 
             if chart_updated:
                 prefix = f"{old_chart_data.author}/{old_chart_data.id}/replays/"
@@ -460,7 +403,9 @@ async def main(
                 if objects:
                     tasks += [obj.delete() for obj in objects]
 
-            await asyncio.gather(*tasks)
+            results = await asyncio.gather(*tasks)
+            if s3_uploads:
+                register_blobs = results[0]
 
     query = charts.update_metadata(
         chart_id=id,
@@ -495,10 +440,14 @@ async def main(
     )
 
     async with app.db_acquire() as conn:
-        await conn.execute(query)
-        await conn.execute(query2)
+        async with conn.conn.transaction():
+            await conn.execute(query)
+            await conn.execute(query2)
+            if register_blobs:
+                await conn.execute(register_blobs)
 
-        if chart_updated:
-            await conn.execute(leaderboards.delete_leaderboards(old_chart_data.id))
+            if chart_updated:
+                await conn.execute(leaderboards.delete_leaderboards(old_chart_data.id))
+    await app.cache.invalidate(chart_tag(id))
 
     return {"result": "success"}
@@ -1,12 +1,45 @@
+from typing import Optional, Union
+
 from fastapi import APIRouter, Request, HTTPException, Query, status
 from core import ChartFastAPI
 
 from database import charts
+from helpers.models import ChartByID, ChartVersion
 from helpers.session import get_session, Session
+from helpers.responses import FastJSONResponse
+from helpers.shared_cache import cached_chart
+from helpers.http_cache import (
+    cache_headers,
+    etag_matches,
+    make_etag,
+    not_modified,
+)
 
 router = APIRouter()
 
 
+def chart_etag(
+    chart: Union[ChartByID, ChartVersion],
+    sonolus_id: Optional[str],
+    mod: bool,
+    admin: bool,
+) -> str:
+    # same from the full row and from get_chart_version
+    return make_etag(
+        chart.id,
+        chart.updated_at,
+        chart.like_count,
+        chart.comment_count,
+        chart.log_like_score,
+        chart.status,
+        chart.staff_pick,
+        getattr(chart, "liked", None),
+        sonolus_id,
+        mod,
+        admin,
+    )
+
+
 @router.get("/")
 async def main(
     request: Request,
@@ -21,43 +54,74 @@ async def main(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid chart ID."
         )
 
-    query = charts.get_chart_by_id(id, sonolus_id=session.sonolus_id)
+    user = None
+    if session.auth:
+        user = await session.user()
+    mod = bool(user and user.mod)
+    admin = bool(mod and user.admin)
+    # liked / owner / mod make the response the caller's own
+    private = bool(session.auth)
+
+    if session.auth:
+        async with app.db_acquire() as conn:
+            if request.headers.get("if-none-match"):
+                version = await conn.fetchrow(
+                    charts.get_chart_version(id, sonolus_id=session.sonolus_id)
+                )
+                # private charts fall through, to 404 as usual
+                if version and (
+                    mod
+                    or version.status != "PRIVATE"
+                    or version.author == session.sonolus_id
+                ):
+                    etag = chart_etag(version, session.sonolus_id, mod, admin)
+                    if etag_matches(request, etag):
+                        return not_modified(cache_headers(app, "chart", etag, private))
+
+            result = await conn.fetchrow(
+                charts.get_chart_by_id(id, sonolus_id=session.sonolus_id)
+            )
+    else:
+        # the same row for every anonymous caller, shared between workers
+        result = await cached_chart(app, id)
+
+    if not result:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Chart not found."
+        )
+
+    etag = chart_etag(result, session.sonolus_id, mod, admin)
+    headers = cache_headers(app, "chart", etag, private)
+    if not session.auth and result.status != "PRIVATE":
+        if etag_matches(request, etag):
+            return not_modified(headers)
 
-    async with app.db_acquire() as conn:
-        result = await conn.fetchrow(query)
+    if mod:
+        res = {
+            "data": result.model_dump(),
+            "asset_base_url": app.s3_asset_base_url,
+            "mod": True,
+            "owner": result.author == session.sonolus_id,
+        }
+        if admin:
+            res["admin"] = True
+        return FastJSONResponse(res, headers=headers)
 
-        if not result:
+    is_owner = result.author == session.sonolus_id
+
+    if result.status == "PRIVATE":
+        if is_preview and is_owner:
+            pass
+        elif not is_owner:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="Chart not found."
             )
 
-        user = None
-        if session.auth:
-            user = await session.user()
-
-        if user and user.mod:
-            res = {
-                "data": result.model_dump(),
-                "asset_base_url": app.s3_asset_base_url,
-                "mod": True,
-                "owner": result.author == session.sonolus_id,
-            }
-            if user.admin:
-                res["admin"] = True
-            return res
-
-        is_owner = result.author == session.sonolus_id
-
-        if result.status == "PRIVATE":
-            if is_preview and is_owner:
-                pass
-            elif not is_owner:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND, detail="Chart not found."
-                )
-
-    return {
-        "data": result.model_dump(),
-        "asset_base_url": app.s3_asset_base_url,
-        "owner": result.author == session.sonolus_id,
-    }
+    return FastJSONResponse(
+        {
+            "data": result.model_dump(),
+            "asset_base_url": app.s3_asset_base_url,
+            "owner": result.author == session.sonolus_id,
+        },
+        headers=headers,
+    )
@@ -20,6 +20,10 @@ from typing import Literal
 from helpers.models import ReplayData, LeaderboardRecord, leaderboard_type
 from helpers.session import Session, get_session
 from helpers.hashing import calculate_sha1
+from helpers.leaderboard_metrics import speed_score
+from helpers.responses import FastJSONResponse
+from helpers.http_cache import cache_headers, etag_matches, make_etag, not_modified
+from helpers.shared_cache import cached_public_accounts
 from core import ChartFastAPI
 
 from database import leaderboards, charts, accounts
@@ -27,22 +31,6 @@ from database import leaderboards, charts, accounts
 router = APIRouter()
 
 
-def speed_multiplier(speed: float | None) -> float:
-    """
-    Only used for comparing scores
-    Sorting is implemented in SQL
-    """
-    if speed is None:
-        return 1.0
-
-    tier = int(speed * 20) / 20
-
-    if tier < 1:
-        return tier - 0.4
-    else:
-        return 1.0 + ((tier - 1.0) * 0.075)
-
-
 @router.post("/")
 async def upload_replay(
     id: str,
@@ -86,9 +74,9 @@ async def upload_replay(
         )
 
         if curr_record:
-            if int(
-                curr_record.arcade_score * speed_multiplier(curr_record.speed)
-            ) >= int(replay.result.arcadeScore * speed_multiplier(speed)):
+            if speed_score(curr_record.arcade_score, curr_record.speed) >= speed_score(
+                replay.result.arcadeScore, speed
+            ):
                 return {"status": "unchanged"}
 
             await conn.execute(leaderboards.delete_leaderboard_record(curr_record.id))
@@ -172,6 +160,22 @@ async def get_leaderboards(
     async with app.db_acquire() as conn:
         count = await conn.fetchrow(count_query)
 
+        # Submitter profiles can change under it, max-age keeps that short.
+        etag = make_etag(
+            id,
+            page,
+            limit,
+            leaderboard_type,
+            count.total_count,
+            count.last_id,
+            count.public_chart,
+            session.sonolus_id,
+        )
+        # owner flags
+        headers = cache_headers(app, "leaderboards", etag, bool(session.auth))
+        if etag_matches(request, etag):
+            return not_modified(headers)
+
         if count.total_count == 0:
             data = []
             page_count = 0
@@ -181,14 +185,9 @@ async def get_leaderboards(
         else:
             records = await conn.fetch(leaderboards_query)
 
-            account_dict = {
-                account.sonolus_id: account
-                for account in await conn.fetch(
-                    accounts.get_public_account_batch(
-                        list(set([record.submitter for record in records]))
-                    )
-                )
-            }
+            account_dict = await cached_public_accounts(
+                app, [record.submitter for record in records], conn
+            )
 
             data = [
                 {**row.model_dump(), "account": account_dict.get(row.submitter)}
@@ -196,7 +195,70 @@ async def get_leaderboards(
             ]
             page_count = (count.total_count + 9) // 10
 
-    return {"pageCount": page_count, "data": data}
+    return FastJSONResponse({"pageCount": page_count, "data": data}, headers=headers)
+
+
+# before /{record_id}/, which would take "around" as a record id
+@router.get("/around/")
+async def get_leaderboard_around(
+    request: Request,
+    id: str,
+    radius: int = Query(3, ge=0, le=10),
+    leaderboard_type: leaderboard_type = "arcade_score_speed",
+    session: Session = get_session(enforce_auth=True),
+):
+    """The caller's rank, with the records right above and below theirs."""
+    if len(id) != 32 or not id.isalnum():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid chart ID."
+        )
+
+    app: ChartFastAPI = request.app
+
+    async with app.db_acquire() as conn:
+        # one snapshot, or a record written between the rank and the window
+        # shifts the ranks below
+        async with conn.conn.transaction(isolation="repeatable_read", readonly=True):
+            record = await conn.fetchrow(
+                leaderboards.get_user_leaderboard_record_for_chart(
+                    id, session.sonolus_id
+                )
+            )
+            if not record:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="No record on this chart.",
+                )
+
+            rank = await conn.fetchrow(
+                leaderboards.get_leaderboard_rank(id, record.id, leaderboard_type)
+            )
+            records = await conn.fetch(
+                leaderboards.get_leaderboard_neighbours(
+                    id, record.id, radius, leaderboard_type, session.sonolus_id
+                )
+            )
+
+        account_dict = await cached_public_accounts(
+            app, [r.submitter for r in records], conn
+        )
+
+    # records are consecutive in rank order, the caller's sits at `own`
+    own = next(i for i, r in enumerate(records) if r.id == record.id)
+    data = [
+        {
+            **row.model_dump(),
+            "rank": rank.rank + i - own,
+            "account": account_dict.get(row.submitter),
+        }
+        for i, row in enumerate(records)
+    ]
+
+    return {
+        "rank": rank.rank,
+        "total": rank.total_count,
+        "data": data,
+    }
 
 
 @router.get("/{record_id}/")
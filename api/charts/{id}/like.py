@@ -3,6 +3,7 @@ from core import ChartFastAPI
 
 from database import charts
 from helpers.session import get_session, Session
+from helpers.shared_cache import chart_tag
 
 from helpers.models import Like
 
@@ -31,4 +32,6 @@ async def main(
         query = charts.remove_like(id, session.sonolus_id)
     async with app.db_acquire() as conn:
         await conn.execute(query)
+    # like_count, log_like_score
+    await app.cache.invalidate(chart_tag(id))
     return {"result": "success possibly"}
@@ -0,0 +1,144 @@
+"""
+Everything the chart page shows, in one request: the chart (with the
+caller's like), the top of its leaderboard, the first page of comments and
+its trends. Same data as the individual routes.
+"""
+
+import math
+
+from fastapi import APIRouter, Request, HTTPException, Query, status
+from typing import Literal
+
+from core import ChartFastAPI
+
+from database import accounts, charts, comments, leaderboards
+from helpers.models import leaderboard_type
+from helpers.session import get_session, Session
+from helpers.comments import format_comment
+from helpers.trends import TREND_WINDOWS, scale_trend
+from helpers.responses import FastJSONResponse
+
+router = APIRouter()
+
+OVERVIEW_FIELDS = ("chart", "leaderboard", "comments", "trends")
+
+
+@router.get("/")
+async def main(
+    request: Request,
+    id: str,
+    fields: str = Query(",".join(OVERVIEW_FIELDS)),
+    leaderboard_type: leaderboard_type = "arcade_score_speed",
+    limit: Literal["3", "10"] = "3",
+    days: int = 7,
+    session: Session = get_session(),
+):
+    app: ChartFastAPI = request.app
+
+    if len(id) != 32 or not id.isalnum():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid chart ID."
+        )
+    wanted = set(field.strip() for field in fields.split(",") if field.strip())
+    if not wanted or not wanted.issubset(OVERVIEW_FIELDS):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"fields must be some of {', '.join(OVERVIEW_FIELDS)}.",
+        )
+    if days not in TREND_WINDOWS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid trend window."
+        )
+
+    user = None
+    if session.auth:
+        user = await session.user()
+    sonolus_id = user.sonolus_id if user else None
+    mod = bool(user and user.mod)
+
+    res = {}
+    # One connection and one snapshot for every section. asyncpg runs one
+    # query at a time per connection, so they go back to back on it instead
+    # of each section taking its own connection.
+    async with app.db_acquire() as conn:
+        async with conn.conn.transaction(isolation="repeatable_read", readonly=True):
+            chart = await conn.fetchrow(charts.get_chart_by_id(id, sonolus_id))
+            # same visibility as /charts/{id}/
+            if not chart or (
+                chart.status == "PRIVATE" and chart.author != sonolus_id and not mod
+            ):
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND, detail="Chart not found."
+                )
+
+            account_ids = set()
+
+            if "leaderboard" in wanted:
+                records_query, count_query = leaderboards.get_leaderboards_for_chart(
+                    id, int(limit), 0, leaderboard_type, sonolus_id
+                )
+                count = await conn.fetchrow(count_query)
+                records = await conn.fetch(records_query) if count.total_count else []
+                account_ids.update(record.submitter for record in records)
+
+            if "comments" in wanted:
+                comment_query, comment_count_query = comments.get_comments(
+                    id, sonolus_id=sonolus_id
+                )
+                comment_count = await conn.fetchrow(comment_count_query)
+                comment_rows = (
+                    await conn.fetch(comment_query) if comment_count.total_count else []
+                )
+                account_ids.update(row.commenter for row in comment_rows)
+
+            if "trends" in wanted:
+                trend = await conn.fetch(charts.fetch_chart_trend(id, days))
+
+            # one lookup for leaderboard and comment accounts
+            account_dict = (
+                {
+                    account.sonolus_id: account
+                    for account in await conn.fetch(
+                        accounts.get_public_account_batch(list(account_ids))
+                    )
+                }
+                if account_ids
+                else {}
+            )
+
+    if "chart" in wanted:
+        res["chart"] = {
+            "data": chart.model_dump(),
+            "asset_base_url": app.s3_asset_base_url,
+            "owner": chart.author == sonolus_id,
+        }
+        if mod:
+            res["chart"]["mod"] = True
+            if user.admin:
+                res["chart"]["admin"] = True
+
+    if "leaderboard" in wanted:
+        res["leaderboard"] = {
+            "pageCount": (count.total_count + 9) // 10,
+            "data": [
+                {**row.model_dump(), "account": account_dict.get(row.submitter)}
+                for row in records
+            ],
+        }
+
+    if "comments" in wanted:
+        res["comments"] = {
+            "pageCount": math.ceil(comment_count.total_count / 10),
+            "data": [
+                format_comment(row, account_dict.get(row.commenter), user)
+                for row in comment_rows
+            ],
+        }
+
+    if "trends" in wanted:
+        res["trends"] = {
+            "likes": scale_trend([row.total_likes for row in trend]),
+            "comments": scale_trend([row.total_comments for row in trend]),
+        }
+
+    return FastJSONResponse(res)
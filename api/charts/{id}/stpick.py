@@ -3,6 +3,7 @@ from core import ChartFastAPI
 
 from fastapi import APIRouter, Request, HTTPException, status, UploadFile, Form
 from helpers.session import get_session, Session
+from helpers.shared_cache import chart_tag
 
 from database import charts, staff_actions
 
@@ -39,6 +40,9 @@ async def main(
     async with app.db_acquire() as conn:
         result = await conn.fetchrow(query)
         if result:
+            app.count_cache.clear()
+            app.chart_pool.mark_stale()
+            await app.cache.invalidate(chart_tag(id))
             await conn.execute(
                 staff_actions.log_action(
                     actor_id=user.sonolus_id,
@@ -81,7 +85,7 @@ async def main(
                     wembeds.append(wembed)
                     for embed in wembeds:
                         wmsg.add_embed(embed)
-                    await wmsg.send()
+                    app.webhooks.enqueue(wmsg)
             return {"id": result.id}
         raise HTTPException(
             status=status.HTTP_404_NOT_FOUND,
@@ -1,39 +1,22 @@
-import asyncio
-
 from fastapi import APIRouter, Request, HTTPException, status
 from core import ChartFastAPI
 
-from database import charts, comments
+from database import charts
 from helpers.session import get_session, Session
-
-from typing import List
+from helpers.trends import TREND_WINDOWS, scale_trend
+from helpers.responses import FastJSONResponse
+from helpers.http_cache import cache_headers, etag_matches, make_etag, not_modified
 
 router = APIRouter()
 
 
-def scale_trend(values: List[int]) -> List[int]:
-    """
-    Scale a list of cumulative totals into integers 1-100.
-    Day 1 maps to 1, last day maps to 100 (or less if flat).
-    """
-    if not values:
-        return [1] * 7  # fallback if empty
-
-    min_val = min(values)
-    max_val = max(values)
-
-    if max_val == min_val:
-        # All values equal → return all 1s
-        return [1] * len(values)
-
-    scaled = [
-        max(1, int(round(1 + 99 * (v - min_val) / (max_val - min_val)))) for v in values
-    ]
-    return scaled
-
-
 @router.get("/")
-async def main(request: Request, id: str, session: Session = get_session()):
+async def main(
+    request: Request,
+    id: str,
+    days: int = 7,
+    session: Session = get_session(),
+):
     # exposed to public
     # no authentication needed
     # however, if they are authed
@@ -45,32 +28,46 @@ async def main(request: Request, id: str, session: Session = get_session()):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid chart ID."
         )
-
-    query_likes = charts.fetch_chart_like_trend(id)
-    query_comments = comments.fetch_chart_comment_trend(id)
-
-    async def _fetch_likes():
-        async with app.db_acquire() as conn:
-            return await conn.fetch(query_likes)
-
-    async def _fetch_comments():
-        async with app.db_acquire() as conn:
-            return await conn.fetch(query_comments)
-
-    result, result2 = await asyncio.gather(_fetch_likes(), _fetch_comments())
-
-    if not result:
+    if days not in TREND_WINDOWS:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail=f"Chart not found."
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid trend window."
         )
 
+    async with app.db_acquire() as conn:
+        version = await conn.fetchrow(charts.get_chart_version(id))
+        if not version:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail=f"Chart not found."
+            )
+
+        # Likes and comments move the counts and the stats rows together, a
+        # new day shifts the window. A like swapped for another on a
+        # different day still moves log_like_score.
+        etag = make_etag(
+            id,
+            days,
+            version.today,
+            version.like_count,
+            version.comment_count,
+            version.log_like_score,
+        )
+        # same for everyone
+        headers = cache_headers(app, "trends", etag, private=False)
+        if etag_matches(request, etag):
+            return not_modified(headers)
+
+        result = await conn.fetch(charts.fetch_chart_trend(id, days))
+
     likes_totals = [row.total_likes for row in result]
-    comments_totals = [row.total_comments for row in result2]
+    comments_totals = [row.total_comments for row in result]
 
     likes_scaled = scale_trend(likes_totals)
     comments_scaled = scale_trend(comments_totals)
 
-    return {
-        "likes": likes_scaled,
-        "comments": comments_scaled,
-    }
+    return FastJSONResponse(
+        {
+            "likes": likes_scaled,
+            "comments": comments_scaled,
+        },
+        headers=headers,
+    )
@@ -0,0 +1,51 @@
+import asyncio, time
+
+from fastapi import APIRouter, Request, HTTPException, status, Query
+
+from database import upload_jobs
+from helpers.session import get_session, Session
+from core import ChartFastAPI
+
+router = APIRouter()
+
+# longest a client may hold the request waiting for the job to finish
+MAX_WAIT = 30
+
+
+@router.get("/")
+async def main(
+    request: Request,
+    id: str,
+    wait: int = Query(0, ge=0, le=MAX_WAIT),
+    session: Session = get_session(enforce_auth=True),
+):
+    app: ChartFastAPI = request.app
+
+    if len(id) != 32 or not id.isalnum():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid chart ID."
+        )
+
+    query = upload_jobs.get_upload_job(id, session.sonolus_id)
+    deadline = time.monotonic() + wait
+
+    while True:
+        async with app.db_acquire() as conn:
+            job = await conn.fetchrow(query)
+
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found."
+            )
+        if job.status in ("done", "failed") or time.monotonic() >= deadline:
+            break
+        # don't hold a db connection while waiting
+        await asyncio.sleep(1)
+
+    return {
+        "id": job.chart_id,
+        "status": job.status,
+        "error": job.error,
+        "created_at": job.created_at.isoformat(),
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
@@ -3,6 +3,7 @@ from core import ChartFastAPI
 
 from fastapi import APIRouter, Request, HTTPException, status
 from helpers.session import get_session, Session
+from helpers.shared_cache import chart_tag
 
 from database import charts, leaderboards, staff_actions
 
@@ -81,6 +82,7 @@ async def main(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f'Chart with ID "{id}" not found for this user.',
             )
+        await app.cache.invalidate(chart_tag(id))
 
         d = result.model_dump()
 
@@ -125,7 +127,7 @@ async def main(
                 .set_color(color)
             )
             wmsg.add_embed(wembed)
-            await wmsg.send()
+            app.webhooks.enqueue(wmsg)
         if user.mod:
             d["mod"] = True
         if user.sonolus_id == d["author"]:
@@ -159,6 +161,10 @@ async def main(
     async with app.db_acquire() as conn:
         result = await conn.fetchrow(query)
         if result:
+            app.count_cache.clear()
+            app.chart_pool.mark_stale()
+            app.record_pool.mark_stale()
+            await app.cache.invalidate(chart_tag(id))
             await conn.execute(
                 leaderboards.update_leaderboard_visibility(
                     chart_id=id, status=data.status
@@ -206,7 +212,7 @@ async def main(
                     )
                 )
                 wmsg.add_embed(wembed)
-                await wmsg.send()
+                app.webhooks.enqueue(wmsg)
             if user.mod:
                 d["mod"] = True
             if user.sonolus_id == d["author"]:
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Request, HTTPException, status
+from core import ChartFastAPI
+
+router = APIRouter()
+
+
+@router.get("/")
+async def main(request: Request):
+    # per-worker, so numbers only describe whichever worker answered
+    app: ChartFastAPI = request.app
+
+    if request.headers.get(app.auth_header) != app.auth:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="why?")
+
+    return {
+        "session_cache": app.session_cache.stats(),
+        "count_cache": app.count_cache.stats(),
+        "shared_cache": app.cache.stats(),
+        "chart_pool": app.chart_pool.stats(),
+        "record_pool": app.record_pool.stats(),
+        "cpu": {"in_flight": app.cpu_in_flight, "tasks": app.cpu_stats},
+        "webhooks": app.webhooks.stats(),
+        "statements": app.statements.stats(),
+        "changes": app.changes.stats() if app.changes else None,
+    }
@@ -40,6 +40,7 @@ async def lifespan(app: ChartFastAPI):
         load_routes(folder, cleanup=debug)
         print("Routes loaded!")
     yield
+    await app.shutdown()
 
 
 if debug:
@@ -1,12 +1,20 @@
-import asyncio, hashlib, base64, hmac
+import asyncio, hashlib, base64, hmac, time, multiprocessing
 from fastapi import FastAPI, Request
 from fastapi import status, HTTPException
 from fastapi.responses import JSONResponse
 from helpers.config_loader import ConfigType
 from helpers.models import SessionKeyData, ExternalLoginKeyData
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from contextlib import asynccontextmanager
-from database import DBConnWrapper
+from database import DBConnWrapper, StatementRegistry, charts, leaderboards
+from helpers.session_cache import SessionCache
+from helpers.count_cache import CountCache
+from helpers.shared_cache import SharedCache, account_tag, chart_tag
+from helpers.change_feed import ChangeEvent, ChangeFeed
+from helpers.random_pool import RandomPool
+from helpers.audio import CbrEncoder
+from helpers.webhook_handler import WebhookDispatcher
+from helpers.responses import FastJSONResponse
 import aioboto3
 import asyncpg
 from typing import Union
@@ -14,13 +22,25 @@ from typing import Union
 from authlib.integrations.starlette_client import OAuth
 
 
+def _timed_call(func, args, kwargs):
+    # runs inside the CPU pool process, so the time excludes queueing
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
 class ChartFastAPI(FastAPI):
     def __init__(self, config: ConfigType, *args, **kwargs):
+        kwargs.setdefault("default_response_class", FastJSONResponse)
         super().__init__(*args, **kwargs)
         self.config: ConfigType = config
         self.debug: bool = config["server"].get("debug", False)
 
         self.executor: ThreadPoolExecutor | None = None
+        self.cpu_executor: ProcessPoolExecutor | None = None
+        self.cpu_queue_depth: int = 0
+        self.cpu_in_flight: int = 0
+        self.cpu_stats: dict[str, dict] = {}
         self.s3_session: aioboto3.Session | None = None
         self.s3_session_getter: callable | None = None
         self.s3_bucket: str | None = None
@@ -29,15 +49,41 @@ class ChartFastAPI(FastAPI):
         self.auth_header: str | None = None
         self.token_secret_key: str | None = None
         self.db: asyncpg.Pool | None = None
+        self.session_cache: SessionCache | None = None
+        self.count_cache: CountCache | None = None
+        self.cache: SharedCache | None = None
+        self.changes: ChangeFeed | None = None
+        self.chart_pool: RandomPool | None = None
+        self.record_pool: RandomPool | None = None
+        self.cbr_encoder: CbrEncoder | None = None
+        self.webhooks: WebhookDispatcher | None = None
 
         self.oauth: OAuth | None = None
 
         self.exception_handlers.setdefault(HTTPException, self.http_exception_handler)
 
-    async def init(self) -> None:
-        """Initialize all resources after worker process starts."""
+    async def init(self, change_feed: bool = True) -> None:
+        """
+        Initialize all resources after worker process starts.
+        change_feed: listen for chart changes (see helpers.change_feed).
+        """
         self.executor = ThreadPoolExecutor(max_workers=32)
 
+        # per uvicorn worker. spawn, not fork: this process already has threads
+        self.cpu_executor = ProcessPoolExecutor(
+            max_workers=self.config["server"].get("cpu-workers", 2),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        self.cpu_queue_depth = self.config["server"].get("cpu-queue-depth", 8)
+        self.cbr_encoder = CbrEncoder(
+            concurrency=self.config["server"].get("ffmpeg-concurrency", 2),
+            timeout=self.config["server"].get("ffmpeg-timeout", 60),
+            executor=self.executor,
+        )
+
+        self.webhooks = WebhookDispatcher()
+        self.webhooks.start()
+
         self.s3_session = aioboto3.Session(
             aws_access_key_id=self.config["s3"]["access-key-id"],
             aws_secret_access_key=self.config["s3"]["secret-access-key"],
@@ -54,7 +100,22 @@ class ChartFastAPI(FastAPI):
         self.auth_header = self.config["server"]["auth-header"]
         self.token_secret_key = self.config["server"]["token-secret-key"]
 
+        self.session_cache = SessionCache(
+            max_ttl=self.config["server"].get("session-cache-ttl", 60),
+            max_size=self.config["server"].get("session-cache-size", 10000),
+        )
+        self.count_cache = CountCache(
+            ttl=self.config["server"].get("count-cache-ttl", 30),
+        )
+        self.cache = SharedCache.from_config(self.config.get("cache", {}))
+        pool_refresh = self.config["server"].get("random-pool-refresh", 60)
+        self.chart_pool = RandomPool(charts.get_random_pool_chart_ids(), pool_refresh)
+        self.record_pool = RandomPool(
+            leaderboards.get_random_pool_record_ids(), pool_refresh
+        )
+
         psql_config = self.config["psql"]
+        self.statements = StatementRegistry()
         self.db = await asyncpg.create_pool(
             host=psql_config["host"],
             user=psql_config["user"],
@@ -64,12 +125,63 @@ class ChartFastAPI(FastAPI):
             min_size=psql_config["pool-min-size"],
             max_size=psql_config["pool-max-size"],
             ssl="disable",  # XXX: todo, lazy for now
+            # keyed on the text DBConnWrapper canonicalizes, see self.statements
+            statement_cache_size=psql_config.get("statement-cache-size", 256),
         )
 
+        if change_feed and psql_config.get("change-feed", True):
+            self.changes = ChangeFeed(psql_config)
+            self.changes.subscribe(
+                self._apply_change,
+                tables={
+                    "charts",
+                    "chart_likes",
+                    "comments",
+                    "accounts",
+                    "account_sessions",
+                },
+            )
+            await self.changes.start()
+
+    async def _apply_change(self, event: ChangeEvent) -> None:
+        """
+        Keep this worker's caches in step with changes from anywhere: other
+        workers, worker.py, pg_cron publishes, manual SQL.
+        """
+        if event.op == "RESET":
+            self.session_cache.clear()
+            self.count_cache.clear()
+            self.chart_pool.mark_stale()
+            self.record_pool.mark_stale()
+            return
+
+        if event.table == "charts" and event.listing_changed:
+            self.count_cache.clear()
+            self.chart_pool.mark_stale()
+            if event.status is not None:
+                # leaderboards.public_chart follows the status
+                self.record_pool.mark_stale()
+
+        # a shared backend's tags only need bumping by one worker
+        bump = not self.cache.shared or self.changes.leader
+
+        if event.sonolus_id:
+            # bans, staff changes, evicted sessions... reach every worker
+            self.session_cache.invalidate_account(event.sonolus_id)
+            if event.table == "accounts" and bump:
+                await self.cache.invalidate(account_tag(event.sonolus_id))
+
+        if event.chart_id and bump:
+            await self.cache.invalidate(chart_tag(event.chart_id))
+
     @asynccontextmanager
     async def db_acquire(self):
         async with self.db.acquire() as conn:
-            yield DBConnWrapper(conn)
+            yield DBConnWrapper(
+                conn,
+                self.statements,
+                self.config["server"].get("validate-db-rows", False),
+            )
 
     def decode_key(
         self, session_key: str
@@ -98,6 +210,64 @@ class ChartFastAPI(FastAPI):
             self.executor, lambda: func(*args, **kwargs)
         )
 
+    async def run_cpu(self, func, *args, **kwargs):
+        """
+        Run CPU-heavy work (PIL, chart conversion) in the process pool, off this
+        worker's GIL. func and its arguments must be picklable, so top-level
+        functions only. Raises 429 once cpu-queue-depth tasks are in flight.
+        """
+        if not self.cpu_executor:
+            raise RuntimeError("Executor not initialized. Call init() first.")
+
+        stats = self.cpu_stats.setdefault(
+            func.__name__,
+            {
+                "calls": 0,
+                "rejected": 0,
+                "errors": 0,
+                "run_time": 0.0,
+                "wait_time": 0.0,
+                "max_run_time": 0.0,
+            },
+        )
+        if self.cpu_in_flight >= self.cpu_queue_depth:
+            stats["rejected"] += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Server is busy processing files, try again shortly.",
+            )
+
+        self.cpu_in_flight += 1
+        start = time.perf_counter()
+        try:
+            result, run_time = await asyncio.get_event_loop().run_in_executor(
+                self.cpu_executor, _timed_call, func, args, kwargs
+            )
+        except Exception:
+            stats["errors"] += 1
+            raise
+        finally:
+            self.cpu_in_flight -= 1
+
+        stats["calls"] += 1
+        stats["run_time"] += run_time
+        stats["wait_time"] += time.perf_counter() - start - run_time
+        stats["max_run_time"] = max(stats["max_run_time"], run_time)
+        return result
+
+    async def shutdown(self) -> None:
+        """Release worker-owned resources, called when the lifespan ends."""
+        if self.changes:
+            await self.changes.close()
+        if self.webhooks:
+            await self.webhooks.close()
+        if self.cache:
+            await self.cache.close()
+        if self.cpu_executor:
+            self.cpu_executor.shutdown(wait=False, cancel_futures=True)
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
     async def http_exception_handler(self, request: Request, exc: HTTPException):
         if exc.status_code < 500 and exc.status_code != 422:
             return JSONResponse(
@@ -4,8 +4,13 @@ from . import comments
 from . import external
 from . import leaderboards
 from . import staff_actions
+from . import blobs
+from . import jacket_renders
+from . import upload_jobs
 
 from .query import SelectQuery, ExecutableQuery
+from .statements import StatementRegistry
+from .hydration import hydrate
 
 from asyncpg import Connection
 from typing import TypeVar, Optional
@@ -14,23 +19,35 @@ T = TypeVar("T")
 
 
 class DBConnWrapper:
-    def __init__(self, conn: Connection):
+    def __init__(
+        self,
+        conn: Connection,
+        statements: StatementRegistry,
+        validate_rows: bool = False,
+    ):
         self.conn = conn
+        self.statements = statements
+        # trusted rows skip pydantic validation unless set, see database/hydration.py
+        self.validate_rows = validate_rows
 
     async def execute(self, query: ExecutableQuery):
-        return await self.conn.execute(query.sql, *query.args)
+        return await self.statements.run(self.conn, "execute", query.sql, query.args)
 
     async def fetch(self, query: SelectQuery[T]) -> Optional[list[T]]:
-        fetch_result = await self.conn.fetch(query.sql, *query.args)
+        fetch_result = await self.statements.run(
+            self.conn, "fetch", query.sql, query.args
+        )
 
         if not fetch_result:
             return []
 
-        return [query.model.model_validate(dict(x)) for x in fetch_result]
+        return [hydrate(query.model, x, self.validate_rows) for x in fetch_result]
 
     async def fetchrow(self, query: SelectQuery[T]) -> Optional[T]:
-        fetch_result = await self.conn.fetchrow(query.sql, *query.args)
+        fetch_result = await self.statements.run(
+            self.conn, "fetchrow", query.sql, query.args
+        )
         if not fetch_result:
             return None
 
-        return query.model.model_validate(dict(fetch_result))
+        return hydrate(query.model, fetch_result, self.validate_rows)
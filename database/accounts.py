@@ -8,6 +8,7 @@ from helpers.models import (
     PublicAccount,
     SessionData,
     Account,
+    SessionAccount,
     Notification,
     NotificationList,
     Count,
@@ -15,20 +16,18 @@ from helpers.models import (
 )
 
 """
-sonolus_sessions JSONB
+account_sessions
 
-{
-    "game": {
-        "1": {"session_key": "same as key", "expires": epoch in ms},
-        "2": ...,
-        "3": ...
-    },
-    "external": {
-        same as above
-    }
-}
+One row per issued session, keyed on the "id" inside the signed session key.
+Each account keeps at most MAX_SESSIONS_PER_TYPE live sessions per type
+("game" / "external"); issuing another evicts expired ones, then the oldest.
+
+accounts.sonolus_sessions is the legacy JSONB store, copied over by
+scripts/migrate_account_sessions.py. Nothing reads it anymore.
 """
 
+MAX_SESSIONS_PER_TYPE = 3
+
 """
 oauth_details JSONB
 
@@ -108,6 +107,7 @@ def generate_create_account_query(
 
 
 def create_account_if_not_exists_and_new_session(
+    session_id: str,
     session_key: str,
     sonolus_id: str,
     sonolus_handle: int,
@@ -116,10 +116,11 @@ def create_account_if_not_exists_and_new_session(
     expiry_ms: int = 30 * 60 * 1000,
 ) -> tuple[ExecutableQuery, SelectQuery[SessionData]]:
     """
-    Create or update an account, then create a new session slot.
-    Returns two SelectQuery objects:
+    Create or update an account, then create a new session.
+    Returns two queries:
       1. Upsert account (always updates username/handle)
-      2. Update session slot and return session_key & expires
+      2. Insert the session, evict expired/oldest sessions of the same
+         type, and return session_key & expires
     """
     if session_type not in ("game", "external"):
         raise ValueError("invalid session type. must be 'game' or 'external'.")
@@ -130,9 +131,9 @@ def create_account_if_not_exists_and_new_session(
     )
 
     upsert_query = ExecutableQuery(
-        f"""
-        INSERT INTO accounts (sonolus_id, sonolus_handle, sonolus_username, sonolus_sessions)
-        VALUES ($1, $2, $3, jsonb_build_object('game','{{}}'::jsonb,'external','{{}}'::jsonb))
+        """
+        INSERT INTO accounts (sonolus_id, sonolus_handle, sonolus_username)
+        VALUES ($1, $2, $3)
         ON CONFLICT (sonolus_id) DO UPDATE
         SET sonolus_username = EXCLUDED.sonolus_username;
         """,
@@ -141,47 +142,39 @@ def create_account_if_not_exists_and_new_session(
         sonolus_username,
     )
 
+    # the DELETE runs against the snapshot from before the INSERT,
+    # so the new session is excluded explicitly and counted in the limit
     session_query = SelectQuery(
         SessionData,
         f"""
-        WITH slot_to_use AS (
-            SELECT
-                CASE
-                    WHEN jsonb_extract_path(sonolus_sessions, $2, '1') IS NULL OR
-                        (jsonb_extract_path(sonolus_sessions, $2, '1')->>'expires')::bigint < extract(epoch from now())*1000
-                    THEN '1'
-                    WHEN jsonb_extract_path(sonolus_sessions, $2, '2') IS NULL OR
-                        (jsonb_extract_path(sonolus_sessions, $2, '2')->>'expires')::bigint < extract(epoch from now())*1000
-                    THEN '2'
-                    WHEN jsonb_extract_path(sonolus_sessions, $2, '3') IS NULL OR
-                        (jsonb_extract_path(sonolus_sessions, $2, '3')->>'expires')::bigint < extract(epoch from now())*1000
-                    THEN '3'
-                    ELSE (
-                        SELECT key
-                        FROM jsonb_each(jsonb_extract_path(sonolus_sessions, $2)) AS t(key,val)
-                        ORDER BY (val->>'expires')::bigint ASC
-                        LIMIT 1
-                    )
-                END AS slot
-            FROM accounts
-            WHERE sonolus_id=$1
-        )
-        UPDATE accounts a
-        SET sonolus_sessions = jsonb_set(
-            a.sonolus_sessions,
-            array[$2, s.slot],
-            jsonb_build_object(
-                'session_key', $3::text,
-                'expires', $4::bigint
-            ),
-            true
+        WITH new_session AS (
+            INSERT INTO account_sessions (id, sonolus_id, type, session_key, expires)
+            VALUES ($1::uuid, $2, $3, $4, $5)
+            ON CONFLICT (id) DO UPDATE
+            SET session_key = EXCLUDED.session_key,
+                expires = EXCLUDED.expires
+            WHERE account_sessions.sonolus_id = EXCLUDED.sonolus_id
+                AND account_sessions.type = EXCLUDED.type
+            RETURNING session_key, expires
+        ), evicted AS (
+            DELETE FROM account_sessions s
+            USING (
+                SELECT
+                    id,
+                    expires,
+                    ROW_NUMBER() OVER (ORDER BY expires DESC) AS newest
+                FROM account_sessions
+                WHERE sonolus_id = $2 AND type = $3 AND id <> $1::uuid
+            ) old
+            WHERE s.id = old.id
+                AND (
+                    old.newest > {MAX_SESSIONS_PER_TYPE - 1}
+                    OR old.expires <= EXTRACT(EPOCH FROM NOW()) * 1000
+                )
         )
-        FROM slot_to_use s
-        WHERE a.sonolus_id=$1
-        RETURNING 
-            (jsonb_extract_path(a.sonolus_sessions, $2, s.slot)->>'session_key')::text AS session_key,
-            (jsonb_extract_path(a.sonolus_sessions, $2, s.slot)->>'expires')::bigint AS expires;
+        SELECT session_key, expires FROM new_session;
         """,
+        session_id,
         sonolus_id,
         session_type,
         session_key,
@@ -204,25 +197,26 @@ def get_account_from_handle(handle: int) -> SelectQuery[Account]:
 
 
 def get_account_from_session(
-    sonolus_id: str, session_key: str, session_type: str
-) -> SelectQuery[Account]:
+    sonolus_id: str, session_id: str, session_key: str, session_type: str
+) -> SelectQuery[SessionAccount]:
     assert session_type in ["game", "external"]
 
     return SelectQuery(
-        Account,
-        f"""
-            SELECT *
-            FROM accounts
-            WHERE sonolus_id = $1
-            AND EXISTS (
-                SELECT 1
-                FROM jsonb_each(COALESCE(sonolus_sessions->'{session_type}', '{{}}'::jsonb)) AS sessions(slot, data)
-                WHERE data->>'session_key' = $2::text
-                    AND (data->>'expires')::bigint > EXTRACT(EPOCH FROM NOW()) * 1000
-            )
+        SessionAccount,
+        """
+            SELECT a.*, s.expires AS session_expires
+            FROM account_sessions s
+            JOIN accounts a ON a.sonolus_id = s.sonolus_id
+            WHERE s.id = $1::uuid
+                AND s.sonolus_id = $2
+                AND s.type = $3
+                AND s.session_key = $4
+                AND s.expires > EXTRACT(EPOCH FROM NOW()) * 1000
             LIMIT 1;
         """,
+        session_id,
         sonolus_id,
+        session_type,
         session_key,
     )
 
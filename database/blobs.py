@@ -0,0 +1,58 @@
+from database.query import ExecutableQuery, SelectQuery
+from helpers.models import Blob
+
+"""
+blobs
+
+One row per distinct chart file (by sha1) with an S3 object known to hold it,
+used as the source of server-side copies instead of uploading the same bytes
+again. Objects stay per chart ({author}/{chart_id}/{hash}, clients build
+asset URLs from that) and go with their chart; trg_forget_released_blobs
+moves a row's key to another chart holding the same file once its object is
+released, or drops the row if no chart holds it anymore.
+"""
+
+
+def get_blobs(hashes: list[str]) -> SelectQuery[Blob]:
+    return SelectQuery(
+        Blob,
+        """
+            SELECT hash, size, key
+            FROM blobs
+            WHERE hash = ANY($1::text[]);
+        """,
+        hashes,
+    )
+
+
+def register_blobs(
+    hashes: list[str], sizes: list[int], keys: list[str]
+) -> ExecutableQuery:
+    """
+    Record size and a copy source for blobs just written to S3. Run in the
+    transaction that stores the chart's hashes, so keys of a chart that was
+    never created aren't offered.
+    """
+    return ExecutableQuery(
+        """
+            INSERT INTO blobs (hash, size, key)
+            SELECT * FROM unnest($1::text[], $2::bigint[], $3::text[])
+            ON CONFLICT (hash) DO UPDATE
+            SET size = COALESCE(blobs.size, EXCLUDED.size);
+        """,
+        hashes,
+        sizes,
+        keys,
+    )
+
+
+def forget_blob_key(hash: str, key: str) -> ExecutableQuery:
+    """Drop a copy source that turned out to be gone."""
+    return ExecutableQuery(
+        """
+            DELETE FROM blobs
+            WHERE hash = $1 AND key = $2;
+        """,
+        hash,
+        key,
+    )
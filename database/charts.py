@@ -10,8 +10,11 @@ from helpers.models import (
     DBID,
     ChartByIDLiked,
     ChartDBResponseLiked,
-    ChartLikeTrend,
+    ChartTrend,
+    ChartVersion,
+    RandomPoolEntry,
 )
+from helpers.pagination import ChartListCursor, CURSOR_SORT_COLUMNS
 
 
 def create_chart(chart: Chart) -> SelectQuery[DBID]:
@@ -72,14 +75,25 @@ def get_chart_list(
         "abc",
         "random",
         "published_at",
+        "relevance",
     ] = "created_at",
     sort_order: Literal["desc", "asc"] = "desc",
     sonolus_id: Optional[str] = None,
     meta_includes: Optional[str] = None,
     owned_by: Optional[str] = None,
+    cursor: Optional[ChartListCursor] = None,
 ) -> tuple[
     SelectQuery[Count], SelectQuery[Union[ChartDBResponse, ChartDBResponseLiked]]
 ]:
+    """
+    Without a cursor, pages with LIMIT/OFFSET.
+
+    With a cursor (sort_by must be in CURSOR_SORT_COLUMNS), seeks past the
+    cursor row on (sort column, id) instead and ignores page. A cursor
+    without a value starts at the first row. Returns
+    items_per_page + 1 rows so the caller can tell if there are more; for
+    direction "prev" rows come back in reverse order.
+    """
     inner_select = """
         SELECT 
             c.id, 
@@ -110,22 +124,34 @@ def get_chart_list(
             c.scheduled_publish
     """
 
+    conditions = []
+    params: List = []
+
     if sonolus_id:
         inner_select += """,
             CASE WHEN cl.sonolus_id IS NULL THEN FALSE ELSE TRUE END AS liked
         """
 
+    if meta_includes:
+        params.append(meta_includes.lower())
+        search_placeholder = f"${len(params)}"
+        inner_select += f""",
+            ts_rank(cs.document, plainto_tsquery('simple', {search_placeholder}))
+                + word_similarity({search_placeholder}, cs.search_text) AS relevance
+        """
+
     inner_select += """
         FROM charts c
         JOIN accounts a ON c.author = a.sonolus_id
     """
 
+    if meta_includes or author_includes:
+        # search document maintained by trg_sync_chart_search
+        inner_select += " JOIN chart_search cs ON c.id = cs.chart_id"
+
     if liked_by:
         inner_select += " JOIN chart_likes clb ON c.id = clb.chart_id"
 
-    conditions = []
-    params: List = []
-
     if sonolus_id:
         params.append(sonolus_id)
         inner_select += f" LEFT JOIN chart_likes cl ON c.id = cl.chart_id AND cl.sonolus_id = ${len(params)}"
@@ -134,37 +160,35 @@ def get_chart_list(
         params.append(status)
         conditions.append(f"c.status = ${len(params)}::chart_status")
 
-    if staff_pick is not None:
-        params.append(staff_pick)
-        conditions.append(f"c.staff_pick = ${len(params)}::BOOL")
-
-    if min_rating is not None:
-        min_rating -= 1
-        params.append(min_rating)
-        conditions.append(f"c.rating > ${len(params)}")
-    if max_rating is not None:
-        max_rating += 1
-        params.append(max_rating)
-        conditions.append(f"c.rating < ${len(params)}")
+    # Plain value filters are always present, as ($n IS NULL OR ...), so
+    # their combinations share one statement shape (database/statements.py).
+    # Filters that add joins or can drive a GIN index (tags, text search)
+    # stay conditional, a generic plan couldn't use the index.
+    def optional_filter(value, cast: str, condition: str) -> None:
+        params.append(value)
+        param = f"${len(params)}::{cast}"
+        conditions.append(f"({param} IS NULL OR {condition.format(param)})")
+
+    optional_filter(staff_pick, "BOOL", "c.staff_pick = {}")
+    optional_filter(
+        min_rating - 1 if min_rating is not None else None,
+        "NUMERIC",
+        "c.rating > {}",
+    )
+    optional_filter(
+        max_rating + 1 if max_rating is not None else None,
+        "NUMERIC",
+        "c.rating < {}",
+    )
+    optional_filter(min_likes, "INT", "c.like_count >= {}")
+    optional_filter(max_likes, "INT", "c.like_count <= {}")
+    optional_filter(min_comments, "INT", "c.comment_count >= {}")
+    optional_filter(max_comments, "INT", "c.comment_count <= {}")
 
     if tags:
         params.append(tags)
         conditions.append(f"c.tags @> ${len(params)}::text[]")
 
-    if min_likes is not None:
-        params.append(min_likes)
-        conditions.append(f"c.like_count >= ${len(params)}")
-    if max_likes is not None:
-        params.append(max_likes)
-        conditions.append(f"c.like_count <= ${len(params)}")
-
-    if min_comments is not None:
-        params.append(min_comments)
-        conditions.append(f"c.comment_count >= ${len(params)}")
-    if max_comments is not None:
-        params.append(max_comments)
-        conditions.append(f"c.comment_count <= ${len(params)}")
-
     if liked_by:
         params.append(liked_by)
         conditions.append(f"clb.sonolus_id = ${len(params)}")
@@ -195,17 +219,13 @@ def get_chart_list(
         conditions.append(f"LOWER(c.artists) LIKE ${len(params)}")
     if author_includes:
         params.append(f"%{author_includes.lower()}%")
-        conditions.append(
-            f"LOWER(c.chart_author || '#' || a.sonolus_handle) LIKE ${len(params)}"
-        )
+        conditions.append(f"LOWER(cs.author_full) LIKE ${len(params)}")
     if meta_includes:
+        # word matches through the tsvector, substrings through the trigram index
         params.append(f"%{meta_includes.lower()}%")
-        placeholder = f"${len(params)}"
         conditions.append(
-            f"(LOWER(c.title) LIKE {placeholder} "
-            f"OR LOWER(c.description) LIKE {placeholder} "
-            f"OR LOWER(c.chart_author || '#' || a.sonolus_handle) LIKE {placeholder} "
-            f"OR LOWER(c.artists) LIKE {placeholder})"
+            f"(cs.document @@ plainto_tsquery('simple', {search_placeholder}) "
+            f"OR cs.search_text LIKE ${len(params)})"
         )
 
     if conditions:
@@ -220,6 +240,8 @@ def get_chart_list(
         "decaying_likes": "log_like_score",
         "abc": "title",
         "random": "RANDOM()",
+        # only meaningful with meta_includes
+        "relevance": "relevance" if meta_includes else "created_at",
     }.get(sort_by, "created_at")
 
     sort_order_sql = "DESC" if sort_order.lower() == "desc" else "ASC"
@@ -228,27 +250,90 @@ def get_chart_list(
         "AND published_at IS NOT NULL" if sort_column == "published_at" else ""
     )
 
-    query = f"""
-        WITH chart_data AS (
-            {inner_select}
-        )
-        SELECT *
-        FROM chart_data
-        WHERE 1=1 {filter_published_at_null}
-        ORDER BY {sort_column} {sort_order_sql}
-        LIMIT ${len(params) + 1} OFFSET ${len(params) + 2}
-    """
+    count_params = tuple(params)
 
-    count_query = f"""
-        WITH chart_data AS (
-            {inner_select}
-        )
-        SELECT COUNT(*) AS total_count FROM chart_data
-    """
+    if cursor:
+        sort_column = CURSOR_SORT_COLUMNS[sort_by]
+        # walking backwards is the same seek with everything flipped
+        descending = (sort_order_sql == "DESC") != (cursor.direction == "prev")
+        seek_order_sql = "DESC" if descending else "ASC"
+        cmp = "<" if descending else ">"
+
+        seek = ""
+        data_params = tuple(params)
+        if cursor.value is not None:
+            data_params += (cursor.value, cursor.id)
+            value_param, id_param = f"${len(params) + 1}", f"${len(params) + 2}"
+            # the plain bound on the sort column lets the single-column
+            # sort indexes (idx_charts_created_at etc.) serve the seek
+            seek = (
+                f"AND {sort_column} {cmp}= {value_param} "
+                f"AND ({sort_column}, id) {cmp} ({value_param}, {id_param})"
+            )
+        data_params += (items_per_page + 1,)
 
-    count_params = tuple(params)
+        query = f"""
+            WITH chart_data AS (
+                {inner_select}
+            )
+            SELECT *
+            FROM chart_data
+            WHERE 1=1 {seek} {filter_published_at_null}
+            ORDER BY {sort_column} {seek_order_sql}, id {seek_order_sql}
+            LIMIT ${len(data_params)}
+        """
+    else:
+        query = f"""
+            WITH chart_data AS (
+                {inner_select}
+            )
+            SELECT *
+            FROM chart_data
+            WHERE 1=1 {filter_published_at_null}
+            ORDER BY {sort_column} {sort_order_sql}
+            LIMIT ${len(params) + 1} OFFSET ${len(params) + 2}
+        """
+        data_params = tuple(params) + (items_per_page, page * items_per_page)
 
-    data_params = tuple(params) + (items_per_page, page * items_per_page)
+    only_status_filters = status and not any(
+        (
+            min_rating is not None,
+            max_rating is not None,
+            tags,
+            min_likes is not None,
+            max_likes is not None,
+            min_comments is not None,
+            max_comments is not None,
+            liked_by,
+            commented_by,
+            owned_by,
+            sonolus_handle_is,
+            title_includes,
+            description_includes,
+            artists_includes,
+            author_includes,
+            meta_includes,
+        )
+    )
+    if only_status_filters:
+        # maintained by trg_chart_status_counts, no need to scan charts
+        count_params = (status,)
+        staff_pick_filter = ""
+        if staff_pick is not None:
+            count_params += (staff_pick,)
+            staff_pick_filter = "AND staff_pick = $2::BOOL"
+        count_query = f"""
+            SELECT COALESCE(SUM(total), 0)::BIGINT AS total_count
+            FROM chart_status_counts
+            WHERE status = $1::chart_status {staff_pick_filter}
+        """
+    else:
+        count_query = f"""
+            WITH chart_data AS (
+                {inner_select}
+            )
+            SELECT COUNT(*) AS total_count FROM chart_data
+        """
 
     return (
         SelectQuery(Count, count_query, *count_params),
@@ -260,70 +345,16 @@ def get_chart_list(
     )
 
 
-def get_random_charts(
-    return_count: int,
-    sonolus_id: Optional[str] = None,
-    staff_pick: Optional[bool] = None,
-) -> SelectQuery[Union[ChartDBResponse, ChartDBResponseLiked]]:
-
-    base_query = """
-        SELECT 
-            c.id,
-            c.title,
-            c.author,
-            c.artists,
-            c.staff_pick,
-            c.description,
-            c.tags,
-            c.jacket_file_hash,
-            c.music_file_hash,
-            c.chart_file_hash,
-            c.preview_file_hash,
-            c.background_file_hash,
-            c.background_v3_file_hash,
-            c.background_v1_file_hash,
-            c.status,
-            c.rating,
-            c.like_count,
-            c.comment_count,
-            c.created_at,
-            c.published_at,
-            c.updated_at,
-            c.chart_author || '#' || a.sonolus_handle AS author_full,
-            a.sonolus_handle as author_handle,
-            c.chart_author AS chart_design,
-            c.scheduled_publish
-    """
-
-    params: list = [return_count]
-
-    if sonolus_id:
-        base_query += (
-            ", CASE WHEN cl.sonolus_id IS NULL THEN FALSE ELSE TRUE END AS liked"
-        )
-
-    base_query += """
-        FROM charts c
-        JOIN accounts a ON c.author = a.sonolus_id
-    """
-
-    if sonolus_id:
-        params.append(sonolus_id)
-        base_query += f"""
-            LEFT JOIN chart_likes cl ON c.id = cl.chart_id AND cl.sonolus_id = ${len(params)}
+def get_random_pool_chart_ids() -> SelectQuery[RandomPoolEntry]:
+    """Public chart IDs bucketed by staff pick, for helpers.random_pool."""
+    return SelectQuery(
+        RandomPoolEntry,
         """
-
-    base_query += " WHERE c.status = 'PUBLIC'"
-
-    if staff_pick is not None:
-        params.append(staff_pick)
-        base_query += f" AND c.staff_pick = ${len(params)}::bool"
-
-    base_query += " ORDER BY RANDOM() LIMIT $1"
-
-    if sonolus_id:
-        return SelectQuery(ChartDBResponseLiked, base_query, *params)
-    return SelectQuery(ChartDBResponse, base_query, *params)
+            SELECT id, COALESCE(staff_pick, FALSE) AS bucket
+            FROM charts
+            WHERE status = 'PUBLIC';
+        """,
+    )
 
 
 def get_chart_by_id(
@@ -365,7 +396,63 @@ def get_chart_by_id(
         return SelectQuery(ChartByID, query, *params)
 
 
-def get_chart_by_id_batch(chart_ids: list[str]) -> SelectQuery[ChartByID]:
+def get_chart_version(
+    chart_id: str, sonolus_id: Optional[str] = None
+) -> SelectQuery[ChartVersion]:
+    """
+    The columns get_chart_by_id responses change with, to answer
+    If-None-Match without building the chart. A primary key lookup.
+
+    Every UPDATE of a chart's own fields sets updated_at, likes and comments
+    move the counts (and log_like_score) through their triggers.
+    """
+    if sonolus_id:
+        liked = """EXISTS (
+                SELECT 1 FROM chart_likes cl
+                WHERE cl.chart_id = c.id AND cl.sonolus_id = $2
+            )"""
+        params = [chart_id, sonolus_id]
+    else:
+        liked = "NULL::boolean"
+        params = [chart_id]
+
+    return SelectQuery(
+        ChartVersion,
+        f"""
+            SELECT
+                c.id, c.author, c.status, c.staff_pick, c.like_count,
+                c.comment_count, c.log_like_score, c.updated_at,
+                {liked} AS liked,
+                CURRENT_DATE AS today
+            FROM charts c
+            WHERE c.id = $1;
+        """,
+        *params,
+    )
+
+
+def get_chart_by_id_batch(
+    chart_ids: list[str], sonolus_id: Optional[str] = None
+) -> SelectQuery[Union[ChartByID, ChartByIDLiked]]:
+    """
+    Same as get_chart_by_id, for many IDs. Order is not preserved.
+    """
+    if sonolus_id:
+        query = """
+            SELECT 
+                c.*,
+                c.chart_author || '#' || a.sonolus_handle AS author_full,
+                (cl.sonolus_id IS NOT NULL) AS liked,
+                c.chart_author AS chart_design,
+                a.sonolus_handle as author_handle
+            FROM charts c
+            JOIN accounts a ON c.author = a.sonolus_id
+            LEFT JOIN chart_likes cl 
+                ON c.id = cl.chart_id AND cl.sonolus_id = $2
+            WHERE c.id = ANY($1::text[]);
+        """
+        return SelectQuery(ChartByIDLiked, query, chart_ids, sonolus_id)
+
     query = """
         SELECT 
             c.*,
@@ -447,40 +534,31 @@ def update_metadata(
     if type(rating) == int:
         rating = float(rating)
 
-    set_fields = []
-    args = []
-
-    def add_field(field_name: str, value):
-        args.append(value)
-        set_fields.append(f"{field_name} = ${len(args)}")
-
-    if rating is not None:
-        add_field("rating", rating)
-    if chart_author is not None:
-        add_field("chart_author", chart_author)
-    if description is not None:
-        add_field("description", description)
-    elif update_none_description:
-        set_fields.append("description = NULL")
-    if title is not None:
-        add_field("title", title)
-    if artists is not None:
-        add_field("artists", artists)
-    if tags is not None:
-        add_field("tags", tags)
-
-    set_fields.append("updated_at = CURRENT_TIMESTAMP")
-
-    set_clause = ", ".join(set_fields)
-
-    args.append(chart_id)
-    query = f"""
+    # one statement shape whichever fields are set, NULL keeps the column
+    return ExecutableQuery(
+        """
         UPDATE charts
-        SET {set_clause}
-        WHERE id = ${len(args)};
-    """
-
-    return ExecutableQuery(query, *args)
+        SET rating = COALESCE($1::NUMERIC, rating),
+            chart_author = COALESCE($2::TEXT, chart_author),
+            description = CASE
+                WHEN $4::BOOL THEN NULL
+                ELSE COALESCE($3::TEXT, description)
+            END,
+            title = COALESCE($5::TEXT, title),
+            artists = COALESCE($6::TEXT, artists),
+            tags = COALESCE($7::TEXT[], tags),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = $8;
+        """,
+        rating,
+        chart_author,
+        description,
+        description is None and update_none_description,
+        title,
+        artists,
+        tags,
+        chart_id,
+    )
 
 
 def update_file_hash(
@@ -504,47 +582,37 @@ def update_file_hash(
         if not (v1_hash and v3_hash):
             raise ValueError("Must regenerate v1/v3 on jacket change")
 
-    set_fields = []
-    args = []
-
-    def add_field(field_name: str, value):
-        args.append(value)
-        set_fields.append(f"{field_name} = ${len(args)}")
-
-    if jacket_hash is not None:
-        add_field("jacket_file_hash", jacket_hash)
-    if v1_hash is not None:
-        add_field("background_v1_file_hash", v1_hash)
-    if v3_hash is not None:
-        add_field("background_v3_file_hash", v3_hash)
-    if music_hash is not None:
-        add_field("music_file_hash", music_hash)
-    if chart_hash is not None:
-        add_field("chart_file_hash", chart_hash)
-    if preview_hash is not None:
-        add_field("preview_file_hash", preview_hash)
-    elif update_none_preview:
-        set_fields.append("preview_file_hash = NULL")
-    if background_hash is not None:
-        add_field("background_file_hash", background_hash)
-    elif update_none_background:
-        set_fields.append("background_file_hash = NULL")
-
-    set_fields.append("updated_at = CURRENT_TIMESTAMP")
-
-    if not set_fields:
-        raise ValueError("At least one file hash must be updated.")
-
-    set_clause = ", ".join(set_fields)
-
-    args.append(chart_id)
-    query = f"""
+    # one statement shape whichever hashes are set, NULL keeps the column
+    return ExecutableQuery(
+        """
         UPDATE charts
-        SET {set_clause}
-        WHERE id = ${len(args)};
-    """
-
-    return ExecutableQuery(query, *args)
+        SET jacket_file_hash = COALESCE($1::TEXT, jacket_file_hash),
+            background_v1_file_hash = COALESCE($2::TEXT, background_v1_file_hash),
+            background_v3_file_hash = COALESCE($3::TEXT, background_v3_file_hash),
+            music_file_hash = COALESCE($4::TEXT, music_file_hash),
+            chart_file_hash = COALESCE($5::TEXT, chart_file_hash),
+            preview_file_hash = CASE
+                WHEN $7::BOOL THEN NULL
+                ELSE COALESCE($6::TEXT, preview_file_hash)
+            END,
+            background_file_hash = CASE
+                WHEN $9::BOOL THEN NULL
+                ELSE COALESCE($8::TEXT, background_file_hash)
+            END,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = $10;
+        """,
+        jacket_hash,
+        v1_hash,
+        v3_hash,
+        music_hash,
+        chart_hash,
+        preview_hash,
+        preview_hash is None and update_none_preview,
+        background_hash,
+        background_hash is None and update_none_background,
+        chart_id,
+    )
 
 
 def add_like(chart_id: str, sonolus_id: str) -> ExecutableQuery:
@@ -751,30 +819,48 @@ def update_scheduled_publish(
 
 
 # trend
-def fetch_chart_like_trend(chart_id: str) -> SelectQuery[ChartLikeTrend]:
+def fetch_chart_trend(chart_id: str, days: int) -> SelectQuery[ChartTrend]:
+    """
+    Running like/comment totals for each of the last `days` days, from
+    chart_daily_stats: today's total is the chart's count, each earlier day
+    subtracts what was added after it. Reads at most `days` stats rows.
+    """
     return SelectQuery(
-        ChartLikeTrend,
+        ChartTrend,
         """
         WITH days AS (
             SELECT
                 generate_series(
-                    CURRENT_DATE - INTERVAL '6 days',
+                    CURRENT_DATE - ($2::int - 1) * INTERVAL '1 day',
                     CURRENT_DATE,
                     INTERVAL '1 day'
                 )::date AS day
+        ),
+        daily AS (
+            SELECT day, likes, comments
+            FROM chart_daily_stats
+            WHERE chart_id = $1 AND day > CURRENT_DATE - $2::int
         )
         SELECT
             d.day,
-            COUNT(cl.chart_id) AS total_likes
+            COALESCE(
+                ch.like_count - (
+                    SELECT COALESCE(SUM(s.likes), 0) FROM daily s WHERE s.day > d.day
+                ),
+                0
+            ) AS total_likes,
+            COALESCE(
+                ch.comment_count - (
+                    SELECT COALESCE(SUM(s.comments), 0) FROM daily s WHERE s.day > d.day
+                ),
+                0
+            ) AS total_comments
         FROM days d
         LEFT JOIN charts ch
             ON ch.id = $1
             AND ch.status <> 'PRIVATE'
-        LEFT JOIN chart_likes cl
-            ON cl.chart_id = ch.id
-            AND cl.created_at::date <= d.day
-        GROUP BY d.day
         ORDER BY d.day ASC;
         """,
         chart_id,
+        days,
     )
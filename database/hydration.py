@@ -0,0 +1,110 @@
+from typing import Any, Callable, Mapping, NamedTuple, Optional, TypeVar
+
+from pydantic import BaseModel
+from pydantic_core import PydanticUndefined
+
+from helpers.models import (
+    ChartDBResponse,
+    Comment,
+    Count,
+    PublicAccount,
+    coerce_rating,
+)
+
+T = TypeVar("T", bound=BaseModel)
+
+RowHook = Callable[[dict], dict]
+
+# Models (and subclasses that add no validators) built straight from DB rows,
+# skipping validation. Only models whose fields are all plain column values
+# asyncpg already returns with the right types; the hook does what the
+# model's "before" validator would. Anything else is validated.
+TRUSTED_ROWS: dict[type[BaseModel], Optional[RowHook]] = {
+    ChartDBResponse: coerce_rating,
+    Comment: None,
+    PublicAccount: None,
+    Count: None,
+}
+
+
+class _Builder(NamedTuple):
+    names: frozenset[str]
+    defaults: dict[str, Any]
+    factories: dict[str, Callable[[], Any]]
+    hook: Optional[RowHook]
+
+
+# model -> _Builder, or None when it has to be validated
+_builders: dict[type[BaseModel], Optional[_Builder]] = {}
+
+_setattr = object.__setattr__
+
+
+def _validator_count(model: type[BaseModel]) -> int:
+    decorators = model.__pydantic_decorators__
+    return len(decorators.field_validators) + len(decorators.model_validators)
+
+
+def _builder(model: type[BaseModel]) -> Optional[_Builder]:
+    for base in model.__mro__:
+        if base in TRUSTED_ROWS:
+            # e.g. Account extends PublicAccount with JSON parsing
+            if _validator_count(model) != _validator_count(base):
+                return None
+            fields = model.model_fields
+            return _Builder(
+                names=frozenset(fields),
+                defaults={
+                    name: info.default
+                    for name, info in fields.items()
+                    if info.default is not PydanticUndefined
+                },
+                factories={
+                    name: info.default_factory
+                    for name, info in fields.items()
+                    if info.default_factory is not None
+                },
+                hook=TRUSTED_ROWS[base],
+            )
+    return None
+
+
+def _construct(model: type[T], builder: _Builder, record: Mapping) -> T:
+    # model_construct without the per-call field introspection, which makes
+    # it slower than model_validate (pydantic-core) for wide rows
+    values = dict(record)
+    if values.keys() == builder.names:
+        fields_set = set(values)
+    else:
+        # extra columns (SELECT c.*) or fields left to their defaults
+        for name in values.keys() - builder.names:
+            del values[name]
+        fields_set = set(values)
+        for name in builder.names - fields_set:
+            if name in builder.factories:
+                values[name] = builder.factories[name]()
+            elif name in builder.defaults:
+                values[name] = builder.defaults[name]
+            else:
+                # not selected, let validation say which field is missing
+                return model.model_validate(dict(record))
+    if builder.hook:
+        values = builder.hook(values)
+
+    instance = model.__new__(model)
+    _setattr(instance, "__dict__", values)
+    _setattr(instance, "__pydantic_fields_set__", fields_set)
+    _setattr(instance, "__pydantic_extra__", None)
+    _setattr(instance, "__pydantic_private__", None)
+    return instance
+
+
+def hydrate(model: type[T], record: Mapping, validate: bool = False) -> T:
+    """A DB row as `model`. validate=True always runs full validation."""
+    if not validate:
+        if model not in _builders:
+            _builders[model] = _builder(model)
+        builder = _builders[model]
+        if builder:
+            return _construct(model, builder, record)
+    return model.model_validate(dict(record))
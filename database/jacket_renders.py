@@ -0,0 +1,52 @@
+from database.query import ExecutableQuery, SelectQuery
+from helpers.models import JacketRender
+
+"""
+jacket_renders
+
+Maps the sha1 of an uploaded jacket and the PNG compress level to the hashes
+of what generate_backgrounds_resize_jacket made from them, so the same jacket
+is only rendered once per level. The rendered files themselves are found
+through blobs.
+"""
+
+
+def get_jacket_render(
+    source_hash: str, compress_level: int
+) -> SelectQuery[JacketRender]:
+    """Only returns renders whose three files all have a row in blobs."""
+    return SelectQuery(
+        JacketRender,
+        """
+            SELECT r.source_hash, r.compress_level, r.jacket_hash, r.v1_hash,
+                r.v3_hash, j.key AS jacket_key, v1.key AS v1_key, v3.key AS v3_key
+            FROM jacket_renders r
+            JOIN blobs j ON j.hash = r.jacket_hash
+            JOIN blobs v1 ON v1.hash = r.v1_hash
+            JOIN blobs v3 ON v3.hash = r.v3_hash
+            WHERE r.source_hash = $1 AND r.compress_level = $2;
+        """,
+        source_hash,
+        compress_level,
+    )
+
+
+def add_jacket_render(render: JacketRender) -> ExecutableQuery:
+    return ExecutableQuery(
+        """
+            INSERT INTO jacket_renders (
+                source_hash, compress_level, jacket_hash, v1_hash, v3_hash
+            )
+            VALUES ($1, $2, $3, $4, $5)
+            ON CONFLICT (source_hash, compress_level) DO UPDATE
+            SET jacket_hash = EXCLUDED.jacket_hash,
+                v1_hash = EXCLUDED.v1_hash,
+                v3_hash = EXCLUDED.v3_hash,
+                created_at = CURRENT_TIMESTAMP;
+        """,
+        render.source_hash,
+        render.compress_level,
+        render.jacket_hash,
+        render.v1_hash,
+        render.v3_hash,
+    )
@@ -1,11 +1,15 @@
 from typing import Literal, Optional, Tuple
 from database.query import ExecutableQuery, SelectQuery
+from helpers.leaderboard_metrics import METRICS, LeaderboardMetric
 from helpers.models import (
     LeaderboardRecordDBResponse,
+    LeaderboardRank,
+    LeaderboardCount,
     Count,
     LeaderboardRecord,
     Prefix,
     leaderboard_type,
+    RandomPoolEntry,
 )
 
 
@@ -56,45 +60,16 @@ def get_leaderboards_for_chart(
     page: int = 0,
     leaderboard_type: leaderboard_type = "arcade_score_speed",
     sonolus_id: Optional[str] = None,
-) -> Tuple[SelectQuery[LeaderboardRecordDBResponse], SelectQuery[Count]]:
+) -> Tuple[SelectQuery[LeaderboardRecordDBResponse], SelectQuery[LeaderboardCount]]:
     """
     Returns (leaderboard_entries_query, count_query).
-    Use count_query to calculate total pages.
+    Use count_query to calculate total pages. Its last_id and public_chart
+    tell whether the leaderboard changed, without the page query.
     """
     offset = page * limit
 
-    sort_direction = "DESC"
-
-    match leaderboard_type:
-        case "arcade_score_speed":
-            speed_multiplier_sql = """
-                CASE
-                    WHEN l.speed IS NULL THEN 1.0
-                    ELSE
-                        CASE
-                            WHEN FLOOR(l.speed::numeric * 20) / 20 < 1.0 
-                                THEN (FLOOR(l.speed::numeric * 20) / 20) - 0.4
-                            ELSE 1.0 + ((FLOOR(l.speed::numeric * 20) / 20) - 1.0) * 0.075
-                        END
-                END
-            """.strip()
-            sorting_clause = (
-                f"CAST(l.arcade_score * ({speed_multiplier_sql}) AS INTEGER)"
-            )
-        case "accuracy_score":
-            sorting_clause = "l.accuracy_score"
-        case "arcade_score_no_speed":
-            sorting_clause = "l.arcade_score"
-        case "rank_match":
-            sorting_clause = "(3 * l.nperfect) + (2 * l.ngreat) + (1 * l.ngood)"
-        case "least_combo_breaks":
-            sorting_clause = "l.ngood + l.nmiss"
-            sort_direction = "ASC"
-        case "least_misses":
-            sorting_clause = "l.nmiss"
-            sort_direction = "ASC"
-        case "perfect":
-            sorting_clause = "l.nperfect"
+    # generated column + (chart_id, column, id) index per type, see helpers.leaderboard_metrics
+    metric = METRICS[leaderboard_type]
 
     leaderboard_query = SelectQuery(
         LeaderboardRecordDBResponse,
@@ -122,7 +97,7 @@ def get_leaderboards_for_chart(
             FROM leaderboards l
             JOIN charts c ON l.chart_id = c.id
             WHERE l.chart_id = $1
-            ORDER BY {sorting_clause} {sort_direction}
+            ORDER BY l.{metric.column} {metric.direction}, l.id
             LIMIT $2 OFFSET $3;
         """,
         chart_id,
@@ -132,9 +107,12 @@ def get_leaderboards_for_chart(
     )
 
     count_query = SelectQuery(
-        Count,
+        LeaderboardCount,
         """
-            SELECT COUNT(*) AS total_count
+            SELECT
+                COUNT(*) AS total_count,
+                MAX(l.id) AS last_id,
+                BOOL_OR(l.public_chart) AS public_chart
             FROM leaderboards l
             WHERE l.chart_id = $1;
         """,
@@ -147,6 +125,120 @@ def get_leaderboards_for_chart(
     )
 
 
+def _ranked_before(metric: LeaderboardMetric, l: str, other: str) -> str:
+    # l ranks above other: better metric, ties go to the older record.
+    # Two range conditions on the (chart_id, metric, id) index
+    better = ">" if metric.direction == "DESC" else "<"
+    return (
+        f"({l}.{metric.column} {better} {other}.{metric.column} "
+        f"OR ({l}.{metric.column} = {other}.{metric.column} AND {l}.id < {other}.id))"
+    )
+
+
+def get_leaderboard_rank(
+    chart_id: str,
+    record_id: int,
+    leaderboard_type: leaderboard_type = "arcade_score_speed",
+) -> SelectQuery[LeaderboardRank]:
+    """Position of a record in get_leaderboards_for_chart's order, by counting
+    the records ranked above it."""
+    metric = METRICS[leaderboard_type]
+    return SelectQuery(
+        LeaderboardRank,
+        f"""
+            WITH me AS (
+                SELECT id, {metric.column}
+                FROM leaderboards
+                WHERE chart_id = $1 AND id = $2
+            )
+            SELECT
+                1 + (
+                    SELECT COUNT(*)
+                    FROM leaderboards l, me
+                    WHERE l.chart_id = $1 AND {_ranked_before(metric, "l", "me")}
+                ) AS rank,
+                (
+                    SELECT COUNT(*) FROM leaderboards WHERE chart_id = $1
+                ) AS total_count
+            FROM me;
+        """,
+        chart_id,
+        record_id,
+    )
+
+
+def get_leaderboard_neighbours(
+    chart_id: str,
+    record_id: int,
+    radius: int,
+    leaderboard_type: leaderboard_type = "arcade_score_speed",
+    sonolus_id: Optional[str] = None,
+) -> SelectQuery[LeaderboardRecordDBResponse]:
+    """
+    The record and up to `radius` records ranked directly above and below it,
+    in get_leaderboards_for_chart's order. Both sides are index scans from the
+    record outwards.
+    """
+    metric = METRICS[leaderboard_type]
+    reverse = "ASC" if metric.direction == "DESC" else "DESC"
+    return SelectQuery(
+        LeaderboardRecordDBResponse,
+        f"""
+            WITH me AS (
+                SELECT id, {metric.column}
+                FROM leaderboards
+                WHERE chart_id = $1 AND id = $2
+            ), nearby AS (
+                (
+                    SELECT l.id
+                    FROM leaderboards l, me
+                    WHERE l.chart_id = $1 AND {_ranked_before(metric, "l", "me")}
+                    ORDER BY l.{metric.column} {reverse}, l.id DESC
+                    LIMIT $3
+                )
+                UNION ALL
+                SELECT id FROM me
+                UNION ALL
+                (
+                    SELECT l.id
+                    FROM leaderboards l, me
+                    WHERE l.chart_id = $1 AND {_ranked_before(metric, "me", "l")}
+                    ORDER BY l.{metric.column} {metric.direction}, l.id
+                    LIMIT $3
+                )
+            )
+            SELECT 
+                l.id,
+                l.submitter,
+                l.replay_data_hash,
+                l.replay_config_hash,
+                l.chart_id,
+                l.created_at,
+                CONCAT(c.author, '/', c.id) AS chart_prefix,
+                l.engine,
+                l.grade,
+                l.nperfect,
+                l.ngreat,
+                l.ngood,
+                l.nmiss,
+                l.arcade_score,
+                l.accuracy_score,
+                l.speed,
+                l.display_name,
+                l.public_chart,
+                COALESCE(l.submitter = $4, FALSE) AS owner
+            FROM nearby n
+            JOIN leaderboards l ON l.id = n.id
+            JOIN charts c ON l.chart_id = c.id
+            ORDER BY l.{metric.column} {metric.direction}, l.id;
+        """,
+        chart_id,
+        record_id,
+        radius,
+        sonolus_id,
+    )
+
+
 def get_leaderboard_record_by_id(
     chart_id: str, record_id: int, sonolus_id: str | None = None
 ) -> SelectQuery[LeaderboardRecordDBResponse]:
@@ -265,9 +357,22 @@ def update_leaderboard_visibility(
     )
 
 
-def get_random_leaderboard_records(
-    limit: int,
+def get_random_pool_record_ids() -> SelectQuery[RandomPoolEntry]:
+    """Public record IDs (single bucket), for helpers.random_pool."""
+    return SelectQuery(
+        RandomPoolEntry,
+        """
+            SELECT id, TRUE AS bucket
+            FROM leaderboards
+            WHERE public_chart;
+        """,
+    )
+
+
+def get_leaderboard_records_by_id_batch(
+    record_ids: list[int],
 ) -> SelectQuery[LeaderboardRecordDBResponse]:
+    """Public records by ID. Order is not preserved."""
     return SelectQuery(
         LeaderboardRecordDBResponse,
         """
@@ -292,10 +397,9 @@ def get_random_leaderboard_records(
                 l.public_chart
             FROM leaderboards l
             JOIN charts c ON l.chart_id = c.id
-            WHERE l.public_chart
-            ORDER BY RANDOM() LIMIT $1;
+            WHERE l.id = ANY($1::int[]) AND l.public_chart;
         """,
-        limit,
+        record_ids,
     )
 
 
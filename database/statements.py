@@ -0,0 +1,87 @@
+import re
+from collections import OrderedDict
+
+from asyncpg import Connection
+
+# string literals / quoted identifiers (kept), comments and whitespace
+_TOKENS = re.compile(
+    r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|(?:--[^\n]*|/\*.*?\*/|\s)+", re.S
+)
+
+
+def canonicalize(sql: str) -> str:
+    """
+    One text per query shape: the database/ builders indent and join their
+    SQL differently depending on which optional parts are used.
+    """
+    # comments go too, or joining lines would comment out the rest
+    sql = _TOKENS.sub(lambda m: m.group(1) or " ", sql).strip()
+    return sql.removesuffix(";").rstrip()
+
+
+class StatementRegistry:
+    """
+    Canonical SQL for everything going through DBConnWrapper, so asyncpg's
+    own statement cache (per connection, keyed on the text, sized by
+    psql.statement-cache-size) keeps one prepared statement per query shape
+    instead of one per formatting.
+
+    Prepared statements stay asyncpg's: they belong to the raw connection,
+    survive it going back to the pool, are re-prepared after schema changes
+    and go away with the connection.
+
+    Stats count, per worker, whether each statement was already prepared on
+    the connection it ran on (reused) or had to be prepared (prepared).
+    execute() without arguments uses the simple query protocol and is never
+    prepared (unprepared).
+    """
+
+    def __init__(self, max_texts: int = 1024):
+        self.max_texts = max_texts
+
+        # raw text -> canonical text, the builders produce few distinct texts
+        self._texts: OrderedDict[str, str] = OrderedDict()
+
+        self.reused = 0
+        self.prepared = 0
+        self.unprepared = 0
+
+    def canonical(self, sql: str) -> str:
+        canonical = self._texts.get(sql)
+        if canonical is not None:
+            self._texts.move_to_end(sql)
+            return canonical
+
+        canonical = self._texts[sql] = canonicalize(sql)
+        while len(self._texts) > self.max_texts:
+            self._texts.popitem(last=False)
+        return canonical
+
+    def _count(self, conn: Connection, method: str, sql: str, args: tuple) -> None:
+        if method == "execute" and not args:
+            self.unprepared += 1
+            return
+        # pool connections are proxies, the statement cache is the real one's.
+        # keyed the way Connection._get_statement looks statements up
+        raw = getattr(conn, "_con", None) or conn
+        key = (sql, raw._protocol.get_record_class(), False)
+        if raw._stmt_cache.has(key):
+            self.reused += 1
+        else:
+            self.prepared += 1
+
+    async def run(self, conn: Connection, method: str, sql: str, args: tuple):
+        """conn.<method>(canonical sql, *args)"""
+        sql = self.canonical(sql)
+        self._count(conn, method, sql, args)
+        return await getattr(conn, method)(sql, *args)
+
+    def stats(self) -> dict:
+        statements = self.reused + self.prepared
+        return {
+            "texts": len(self._texts),
+            "reused": self.reused,
+            "prepared": self.prepared,
+            "unprepared": self.unprepared,
+            "reuse_rate": round(self.reused / statements, 4) if statements else 0.0,
+        }
@@ -0,0 +1,153 @@
+from typing import Literal, Optional
+
+from database.query import ExecutableQuery, SelectQuery
+from helpers.models import UploadJob
+
+"""
+upload_jobs
+
+Chart uploads waiting on (or done with) processing by worker.py. The upload
+route only stores the raw files and queues a job; workers claim jobs with
+FOR UPDATE SKIP LOCKED, so any number of them can share the table. A job
+stuck in 'processing' longer than the lock timeout belonged to a worker that
+died, and is claimed again (up to max_attempts), so the worker processing
+a job keeps touching locked_at. Only a 'processing' job is finished or
+requeued, so a job that is done or failed stays that way.
+"""
+
+
+def create_upload_job(
+    id: str, chart_id: str, sonolus_id: str, data: str, files: list[str]
+) -> ExecutableQuery:
+    return ExecutableQuery(
+        """
+            WITH job AS (
+                INSERT INTO upload_jobs (id, chart_id, sonolus_id, data, files)
+                VALUES ($1::uuid, $2, $3, $4::jsonb, $5::text[])
+                RETURNING id
+            )
+            -- wake up idle workers, they poll anyway
+            SELECT pg_notify('upload_jobs', id::text) FROM job;
+        """,
+        id,
+        chart_id,
+        sonolus_id,
+        data,
+        files,
+    )
+
+
+def claim_upload_job(lock_timeout: int, max_attempts: int) -> SelectQuery[UploadJob]:
+    return SelectQuery(
+        UploadJob,
+        """
+            UPDATE upload_jobs
+            SET status = 'processing',
+                attempts = attempts + 1,
+                locked_at = CURRENT_TIMESTAMP
+            WHERE id = (
+                SELECT id
+                FROM upload_jobs
+                WHERE (
+                    status = 'queued'
+                    OR (
+                        status = 'processing'
+                        AND locked_at < CURRENT_TIMESTAMP - make_interval(secs => $1)
+                    )
+                )
+                AND attempts < $2
+                ORDER BY created_at
+                FOR UPDATE SKIP LOCKED
+                LIMIT 1
+            )
+            RETURNING id::text AS id, chart_id, sonolus_id, status, data::text AS data,
+                files, attempts, error, created_at, finished_at;
+        """,
+        lock_timeout,
+        max_attempts,
+    )
+
+
+def claim_abandoned_upload_jobs(
+    lock_timeout: int, max_attempts: int
+) -> SelectQuery[UploadJob]:
+    """Jobs whose worker died on every attempt, to be marked failed."""
+    return SelectQuery(
+        UploadJob,
+        """
+            UPDATE upload_jobs
+            SET locked_at = CURRENT_TIMESTAMP
+            WHERE id IN (
+                SELECT id
+                FROM upload_jobs
+                WHERE status = 'processing'
+                    AND locked_at < CURRENT_TIMESTAMP - make_interval(secs => $1)
+                    AND attempts >= $2
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id::text AS id, chart_id, sonolus_id, status, data::text AS data,
+                files, attempts, error, created_at, finished_at;
+        """,
+        lock_timeout,
+        max_attempts,
+    )
+
+
+def get_upload_job(chart_id: str, sonolus_id: str) -> SelectQuery[UploadJob]:
+    return SelectQuery(
+        UploadJob,
+        """
+            SELECT id::text AS id, chart_id, sonolus_id, status, data::text AS data,
+                files, attempts, error, created_at, finished_at
+            FROM upload_jobs
+            WHERE chart_id = $1 AND sonolus_id = $2;
+        """,
+        chart_id,
+        sonolus_id,
+    )
+
+
+def touch_upload_job(id: str, attempts: int) -> ExecutableQuery:
+    """
+    Heartbeat of the worker holding the claim (attempts as of claiming it).
+    UPDATE 0 once the job is finished or was claimed again.
+    """
+    return ExecutableQuery(
+        """
+            UPDATE upload_jobs
+            SET locked_at = CURRENT_TIMESTAMP
+            WHERE id = $1::uuid AND status = 'processing' AND attempts = $2;
+        """,
+        id,
+        attempts,
+    )
+
+
+def finish_upload_job(
+    id: str, status: Literal["done", "failed"], error: Optional[str] = None
+) -> ExecutableQuery:
+    return ExecutableQuery(
+        """
+            UPDATE upload_jobs
+            SET status = $2,
+                error = $3,
+                locked_at = NULL,
+                finished_at = CURRENT_TIMESTAMP
+            WHERE id = $1::uuid AND status = 'processing';
+        """,
+        id,
+        status,
+        error,
+    )
+
+
+def requeue_upload_job(id: str) -> ExecutableQuery:
+    return ExecutableQuery(
+        """
+            UPDATE upload_jobs
+            SET status = 'queued',
+                locked_at = NULL
+            WHERE id = $1::uuid AND status = 'processing';
+        """,
+        id,
+    )
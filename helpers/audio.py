@@ -1,130 +1,155 @@
-import subprocess
-import tempfile
-import json
-import os
+import asyncio
+from concurrent.futures import Executor
+from functools import partial
+from typing import Awaitable, Callable, Iterator, Optional, Union
+
+from helpers.mp3 import Mp3Info, scan_mp3, scan_mp3_file
+
+STANDARD_BITRATES = [128000, 160000, 192000, 224000, 256000, 320000]
+
+CHUNK_SIZE = 256 * 1024
 
 
 def is_vbr_mp3(file_path: str) -> bool:
-    """Check if an MP3 file is VBR using ffprobe to sample frame bitrates."""
-    try:
-        result = subprocess.run(
-            [
-                "ffprobe",
-                "-v",
-                "quiet",
-                "-select_streams",
-                "a:0",
-                "-show_entries",
-                "packet=duration_time,size",
-                "-read_intervals",
-                "%+10",  # sample first 10 seconds
-                "-print_format",
-                "json",
-                file_path,
-            ],
-            capture_output=True,
-            text=True,
-            encoding="utf-8",
-            errors="replace",
-            timeout=20,
-        )
-        if result.returncode != 0:
-            return False
+    """Check if an MP3 file is VBR from its frame headers."""
+    info = scan_mp3_file(file_path)
+    return bool(info and info.is_vbr)
 
-        data = json.loads(result.stdout)
-        packets = data.get("packets", [])
-        if len(packets) < 2:
-            return False
 
-        # calc bitrate per packet
-        bitrates = []
-        for pkt in packets:
-            duration = float(pkt.get("duration_time", 0))
-            size = int(pkt.get("size", 0))
-            if duration > 0:
-                bitrates.append(size * 8 / duration)
+def _cbr_bitrate(info: Mp3Info) -> int:
+    return min(STANDARD_BITRATES, key=lambda x: abs(x - info.average_bitrate))
 
-        if not bitrates:
-            return False
 
-        # allow small tolerance
-        min_br = min(bitrates)
-        max_br = max(bitrates)
-        if min_br <= 0:
-            return False
-        return (max_br - min_br) / min_br > 0.05
-    except (
-        subprocess.TimeoutExpired,
-        FileNotFoundError,
-        json.JSONDecodeError,
-        ValueError,
+def _chunks(source: bytes) -> Iterator[bytes]:
+    view = memoryview(source)
+    for start in range(0, len(view), CHUNK_SIZE):
+        yield view[start : start + CHUNK_SIZE]
+
+
+class CbrEncoder:
+    """
+    Re-encodes VBR MP3s to CBR by streaming them through ffmpeg's stdin and
+    stdout, so nothing goes through temp files and no executor thread is held
+    while ffmpeg runs. At most `concurrency` ffmpeg processes run at once
+    (per event loop, so per uvicorn worker).
+
+    Frame header scans and file reads/writes run on `executor` (the app's
+    thread pool, or the loop's default one), never on the event loop.
+
+    Any failure (no ffmpeg, bad input, timeout) keeps the original audio.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 2,
+        timeout: float = 60,
+        executor: Optional[Executor] = None,
     ):
-        return False
+        self._slots = asyncio.Semaphore(concurrency)
+        self.timeout = timeout
+        self.executor = executor
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, partial(func, *args)
+        )
+
+    async def _encode(
+        self,
+        source: Union[bytes, str],
+        bitrate: int,
+        write: Callable[[bytes], Awaitable[object]],
+    ) -> bool:
+        async with self._slots:
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    "ffmpeg",
+                    "-y",
+                    "-f",
+                    "mp3",
+                    "-i",
+                    "pipe:0",
+                    "-codec:a",
+                    "libmp3lame",
+                    "-b:a",
+                    str(bitrate),
+                    "-f",
+                    "mp3",
+                    "pipe:1",
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.DEVNULL,
+                )
+            except FileNotFoundError:
+                return False
+
+            async def feed() -> None:
+                try:
+                    if isinstance(source, str):
+                        f = await self._run(open, source, "rb")
+                        try:
+                            while chunk := await self._run(f.read, CHUNK_SIZE):
+                                proc.stdin.write(chunk)
+                                await proc.stdin.drain()
+                        finally:
+                            f.close()
+                    else:
+                        for chunk in _chunks(source):
+                            proc.stdin.write(chunk)
+                            await proc.stdin.drain()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # ffmpeg gave up, its exit code says why
+                finally:
+                    proc.stdin.close()
+
+            async def drain() -> None:
+                # both pipes run at once, or ffmpeg blocks on a full stdout
+                while chunk := await proc.stdout.read(CHUNK_SIZE):
+                    await write(chunk)
 
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(feed(), drain(), proc.wait()), self.timeout
+                )
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                # timed out, or the request went away while encoding
+                if proc.returncode is None:
+                    proc.kill()
+                    await proc.wait()
 
-def ensure_cbr_mp3(audio_bytes: bytes) -> bytes:
-    tmp_in_path = None
-    tmp_out_path = None
-    try:
-        with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as tmp_in:
-            tmp_in.write(audio_bytes)
-            tmp_in_path = tmp_in.name
+            return proc.returncode == 0  # failed, keep original
 
-        if not is_vbr_mp3(tmp_in_path):
+    async def ensure_cbr(self, audio_bytes: bytes) -> bytes:
+        """Returns audio_bytes itself if it is CBR or can't be converted."""
+        # almost every upload is already CBR, that is decided without ffmpeg
+        info = await self._run(scan_mp3, audio_bytes)
+        if not info or not info.is_vbr:
             return audio_bytes
 
-        probe = subprocess.run(
-            [
-                "ffprobe",
-                "-v",
-                "quiet",
-                "-print_format",
-                "json",
-                "-show_format",
-                tmp_in_path,
-            ],
-            capture_output=True,
-            text=True,
-            encoding="utf-8",
-            errors="replace",
-            timeout=30,
-        )
+        out = bytearray()
 
-        cbr_bitrate = 192000
-        if probe.returncode == 0:
-            probe_data = json.loads(probe.stdout)
-            avg_bitrate = int(probe_data.get("format", {}).get("bit_rate", 192000))
-            standard_bitrates = [128000, 160000, 192000, 224000, 256000, 320000]
-            cbr_bitrate = min(standard_bitrates, key=lambda x: abs(x - avg_bitrate))
-
-        with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as tmp_out:
-            tmp_out_path = tmp_out.name
-
-        result = subprocess.run(
-            [
-                "ffmpeg",
-                "-y",
-                "-i",
-                tmp_in_path,
-                "-codec:a",
-                "libmp3lame",
-                "-b:a",
-                str(cbr_bitrate),
-                tmp_out_path,
-            ],
-            capture_output=True,
-            timeout=60,
-        )
+        async def write(chunk: bytes) -> None:
+            out.extend(chunk)
+
+        if not await self._encode(audio_bytes, _cbr_bitrate(info), write):
+            return audio_bytes
+        return bytes(out)
+
+    async def ensure_cbr_file(self, in_path: str, out_path: str) -> bool:
+        """
+        Re-encode in_path to CBR at out_path if it is VBR.
+        Returns True if out_path was written, False if in_path should be kept.
+        """
+        info = await self._run(scan_mp3_file, in_path)
+        if not info or not info.is_vbr:
+            return False
 
-        if result.returncode != 0:
-            return audio_bytes  # failed, return original
-
-        with open(tmp_out_path, "rb") as f:
-            return f.read()
-    except (subprocess.TimeoutExpired, FileNotFoundError, json.JSONDecodeError):
-        return audio_bytes  # failed, return original
-    finally:
-        if tmp_in_path and os.path.exists(tmp_in_path):
-            os.unlink(tmp_in_path)
-        if tmp_out_path and os.path.exists(tmp_out_path):
-            os.unlink(tmp_out_path)
+        out = await self._run(open, out_path, "wb")
+        try:
+            return await self._encode(
+                in_path, _cbr_bitrate(info), lambda chunk: self._run(out.write, chunk)
+            )
+        finally:
+            await self._run(out.close)
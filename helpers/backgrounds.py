@@ -6,21 +6,23 @@ import pjsk_background_gen_PIL as pjsk_bg
 from PIL import Image
 
 
-def generate_backgrounds_resize_jacket(jacket_bytes: bytes):
+def generate_backgrounds_resize_jacket(jacket_bytes: bytes, compress_level: int = 6):
+    # compress_level: zlib level for the PNGs, 1 encodes several times faster
+    # than PIL's default 6 for slightly bigger files
     jacket_pil_image = Image.open(io.BytesIO(jacket_bytes))
     jacket_pil_image = jacket_pil_image.resize((600, 600)).convert("RGBA")
     jacket_buffer = io.BytesIO()
-    jacket_pil_image.save(jacket_buffer, format="PNG")
+    jacket_pil_image.save(jacket_buffer, format="PNG", compress_level=compress_level)
     jacket_bytes = jacket_buffer.getvalue()
     jacket_buffer.close()
     v1 = pjsk_bg.render_v1(jacket_pil_image)
     v3 = pjsk_bg.render_v3(jacket_pil_image)
     v1_buffer = io.BytesIO()
-    v1.save(v1_buffer, format="PNG")
+    v1.save(v1_buffer, format="PNG", compress_level=compress_level)
     v1_bytes = v1_buffer.getvalue()
     v1_buffer.close()
     v3_buffer = io.BytesIO()
-    v3.save(v3_buffer, format="PNG")
+    v3.save(v3_buffer, format="PNG", compress_level=compress_level)
     v3_bytes = v3_buffer.getvalue()
     v3_buffer.close()
     return v1_bytes, v3_bytes, jacket_bytes
@@ -0,0 +1,101 @@
+import asyncio, io
+from typing import Optional
+
+from botocore.exceptions import ClientError
+
+from core import ChartFastAPI
+from database import ExecutableQuery, blobs
+from helpers.uploads import StagedFile, upload_staged_file
+
+
+async def object_exists(bucket, key: str) -> bool:
+    try:
+        obj = await bucket.Object(key)
+        await obj.load()  # HEAD
+        return True
+    except ClientError:
+        return False
+
+
+def _size(file: dict) -> Optional[int]:
+    if "staged" in file:
+        return file["staged"].size
+    return len(file["bytes"]) if file["bytes"] is not None else None
+
+
+async def put_chart_files(
+    app: ChartFastAPI, bucket, files: list[dict], check_existing: bool = False
+) -> ExecutableQuery:
+    """
+    Write chart files to their {author}/{chart_id}/{hash} keys.
+
+    files are s3_uploads entries: {"path", "hash", "content-type", "bytes"}
+    or {"path", "hash", "staged": StagedFile}. "bytes" may be None for blobs
+    known to be in S3 already (eg. cached jacket renders), which can only be
+    copied. Per distinct hash, in order:
+      - skip if path already holds it (only checked with check_existing,
+        new charts can't have anything there yet)
+      - server-side copy from a key the blobs table knows holds the same hash
+      - upload the bytes
+
+    Keys stay per chart since asset URLs are built from them.
+    Returns the query registering the files as copy sources, for the caller
+    to run in the transaction that stores the chart's hashes.
+    """
+    unique: dict[str, dict] = {}
+    for file in files:
+        unique.setdefault(file["hash"], file)
+
+    async with app.db_acquire() as conn:
+        known = {
+            blob.hash: blob for blob in await conn.fetch(blobs.get_blobs(list(unique)))
+        }
+
+    stale_keys = []
+
+    async def put(file: dict) -> None:
+        path = file["path"]
+        staged: StagedFile | None = file.get("staged")
+        content_type = staged.content_type if staged else file["content-type"]
+
+        if check_existing and await object_exists(bucket, path):
+            return
+
+        blob = known.get(file["hash"])
+        if blob and blob.key != path:
+            if await object_exists(bucket, blob.key):
+                try:
+                    target = await bucket.Object(path)
+                    await target.copy_from(
+                        CopySource={"Bucket": app.s3_bucket, "Key": blob.key},
+                        ContentType=content_type,
+                        MetadataDirective="REPLACE",
+                    )
+                    return
+                except ClientError:
+                    pass  # source deleted between HEAD and copy
+            stale_keys.append((blob.hash, blob.key))
+
+        if staged:
+            await upload_staged_file(bucket, staged, path)
+        elif file["bytes"] is None:
+            raise RuntimeError(f"No data for {path} and no copy source left.")
+        else:
+            await bucket.upload_fileobj(
+                Fileobj=io.BytesIO(file["bytes"]),
+                Key=path,
+                ExtraArgs={"ContentType": content_type},
+            )
+
+    await asyncio.gather(*(put(file) for file in unique.values()))
+
+    if stale_keys:
+        async with app.db_acquire() as conn:
+            for hash, key in stale_keys:
+                await conn.execute(blobs.forget_blob_key(hash, key))
+
+    return blobs.register_blobs(
+        list(unique),
+        [_size(file) for file in unique.values()],
+        [file["path"] for file in unique.values()],
+    )
@@ -0,0 +1,419 @@
+"""
+Storage for helpers.shared_cache. Three interchangeable backends, bytes in and
+bytes out:
+
+- MemoryBackend: an LRU dict in this process. Nothing is shared between
+  uvicorn workers, but nothing to set up either.
+- SharedMemoryBackend: a fixed size mmap'd file (/dev/shm) every worker on
+  the host maps, with byte range locks per bucket.
+- RespBackend: anything speaking the Redis protocol (Redis, Valkey, KeyDB,
+  or scripts/resp_stand_in.py locally), shared between hosts too.
+
+Tags: versions(tags) gives each tag's current version, bump(tags) changes
+them. A cached entry remembers the versions it was built at and is stale once
+one of them moved. A backend may lose a tag (eviction), as long as a lost tag
+never comes back with a version some entry was stored with.
+"""
+
+import asyncio
+import fcntl
+import hashlib
+import mmap
+import os
+import secrets
+import struct
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+from urllib.parse import urlparse
+
+
+class CacheBackendError(Exception):
+    """The backend couldn't be reached, callers treat it as a miss."""
+
+
+class CacheBackend:
+    name = "base"
+    # seen by every worker, so a bump from one is a bump for all
+    shared = True
+
+    async def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        raise NotImplementedError
+
+    async def set_many(self, items: list[tuple[str, bytes]], ttl: float) -> None:
+        raise NotImplementedError
+
+    async def versions(self, tags: list[str]) -> list[bytes]:
+        raise NotImplementedError
+
+    async def bump(self, tags: list[str]) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+class MemoryBackend(CacheBackend):
+    name = "memory"
+    shared = False
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        # key -> (monotonic expiry, value)
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        # never dropped, there's one int per chart / account at most
+        self._tags: dict[str, int] = {}
+
+    async def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        now = time.monotonic()
+        values = []
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                values.append(None)
+                continue
+            self._entries.move_to_end(key)
+            values.append(entry[1])
+        return values
+
+    async def set_many(self, items: list[tuple[str, bytes]], ttl: float) -> None:
+        expires = time.monotonic() + ttl
+        for key, value in items:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def versions(self, tags: list[str]) -> list[bytes]:
+        return [b"%d" % self._tags.get(tag, 0) for tag in tags]
+
+    async def bump(self, tags: list[str]) -> None:
+        for tag in tags:
+            self._tags[tag] = self._tags.get(tag, 0) + 1
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "tags": len(self._tags)}
+
+
+# header: magic, buckets, ways, slot size, tag counters
+_SEGMENT_MAGIC = b"UCCACHE1"
+_SEGMENT_HEADER = struct.Struct("<8sIIII")
+_HEADER_SIZE = 64
+# slot: key hash, expiry (epoch seconds), key length, value length
+_SLOT_HEADER = struct.Struct("<QdII")
+_COUNTER = struct.Struct("<Q")
+
+
+def _hash64(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+class SharedMemoryBackend(CacheBackend):
+    """
+    One segment per host, set associative: a key can only live in the `ways`
+    slots of its bucket, and replaces the one closest to expiring. Entries
+    bigger than a slot aren't cached.
+
+    Tags are counters in a fixed array, a tag hashing onto another's counter
+    only means an extra invalidation.
+
+    Locks are fcntl record locks on the bucket's (or counter's) bytes, so a
+    worker killed mid-write doesn't leave anything locked. They're per
+    process, every call here runs to completion on the event loop thread.
+    """
+
+    name = "shm"
+
+    def __init__(
+        self,
+        path: str = "/dev/shm/uc-chart-cache",
+        buckets: int = 4096,
+        ways: int = 4,
+        slot_size: int = 4096,
+        tag_counters: int = 65536,
+    ):
+        self.path = path
+        self.buckets = buckets
+        self.ways = ways
+        self.slot_size = slot_size
+        self.tag_counters = tag_counters
+
+        self._counters_at = _HEADER_SIZE
+        self._slots_at = self._counters_at + tag_counters * _COUNTER.size
+        self._bucket_size = ways * slot_size
+        size = self._slots_at + buckets * self._bucket_size
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        header = _SEGMENT_HEADER.pack(
+            _SEGMENT_MAGIC, buckets, ways, slot_size, tag_counters
+        )
+        with self._locked(0, _HEADER_SIZE, exclusive=True):
+            current = os.pread(self._fd, _SEGMENT_HEADER.size, 0)
+            if current != header or os.fstat(self._fd).st_size != size:
+                # new, or laid out for another config: start empty
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, header, 0)
+        self._map = mmap.mmap(self._fd, size)
+
+    @contextmanager
+    def _locked(self, start: int, length: int, exclusive: bool):
+        fcntl.lockf(
+            self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH, length, start
+        )
+        try:
+            yield
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, length, start)
+
+    def _bucket(self, key_hash: int) -> int:
+        return self._slots_at + (key_hash % self.buckets) * self._bucket_size
+
+    def _find(self, bucket: int, key_hash: int, key: bytes) -> Optional[int]:
+        for way in range(self.ways):
+            slot = bucket + way * self.slot_size
+            slot_hash, expires, key_len, value_len = _SLOT_HEADER.unpack_from(
+                self._map, slot
+            )
+            if slot_hash != key_hash or key_len != len(key):
+                continue
+            start = slot + _SLOT_HEADER.size
+            if self._map[start : start + key_len] == key:
+                return slot
+        return None
+
+    def _get(self, key: str) -> Optional[bytes]:
+        raw = key.encode()
+        key_hash = _hash64(raw)
+        bucket = self._bucket(key_hash)
+        with self._locked(bucket, self._bucket_size, exclusive=False):
+            slot = self._find(bucket, key_hash, raw)
+            if slot is None:
+                return None
+            _, expires, key_len, value_len = _SLOT_HEADER.unpack_from(self._map, slot)
+            if expires <= time.time():
+                return None
+            start = slot + _SLOT_HEADER.size + key_len
+            return self._map[start : start + value_len]
+
+    async def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        return [self._get(key) for key in keys]
+
+    def _set(self, key: str, value: bytes, ttl: float) -> None:
+        raw = key.encode()
+        if _SLOT_HEADER.size + len(raw) + len(value) > self.slot_size:
+            return
+
+        key_hash = _hash64(raw)
+        bucket = self._bucket(key_hash)
+        with self._locked(bucket, self._bucket_size, exclusive=True):
+            slot = self._find(bucket, key_hash, raw)
+            if slot is None:
+                # the slot expiring soonest, empty ones (expiry 0) first
+                slot = min(
+                    (bucket + way * self.slot_size for way in range(self.ways)),
+                    key=lambda slot: _SLOT_HEADER.unpack_from(self._map, slot)[1],
+                )
+            _SLOT_HEADER.pack_into(
+                self._map, slot, key_hash, time.time() + ttl, len(raw), len(value)
+            )
+            start = slot + _SLOT_HEADER.size
+            self._map[start : start + len(raw)] = raw
+            self._map[start + len(raw) : start + len(raw) + len(value)] = value
+
+    async def set_many(self, items: list[tuple[str, bytes]], ttl: float) -> None:
+        for key, value in items:
+            self._set(key, value, ttl)
+
+    def _counter(self, tag: str) -> int:
+        index = _hash64(tag.encode()) % self.tag_counters
+        return self._counters_at + index * _COUNTER.size
+
+    async def versions(self, tags: list[str]) -> list[bytes]:
+        versions = []
+        for tag in tags:
+            counter = self._counter(tag)
+            with self._locked(counter, _COUNTER.size, exclusive=False):
+                versions.append(b"%d" % _COUNTER.unpack_from(self._map, counter)[0])
+        return versions
+
+    async def bump(self, tags: list[str]) -> None:
+        for tag in tags:
+            counter = self._counter(tag)
+            with self._locked(counter, _COUNTER.size, exclusive=True):
+                (version,) = _COUNTER.unpack_from(self._map, counter)
+                _COUNTER.pack_into(self._map, counter, version + 1)
+
+    async def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "slots": self.buckets * self.ways,
+            "slot_size": self.slot_size,
+        }
+
+
+class _RespError(Exception):
+    pass
+
+
+class _RespConnection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @staticmethod
+    def _encode(command: tuple) -> bytes:
+        parts = [b"*%d\r\n" % len(command)]
+        for arg in command:
+            if isinstance(arg, str):
+                arg = arg.encode()
+            elif isinstance(arg, (int, float)):
+                arg = str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    async def _read(self):
+        line = await self.reader.readuntil(b"\r\n")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest
+        if kind == b"-":
+            raise _RespError(rest.decode(errors="replace"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            return (await self.reader.readexactly(length + 2))[:-2]
+        if kind == b"*":
+            length = int(rest)
+            if length < 0:
+                return None
+            return [await self._read() for _ in range(length)]
+        raise CacheBackendError(f"Unexpected RESP reply: {line!r}")
+
+    async def pipeline(self, *commands: tuple) -> list:
+        """Send every command, then read every reply: one round trip."""
+        self.writer.write(b"".join(self._encode(command) for command in commands))
+        await self.writer.drain()
+        return [await self._read() for _ in commands]
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class RespBackend(CacheBackend):
+    """
+    Redis protocol client, just what the cache needs: GET/MGET, SET with
+    expiry, and tags as random tokens (set if missing, replaced on bump), so
+    an evicted or expired tag comes back as a token no entry has.
+
+    Errors and timeouts raise CacheBackendError and drop the connection,
+    the next call opens a new one.
+    """
+
+    name = "resp"
+
+    # tags outlive any entry, expiring one just misses its entries once
+    TAG_TTL = 86400
+
+    def __init__(
+        self,
+        url: str = "redis://127.0.0.1:6379/0",
+        pool_size: int = 4,
+        timeout: float = 0.25,
+    ):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.strip("/") or 0)
+        self.pool_size = pool_size
+        self.timeout = timeout
+
+        self._idle: list[_RespConnection] = []
+        self._slots = asyncio.Semaphore(pool_size)
+
+        self.errors = 0
+
+    async def _connect(self) -> _RespConnection:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        conn = _RespConnection(reader, writer)
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            await conn.pipeline(*setup)
+        return conn
+
+    async def _run(self, *commands: tuple) -> list:
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else None
+            try:
+                if conn is None:
+                    conn = await asyncio.wait_for(self._connect(), self.timeout)
+                replies = await asyncio.wait_for(conn.pipeline(*commands), self.timeout)
+            except (OSError, EOFError, asyncio.TimeoutError, _RespError) as e:
+                # a half read reply would be read as the next one's, so the
+                # connection goes whatever happened
+                if conn is not None:
+                    conn.close()
+                self.errors += 1
+                raise CacheBackendError(str(e) or type(e).__name__) from e
+            self._idle.append(conn)
+            return replies
+
+    async def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        if not keys:
+            return []
+        (values,) = await self._run(("MGET", *keys))
+        return values
+
+    async def set_many(self, items: list[tuple[str, bytes]], ttl: float) -> None:
+        expiry = max(1, int(ttl * 1000))
+        await self._run(*(("SET", key, value, "PX", expiry) for key, value in items))
+
+    async def versions(self, tags: list[str]) -> list[bytes]:
+        if not tags:
+            return []
+        # missing tags get a token first, an entry stored against "no tag"
+        # would come back to life once its tag expired
+        replies = await self._run(
+            *(
+                ("SET", tag, secrets.token_hex(8), "NX", "EX", self.TAG_TTL)
+                for tag in tags
+            ),
+            ("MGET", *tags),
+        )
+        return replies[-1]
+
+    async def bump(self, tags: list[str]) -> None:
+        if tags:
+            await self._run(
+                *(
+                    ("SET", tag, secrets.token_hex(8), "EX", self.TAG_TTL)
+                    for tag in tags
+                )
+            )
+
+    async def close(self) -> None:
+        while self._idle:
+            self._idle.pop().close()
+
+    def stats(self) -> dict:
+        return {
+            "address": f"{self.host}:{self.port}/{self.db}",
+            "idle_connections": len(self._idle),
+            "connection_errors": self.errors,
+        }
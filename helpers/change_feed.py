@@ -0,0 +1,215 @@
+import asyncio
+import inspect
+import traceback
+from typing import Awaitable, Callable, Literal, NamedTuple, Optional, Union
+
+import asyncpg
+import orjson
+
+from helpers.config_loader import ConfigTypePsql
+
+# see notify_chart_change / notify_account_change in scripts/database_setup.py
+CHANNEL = "chart_changes"
+# session advisory lock held by the leader's listen connection
+LEADER_LOCK = 7_262_461
+
+
+class ChangeEvent(NamedTuple):
+    table: Literal[
+        "charts", "chart_likes", "comments", "accounts", "account_sessions", "*"
+    ]
+    op: Literal["INSERT", "UPDATE", "DELETE", "RESET"]
+    chart_id: Optional[str] = None
+    # accounts and account_sessions
+    sonolus_id: Optional[str] = None
+    # charts only, set when new (INSERT, DELETE) or changed
+    status: Optional[str] = None
+    staff_pick: Optional[bool] = None
+
+    @property
+    def listing_changed(self) -> bool:
+        """Which charts list filters match changed (status or staff pick)."""
+        return self.status is not None or self.staff_pick is not None
+
+
+# The listener was disconnected and may have missed events: anything derived
+# from the database should be treated as stale.
+RESET = ChangeEvent("*", "RESET")
+
+Subscriber = Callable[[ChangeEvent], Union[None, Awaitable[None]]]
+
+
+class ChangeFeed:
+    """
+    Per-worker LISTEN connection on chart_changes, fanned out to in-process
+    subscribers.
+
+    The connection is a dedicated one, not from the pool: a pooled
+    connection would be handed to queries between notifications. If it
+    drops, it's reopened with backoff and subscribers get RESET, since
+    notifications sent meanwhile are gone.
+
+    Subscribers are called on the event loop, in order. Coroutine
+    subscribers run as tasks, so a slow one doesn't hold back the others.
+
+    Every worker gets every event. Work that should happen once, not once per
+    worker (bumping a tag in a shared cache), is left to the leader: the one
+    feed whose connection holds the LEADER_LOCK advisory lock. The others
+    try to take it every leader_poll seconds, so a dead leader is replaced
+    that quickly.
+    """
+
+    def __init__(
+        self,
+        psql_config: ConfigTypePsql,
+        max_backoff: float = 30,
+        leader_poll: float = 5,
+    ):
+        self.psql_config = psql_config
+        self.max_backoff = max_backoff
+        self.leader_poll = leader_poll
+
+        self._conn: Optional[asyncpg.Connection] = None
+        self._subscribers: list[tuple[Subscriber, Optional[frozenset[str]]]] = []
+        self._tasks: set[asyncio.Task] = set()
+        self._reconnect: Optional[asyncio.Task] = None
+        self._campaign: Optional[asyncio.Task] = None
+        self._closed = False
+        self.leader = False
+
+        self.events = 0
+        self.by_table: dict[str, int] = {}
+        self.bad_payloads = 0
+        self.subscriber_errors = 0
+        self.reconnects = 0
+
+    def subscribe(
+        self, callback: Subscriber, tables: Optional[set[str]] = None
+    ) -> Callable[[], None]:
+        """
+        Call callback(event) for every change (on tables, if given; RESET
+        always). Returns a function that unsubscribes.
+        """
+        entry = (callback, frozenset(tables) if tables else None)
+        self._subscribers.append(entry)
+        return lambda: self._subscribers.remove(entry)
+
+    async def start(self) -> None:
+        await self._connect()
+        self._campaign = asyncio.create_task(self._campaign_loop())
+
+    async def _connect(self) -> None:
+        psql = self.psql_config
+        conn = await asyncpg.connect(
+            host=psql["host"],
+            user=psql["user"],
+            database=psql["database"],
+            password=psql["password"],
+            port=psql["port"],
+            ssl="disable",
+        )
+        await conn.add_listener(CHANNEL, self._on_notify)
+        conn.add_termination_listener(self._on_terminated)
+        self._conn = conn
+        await self._try_lead()
+
+    async def _try_lead(self) -> None:
+        conn = self._conn
+        try:
+            self.leader = await conn.fetchval(
+                "SELECT pg_try_advisory_lock($1)", LEADER_LOCK
+            )
+        except (asyncpg.PostgresError, asyncpg.InterfaceError, OSError):
+            # reconnecting takes care of it
+            pass
+
+    async def _campaign_loop(self) -> None:
+        while not self._closed:
+            await asyncio.sleep(self.leader_poll)
+            if self._conn is not None and not self.leader:
+                await self._try_lead()
+
+    def _on_terminated(self, conn: asyncpg.Connection) -> None:
+        # the lock went with the connection
+        self.leader = False
+        self._conn = None
+        if not self._closed and self._reconnect is None:
+            self._reconnect = asyncio.create_task(self._reconnect_loop())
+
+    async def _reconnect_loop(self) -> None:
+        backoff = 1
+        while not self._closed:
+            try:
+                await self._connect()
+            except Exception as e:
+                print(f"[change_feed] reconnect failed: {e}, retrying in {backoff}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            self.reconnects += 1
+            self._reconnect = None
+            self._dispatch(RESET)
+            return
+
+    def _on_notify(self, conn, pid: int, channel: str, payload: str) -> None:
+        try:
+            data = orjson.loads(payload)
+            event = ChangeEvent(
+                table=data["table"],
+                op=data["op"],
+                chart_id=data.get("chart_id"),
+                sonolus_id=data.get("sonolus_id"),
+                status=data.get("status"),
+                staff_pick=data.get("staff_pick"),
+            )
+        except (orjson.JSONDecodeError, KeyError, TypeError):
+            self.bad_payloads += 1
+            return
+
+        self.events += 1
+        self.by_table[event.table] = self.by_table.get(event.table, 0) + 1
+        self._dispatch(event)
+
+    def _dispatch(self, event: ChangeEvent) -> None:
+        for callback, tables in list(self._subscribers):
+            if tables is not None and event is not RESET and event.table not in tables:
+                continue
+            try:
+                result = callback(event)
+            except Exception:
+                self.subscriber_errors += 1
+                traceback.print_exc()
+                continue
+            if inspect.isawaitable(result):
+                task = asyncio.ensure_future(result)
+                self._tasks.add(task)
+                task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.subscriber_errors += 1
+            traceback.print_exception(task.exception())
+
+    async def close(self) -> None:
+        self._closed = True
+        self.leader = False
+        if self._reconnect is not None:
+            self._reconnect.cancel()
+        if self._campaign is not None:
+            self._campaign.cancel()
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            await conn.close()
+
+    def stats(self) -> dict:
+        return {
+            "connected": self._conn is not None,
+            "leader": self.leader,
+            "subscribers": len(self._subscribers),
+            "events": self.events,
+            "by_table": self.by_table,
+            "bad_payloads": self.bad_payloads,
+            "subscriber_errors": self.subscriber_errors,
+            "reconnects": self.reconnects,
+        }
@@ -0,0 +1,43 @@
+import io, gzip
+
+# WARNING: not async!!
+# runs in the CPU process pool (app.run_cpu), keep it top-level and picklable
+import sonolus_converters
+
+
+def convert_chart(chart_bytes_raw: bytes) -> bytes:
+    """
+    Convert an uploaded chart (sus, usc or pysekai LevelData) to gzipped
+    pysekai LevelData. Raises ValueError if the chart can't be used.
+    """
+    result = sonolus_converters.detect(chart_bytes_raw)
+    if not result:
+        raise ValueError("Invalid file format.")
+
+    if result[0] == "sus":
+        converted = io.BytesIO()
+        score = sonolus_converters.sus.load(
+            io.TextIOWrapper(io.BytesIO(chart_bytes_raw), encoding="utf-8")
+        )
+        sonolus_converters.next_sekai.export(converted, score)
+    elif result[0] == "usc":
+        converted = io.BytesIO()
+        score = sonolus_converters.usc.load(
+            io.TextIOWrapper(io.BytesIO(chart_bytes_raw), encoding="utf-8")
+        )
+        sonolus_converters.next_sekai.export(converted, score)
+    elif result[0] == "lvd":
+        if not result[1].endswith("pysekai"):
+            raise ValueError(f"Incorrect LevelData: {result[1]} (expected: pysekai)")
+        if not result[1].startswith("compress_"):
+            compressed_data = io.BytesIO()
+            with gzip.GzipFile(
+                fileobj=compressed_data, mode="wb", filename="LevelData", mtime=0
+            ) as f:
+                f.write(chart_bytes_raw)
+            compressed_data.seek(0)
+            return compressed_data.getvalue()
+        return chart_bytes_raw
+    else:
+        raise ValueError("Invalid file format.")
+    return converted.read()
@@ -0,0 +1,24 @@
+from typing import Optional
+
+from helpers.models import Account, Comment, PublicAccount
+
+
+def format_comment(
+    row: Comment, account: Optional[PublicAccount], user: Optional[Account]
+) -> dict:
+    """A comment as the comment routes return it, deleted content only for mods."""
+    data = {
+        **row.model_dump(),
+        "created_at": int(row.created_at.timestamp() * 1000),
+        "deleted_at": (
+            int(row.deleted_at.timestamp() * 1000) if row.deleted_at else None
+        ),
+        "account": account,
+    }
+    if data["deleted_at"]:
+        data["content"] = (
+            f"[DELETED]\nMod View:\n{'-'*10}\n{data['content']}"
+            if (user and user.mod)
+            else "[DELETED]"
+        )
+    return data
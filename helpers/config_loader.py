@@ -1,4 +1,4 @@
-from typing import TypedDict
+from typing import Literal, TypedDict
 import yaml
 
 ConfigTypeOAuth = TypedDict(
@@ -36,6 +36,21 @@ ConfigTypeServer = TypedDict(
         "auth-header": str,
         "token-secret-key": str,
         "debug": bool,
+        "validate-db-rows": bool,
+        "session-cache-ttl": int,
+        "session-cache-size": int,
+        "count-cache-ttl": int,
+        "cache-control": dict[str, int],
+        "random-pool-refresh": int,
+        "cpu-workers": int,
+        "cpu-queue-depth": int,
+        "ffmpeg-concurrency": int,
+        "ffmpeg-timeout": int,
+        "png-compress-level": int,
+        "upload-job-concurrency": int,
+        "upload-job-poll": int,
+        "upload-job-timeout": int,
+        "upload-job-attempts": int,
     },
 )
 
@@ -61,6 +76,24 @@ ConfigTypePsql = TypedDict(
         "password": str,
         "pool-min-size": int,
         "pool-max-size": int,
+        "statement-cache-size": int,
+        "change-feed": bool,
+    },
+)
+
+ConfigTypeCache = TypedDict(
+    "ConfigTypeCache",
+    {
+        "backend": Literal["memory", "shm", "resp"],
+        "ttl": int,
+        "namespace": str,
+        "memory-size": int,
+        "shm-path": str,
+        "shm-buckets": int,
+        "shm-slot-size": int,
+        "resp-url": str,
+        "resp-pool-size": int,
+        "resp-timeout": float,
     },
 )
 
@@ -72,6 +105,7 @@ ConfigType = TypedDict(
         "psql": ConfigTypePsql,
         "discord": ConfigTypeDiscord,
         "oauth": ConfigTypeOAuth,
+        "cache": ConfigTypeCache,
     },
 )
 
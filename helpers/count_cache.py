@@ -0,0 +1,67 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from database.query import SelectQuery
+
+
+class CountCache:
+    """
+    Per-worker cache of chart list total counts.
+
+    Keyed on the count query itself (sql + args), which get_chart_list builds
+    deterministically from the filter set, so equal filters share an entry.
+    Routes that change which charts a filter matches (status, staff pick,
+    upload, delete) clear it; anything else (likes, comments, scheduled
+    publishes, other workers) is covered by the short TTL.
+    """
+
+    def __init__(self, ttl: float = 30, max_size: int = 2048):
+        self.ttl = ttl
+        self.max_size = max_size
+
+        self._entries: OrderedDict[tuple, tuple[float, int]] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(query: SelectQuery) -> tuple:
+        # tag lists come in as lists, which can't be hashed
+        args = tuple(tuple(a) if isinstance(a, list) else a for a in query.args)
+        return (query.sql, args)
+
+    def get(self, query: SelectQuery) -> Optional[int]:
+        key = self._key(query)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, query: SelectQuery, total_count: int) -> None:
+        if self.ttl <= 0 or self.max_size <= 0:
+            return
+
+        key = self._key(query)
+        self._entries[key] = (time.monotonic() + self.ttl, total_count)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
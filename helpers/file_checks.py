@@ -1,11 +1,15 @@
 from typing import Literal
 from fastapi import HTTPException
 
+# bytes needed by check_magic
+MAGIC_HEADER_SIZE = 20
 
-async def get_and_check_file(file, expected_type: Literal["image/png", "audio/mpeg"]):
-    # Read the first few bytes of the file (enough for magic number check)
+
+def check_magic(
+    file_bytes: bytes, expected_type: Literal["image/png", "image", "audio/mpeg"]
+) -> None:
+    """Check the first MAGIC_HEADER_SIZE bytes of a file against expected_type."""
     if expected_type == "image/png":
-        file_bytes = await file.read(10)
         # PNG magic number (89 50 4E 47 0D 0A 1A 0A)
         if file_bytes[:8] != b"\x89\x50\x4e\x47\x0d\x0a\x1a\x0a":
             raise HTTPException(
@@ -13,7 +17,6 @@ async def get_and_check_file(file, expected_type: Literal["image/png", "audio/mp
                 detail="Invalid file format. Please upload a valid PNG image.",
             )
     elif expected_type == "image":
-        file_bytes = await file.read(20)
         # PNG
         if file_bytes[:8] == b"\x89PNG\r\n\x1a\n":
             result = True
@@ -43,11 +46,15 @@ async def get_and_check_file(file, expected_type: Literal["image/png", "audio/mp
                 detail="Invalid image format. Supported: PNG, JPEG, JPEG 2000, AVIF, ICO, ICNS.",
             )
     elif expected_type == "audio/mpeg":
-        file_bytes = await file.read(10)
         if not (file_bytes.startswith(b"ID3") or file_bytes[:2] == b"\xff\xfb"):
             raise HTTPException(
                 status_code=400,
                 detail="Invalid file format. Please upload a valid MP3 audio file.",
             )
+
+
+async def get_and_check_file(file, expected_type: Literal["image/png", "audio/mpeg"]):
+    # Read the first few bytes of the file (enough for magic number check)
+    check_magic(await file.read(MAGIC_HEADER_SIZE), expected_type)
     await file.seek(0)
     return await file.read()
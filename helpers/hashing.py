@@ -22,7 +22,8 @@ def _calculate_hash(data: Union[os.PathLike, IO[bytes], bytes], algorithm: str)
             hash_obj.update(chunk)
         data.seek(0)
 
-    elif isinstance(data, IO):
+    elif hasattr(data, "read"):
+        # typing.IO isn't a real base class, open() files aren't instances of it
         while chunk := data.read(8192):
             hash_obj.update(chunk)
 
@@ -0,0 +1,82 @@
+import hashlib
+from typing import Any
+
+from fastapi import Request, Response, status
+
+from core import ChartFastAPI
+from helpers.responses import FastJSONResponse, render_json
+
+# Seconds the Sonolus server proxy / a CDN may reuse a public response before
+# revalidating with its ETag, per route. server.cache-control overrides these.
+DEFAULT_MAX_AGE = {
+    "chart": 30,
+    "trends": 300,
+    "leaderboards": 30,
+    "charts": 15,
+}
+
+
+def make_etag(*parts: Any) -> str:
+    """Weak ETag from whatever the response body is derived from."""
+    # as JSON, so a row read back from helpers.shared_cache gives the same tag
+    digest = hashlib.sha1(render_json(parts)).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def body_etag(body: bytes) -> str:
+    return f'W/"{hashlib.sha1(body).hexdigest()[:20]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # weak comparison, W/ doesn't matter
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def cache_headers(
+    app: ChartFastAPI, route: str, etag: str, private: bool
+) -> dict[str, str]:
+    """
+    private: the body depends on the session (liked, owner, mod flags).
+    Those may only be kept by the client, which still gets 304s.
+    """
+    if private:
+        cache_control = "private, no-cache"
+    else:
+        max_age = (
+            app.config["server"]
+            .get("cache-control", {})
+            .get(route, DEFAULT_MAX_AGE[route])
+        )
+        cache_control = f"public, max-age={max_age}" if max_age > 0 else "no-cache"
+    return {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        # anonymous and logged in bodies differ
+        "Vary": "Authorization",
+    }
+
+
+def not_modified(headers: dict[str, str]) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+
+def validated_json(
+    request: Request, route: str, content: Any, private: bool
+) -> Response:
+    """
+    For responses with nothing cheaper to tell versions apart by than the
+    body: rendered first, ETag from the bytes. Saves the transfer, not the
+    queries, shared caches holding it for max-age is what saves those.
+    """
+    app: ChartFastAPI = request.app
+    body = render_json(content)
+    headers = cache_headers(app, route, body_etag(body), private)
+    if etag_matches(request, headers["ETag"]):
+        return not_modified(headers)
+    return FastJSONResponse(body, headers=headers)
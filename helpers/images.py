@@ -0,0 +1,24 @@
+import io
+
+# WARNING: not async!!
+# runs in the CPU process pool (app.run_cpu), keep it top-level and picklable
+from PIL import Image
+
+
+def convert_images(content: bytes, size: tuple[int, int]) -> tuple[bytes, bytes]:
+    """Resize an uploaded image, returns (png, webp) bytes."""
+    image = Image.open(io.BytesIO(content))
+    image = image.convert("RGB")
+    image = image.resize(size, Image.Resampling.LANCZOS)
+
+    # PNG
+    png_buffer = io.BytesIO()
+    image.save(png_buffer, format="PNG")
+    png_bytes = png_buffer.getvalue()
+
+    # WebP
+    webp_buffer = io.BytesIO()
+    image.save(webp_buffer, format="WEBP")
+    webp_bytes = webp_buffer.getvalue()
+
+    return png_bytes, webp_bytes
@@ -0,0 +1,87 @@
+import asyncio
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+from core import ChartFastAPI
+from database import blobs, jacket_renders
+from helpers.models import JacketRender
+from helpers.hashing import calculate_sha1
+from helpers.backgrounds import generate_backgrounds_resize_jacket
+from helpers.blob_store import object_exists
+
+
+async def _cached_render(
+    app: ChartFastAPI, source_hash: str, compress_level: int
+) -> Optional[JacketRender]:
+    async with app.db_acquire() as conn:
+        render = await conn.fetchrow(
+            jacket_renders.get_jacket_render(source_hash, compress_level)
+        )
+    if not render:
+        return None
+
+    files = [
+        (render.jacket_hash, render.jacket_key),
+        (render.v1_hash, render.v1_key),
+        (render.v3_hash, render.v3_key),
+    ]
+    async with app.s3_session_getter() as s3:
+        bucket = await s3.Bucket(app.s3_bucket)
+        exists = await asyncio.gather(*(object_exists(bucket, key) for _, key in files))
+    if all(exists):
+        return render
+
+    async with app.db_acquire() as conn:
+        for (hash, key), found in zip(files, exists):
+            if not found:
+                await conn.execute(blobs.forget_blob_key(hash, key))
+    return None
+
+
+async def render_jacket(
+    app: ChartFastAPI, jacket_bytes_original: bytes
+) -> tuple[JacketRender, Optional[tuple[bytes, bytes, bytes]]]:
+    """
+    generate_backgrounds_resize_jacket, skipped for jackets rendered before
+    at the configured png-compress-level.
+
+    Returns the render and its (v1, v3, jacket) bytes, or None instead of the
+    bytes when all three files are already in S3; put_chart_files copies
+    them from there. Raises 400 if the jacket can't be rendered.
+    """
+    source_hash = await app.run_blocking(calculate_sha1, jacket_bytes_original)
+    compress_level = app.config["server"].get("png-compress-level", 1)
+
+    cached = await _cached_render(app, source_hash, compress_level)
+    if cached:
+        return cached, None
+
+    try:
+        v1, v3, jacket_bytes = await app.run_cpu(
+            generate_backgrounds_resize_jacket,
+            jacket_bytes_original,
+            compress_level,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    jacket_hash, v1_hash, v3_hash = await asyncio.gather(
+        app.run_blocking(calculate_sha1, jacket_bytes),
+        app.run_blocking(calculate_sha1, v1),
+        app.run_blocking(calculate_sha1, v3),
+    )
+    render = JacketRender(
+        source_hash=source_hash,
+        compress_level=compress_level,
+        jacket_hash=jacket_hash,
+        v1_hash=v1_hash,
+        v3_hash=v3_hash,
+    )
+    # only used once the files are registered in blobs
+    async with app.db_acquire() as conn:
+        await conn.execute(jacket_renders.add_jacket_render(render))
+
+    return render, (v1, v3, jacket_bytes)
@@ -0,0 +1,82 @@
+from decimal import Decimal, ROUND_FLOOR, ROUND_HALF_UP
+from typing import Literal, NamedTuple, Optional, Union
+
+from helpers.models import leaderboard_type
+
+# What each leaderboard_type ranks by. Metrics that aren't plain columns are
+# stored generated columns on leaderboards (see database_setup.py), each with
+# a (chart_id, metric, id) index, so a leaderboard page is an index scan.
+
+# speed is rounded down to 0.05 steps. Slower than 1x loses 0.4 outright,
+# every 0.05 above 1x adds 0.075 * 0.05
+SPEED_TIERS = 20
+SLOW_PENALTY = Decimal("0.4")
+FAST_BONUS = Decimal("0.075")
+
+
+class LeaderboardMetric(NamedTuple):
+    column: str
+    direction: Literal["ASC", "DESC"]
+
+
+METRICS: dict[leaderboard_type, LeaderboardMetric] = {
+    "arcade_score_speed": LeaderboardMetric("speed_score", "DESC"),
+    "accuracy_score": LeaderboardMetric("accuracy_score", "DESC"),
+    "arcade_score_no_speed": LeaderboardMetric("arcade_score", "DESC"),
+    "rank_match": LeaderboardMetric("rank_match_score", "DESC"),
+    "least_combo_breaks": LeaderboardMetric("combo_breaks", "ASC"),
+    "least_misses": LeaderboardMetric("nmiss", "ASC"),
+    "perfect": LeaderboardMetric("nperfect", "DESC"),
+}
+
+# same rules as speed_multiplier below, numeric all the way so both agree
+_SPEED_TIER_SQL = f"(FLOOR(speed::numeric * {SPEED_TIERS}) / {SPEED_TIERS})"
+SPEED_MULTIPLIER_SQL = f"""CASE
+        WHEN speed IS NULL THEN 1.0
+        WHEN {_SPEED_TIER_SQL} < 1.0 THEN {_SPEED_TIER_SQL} - {SLOW_PENALTY}
+        ELSE 1.0 + ({_SPEED_TIER_SQL} - 1.0) * {FAST_BONUS}
+    END"""
+
+# Changing one of these needs the column dropped first,
+# ADD COLUMN IF NOT EXISTS leaves an existing one as it is.
+GENERATED_COLUMNS = {
+    "speed_score": f"CAST(arcade_score * ({SPEED_MULTIPLIER_SQL}) AS INTEGER)",
+    "rank_match_score": "(3 * nperfect) + (2 * ngreat) + ngood",
+    "combo_breaks": "ngood + nmiss",
+}
+
+
+def speed_multiplier(speed: Optional[Union[float, Decimal]]) -> Decimal:
+    if speed is None:
+        return Decimal(1)
+
+    tier = (Decimal(str(speed)) * SPEED_TIERS).to_integral_value(ROUND_FLOOR)
+    tier /= SPEED_TIERS
+
+    if tier < 1:
+        return tier - SLOW_PENALTY
+    else:
+        return 1 + (tier - 1) * FAST_BONUS
+
+
+def speed_score(arcade_score: int, speed: Optional[Union[float, Decimal]]) -> int:
+    """The speed_score column, for scores not in the database yet."""
+    # CAST(numeric AS INTEGER) rounds half away from zero
+    return int(
+        (arcade_score * speed_multiplier(speed)).to_integral_value(ROUND_HALF_UP)
+    )
+
+
+def leaderboard_metrics_sql() -> str:
+    """Generated columns and indexes for every metric, for database_setup.py."""
+    statements = [
+        f"ALTER TABLE leaderboards ADD COLUMN IF NOT EXISTS {column} INTEGER "
+        f"GENERATED ALWAYS AS ({expression}) STORED;"
+        for column, expression in GENERATED_COLUMNS.items()
+    ]
+    statements += [
+        f"CREATE INDEX IF NOT EXISTS idx_leaderboards_chart_{metric.column} "
+        f"ON leaderboards(chart_id, {metric.column} {metric.direction}, id);"
+        for metric in METRICS.values()
+    ]
+    return "\n".join(statements)
@@ -7,13 +7,9 @@ from decimal import Decimal, ROUND_HALF_UP
 
 
 # trend models
-class ChartLikeTrend(BaseModel):
+class ChartTrend(BaseModel):
     day: date
     total_likes: int
-
-
-class ChartCommentTrend(BaseModel):
-    day: date
     total_comments: int
 
 
@@ -77,6 +73,8 @@ class ChartUploadData(BaseModel):
     # optional, can be False
     includes_background: bool = False
     includes_preview: bool = False
+    # send a notification once the upload has been processed
+    notify: bool = False
 
 
 class ChartStPickData(BaseModel):
@@ -153,6 +151,11 @@ class Account(PublicAccount):
         return v
 
 
+class SessionAccount(Account):
+    # expiry (epoch ms) of the session this account was looked up with
+    session_expires: int
+
+
 class Chart(BaseModel):
     # THIS IS FOR INCOMING API REQUESTS ONLY!
     id: str
@@ -176,6 +179,29 @@ class Count(BaseModel):
     total_count: int
 
 
+def coerce_rating(values: dict) -> dict:
+    """Ratings as ints where possible, else Decimals with 4 places."""
+    rating = values.get("rating")
+
+    if rating is None:
+        return values
+
+    if isinstance(rating, float):
+        rating = Decimal(str(rating))
+
+    if isinstance(rating, Decimal):
+        rating = rating.quantize(Decimal("0.0001"), rounding=ROUND_HALF_UP)
+        # Convert .0 to int
+        if rating == rating.to_integral():
+            rating = int(rating)
+
+    elif isinstance(rating, int):
+        rating = int(rating)
+
+    values["rating"] = rating
+    return values
+
+
 class ChartDBResponse(BaseModel):
     id: str
     rating: Union[int, Decimal]
@@ -203,30 +229,14 @@ class ChartDBResponse(BaseModel):
     chart_design: str
     is_first_publish: Optional[bool] = None  # only returned on update_status
     scheduled_publish: Optional[datetime]
+    # kept for cursor pagination, not part of list responses
+    log_like_score: Optional[float] = Field(default=None, exclude=True)
 
     model_config = {"json_encoders": {Decimal: float}}
 
     @model_validator(mode="before")
     def coerce_rating(cls, values):
-        rating = values.get("rating")
-
-        if rating is None:
-            return values
-
-        if isinstance(rating, float):
-            rating = Decimal(str(rating))
-
-        if isinstance(rating, Decimal):
-            rating = rating.quantize(Decimal("0.0001"), rounding=ROUND_HALF_UP)
-            # Convert .0 to int
-            if rating == rating.to_integral():
-                rating = int(rating)
-
-        elif isinstance(rating, int):
-            rating = int(rating)
-
-        values["rating"] = rating
-        return values
+        return coerce_rating(values)
 
 
 class ChartDBResponseLiked(ChartDBResponse):
@@ -241,6 +251,21 @@ class ChartByIDLiked(ChartByID):
     liked: bool
 
 
+class ChartVersion(BaseModel):
+    # what a chart's responses are built from, for ETags
+    id: str
+    author: str
+    status: Literal["UNLISTED", "PRIVATE", "PUBLIC"]
+    staff_pick: bool
+    like_count: int
+    comment_count: int
+    log_like_score: float
+    updated_at: datetime
+    liked: Optional[bool] = None
+    # the database's CURRENT_DATE, trends shift with it
+    today: date
+
+
 class CommentID(BaseModel):
     id: int
 
@@ -274,6 +299,42 @@ class DBID(BaseModel):
     id: str
 
 
+class Blob(BaseModel):
+    hash: str
+    size: Optional[int] = None
+    key: str
+
+
+class JacketRender(BaseModel):
+    source_hash: str
+    compress_level: int
+    jacket_hash: str
+    v1_hash: str
+    v3_hash: str
+    # blobs.key of each, set when read through get_jacket_render
+    jacket_key: Optional[str] = None
+    v1_key: Optional[str] = None
+    v3_key: Optional[str] = None
+
+
+class UploadJob(BaseModel):
+    id: str
+    chart_id: str
+    sonolus_id: str
+    status: Literal["queued", "processing", "done", "failed"]
+    data: str  # ChartUploadData json
+    files: List[str]
+    attempts: int
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+
+class RandomPoolEntry(BaseModel):
+    id: Union[str, int]
+    bucket: Optional[bool] = None
+
+
 class ChartConstantData(BaseModel):
     constant: Decimal
 
@@ -334,6 +395,18 @@ class LeaderboardRecordDBResponse(LeaderboardRecord):
     owner: bool | None = None
 
 
+class LeaderboardCount(Count):
+    # with total_count, changes whenever a record is added, replaced or
+    # removed, for the leaderboard's ETag
+    last_id: Optional[int] = None
+    public_chart: Optional[bool] = None
+
+
+class LeaderboardRank(BaseModel):
+    rank: int  # 1-based
+    total_count: int
+
+
 class Prefix(BaseModel):
     prefix: str
 
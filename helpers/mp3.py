@@ -0,0 +1,181 @@
+import mmap
+from typing import NamedTuple, Optional, Union
+
+# MPEG audio frame header scanning, enough to tell CBR from VBR without
+# spawning ffprobe. Works on anything indexable as bytes (bytes, mmap).
+
+# kbps, by (version is MPEG-1, layer), index 1-14 (0 is "free", 15 is invalid)
+_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Hz, by version bits (0: MPEG-2.5, 2: MPEG-2, 3: MPEG-1)
+_SAMPLE_RATES = {
+    0: (11025, 12000, 8000),
+    2: (22050, 24000, 16000),
+    3: (44100, 48000, 32000),
+}
+
+# same tolerance the ffprobe check used
+VBR_TOLERANCE = 0.05
+
+
+class FrameHeader(NamedTuple):
+    bitrate: int  # bps
+    sample_rate: int
+    samples: int  # per frame
+    length: int  # bytes, including the header
+    side_info: int  # layer III side info size, where Xing/Info sits after
+
+
+class Mp3Info(NamedTuple):
+    frames: int
+    duration: float  # seconds
+    min_bitrate: int
+    max_bitrate: int
+    average_bitrate: int
+    vbr_header: Optional[str]  # "Xing", "Info", "VBRI" or None
+
+    @property
+    def is_vbr(self) -> bool:
+        if self.vbr_header in ("Xing", "VBRI"):
+            return True
+        return (self.max_bitrate - self.min_bitrate) / self.min_bitrate > VBR_TOLERANCE
+
+
+def parse_frame_header(data, pos: int) -> Optional[FrameHeader]:
+    if pos + 4 > len(data):
+        return None
+    b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+    if data[pos] != 0xFF or b1 & 0xE0 != 0xE0:
+        return None
+
+    version = (b1 >> 3) & 0x03
+    layer = 4 - ((b1 >> 1) & 0x03)  # 1, 2, 3 (4 is reserved)
+    bitrate_index = b2 >> 4
+    sample_rate_index = (b2 >> 2) & 0x03
+    if version == 1 or layer == 4 or sample_rate_index == 3:
+        return None
+    if bitrate_index in (0, 15):
+        return None  # free format can't be sized from the header
+
+    mpeg1 = version == 3
+    bitrate = _BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+    padding = (b2 >> 1) & 0x01
+    mono = b3 >> 6 == 3
+
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if mpeg1 or layer == 2 else 576
+        length = samples // 8 * bitrate // sample_rate + padding
+
+    if mpeg1:
+        side_info = 17 if mono else 32
+    else:
+        side_info = 9 if mono else 17
+
+    return FrameHeader(bitrate, sample_rate, samples, length, side_info)
+
+
+def _skip_id3v2(data) -> int:
+    pos = 0
+    # there may be more than one
+    while pos + 10 <= len(data) and data[pos : pos + 3] == b"ID3":
+        size = 0
+        for byte in data[pos + 6 : pos + 10]:
+            size = (size << 7) | (byte & 0x7F)  # syncsafe
+        footer = 10 if data[pos + 5] & 0x10 else 0
+        pos += 10 + size + footer
+    return pos
+
+
+def _find_first_frame(data, pos: int) -> Optional[tuple[int, FrameHeader]]:
+    # a real frame is followed by another one, random 0xFFEx bytes usually aren't
+    end = len(data) - 4
+    while pos < end:
+        pos = data.find(b"\xff", pos)
+        if pos == -1:
+            return None
+        header = parse_frame_header(data, pos)
+        if header:
+            following = pos + header.length
+            if following + 4 > len(data) or parse_frame_header(data, following):
+                return pos, header
+        pos += 1
+    return None
+
+
+def _vbr_header(data, pos: int, header: FrameHeader) -> Optional[str]:
+    tag_pos = pos + 4 + header.side_info
+    tag = bytes(data[tag_pos : tag_pos + 4])
+    if tag in (b"Xing", b"Info"):
+        return tag.decode()
+    # VBRI always sits 32 bytes after the header
+    if bytes(data[pos + 36 : pos + 40]) == b"VBRI":
+        return "VBRI"
+    return None
+
+
+def scan_mp3(data: Union[bytes, mmap.mmap]) -> Optional[Mp3Info]:
+    """
+    Walk every frame header of an MP3 file. Returns None if no MPEG audio
+    frames can be found.
+
+    Stops at the first thing that isn't a frame (ID3v1/APE tags, garbage);
+    trailing junk doesn't change whether the audio is VBR.
+    """
+    first = _find_first_frame(data, _skip_id3v2(data))
+    if not first:
+        return None
+    pos, header = first
+
+    vbr_header = _vbr_header(data, pos, header)
+    if vbr_header:
+        # the tag frame holds no audio, ffprobe doesn't count it either
+        pos += header.length
+        header = parse_frame_header(data, pos)
+
+    frames = 0
+    audio_bytes = 0
+    duration = 0.0
+    min_bitrate = max_bitrate = header.bitrate if header else 0
+    while header and pos + header.length <= len(data):
+        frames += 1
+        audio_bytes += header.length
+        duration += header.samples / header.sample_rate
+        if header.bitrate < min_bitrate:
+            min_bitrate = header.bitrate
+        elif header.bitrate > max_bitrate:
+            max_bitrate = header.bitrate
+        pos += header.length
+        header = parse_frame_header(data, pos)
+
+    if not frames:
+        return None
+
+    return Mp3Info(
+        frames=frames,
+        duration=duration,
+        min_bitrate=min_bitrate,
+        max_bitrate=max_bitrate,
+        average_bitrate=int(audio_bytes * 8 / duration),
+        vbr_header=vbr_header,
+    )
+
+
+def scan_mp3_file(path: str) -> Optional[Mp3Info]:
+    """scan_mp3 over a memory map, the file is never read in full."""
+    with open(path, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            return None
+        with mapped:
+            return scan_mp3(mapped)
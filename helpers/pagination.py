@@ -0,0 +1,56 @@
+import base64, json
+from datetime import datetime
+from typing import Literal, Optional, Union
+
+from pydantic import BaseModel, ValidationError
+
+# sort_by -> column, for sorts that can be paged with a cursor.
+# every column here is NOT NULL (published_at is filtered to NOT NULL by the list query)
+CURSOR_SORT_COLUMNS = {
+    "created_at": "created_at",
+    "published_at": "published_at",
+    "likes": "like_count",
+    "comments": "comment_count",
+    "decaying_likes": "log_like_score",
+}
+
+
+class ChartListCursor(BaseModel):
+    sort_by: Literal[
+        "created_at", "published_at", "likes", "comments", "decaying_likes"
+    ]
+    sort_order: Literal["desc", "asc"]
+    # sort key of the row the cursor points at, then its id as tie-breaker.
+    # both None means "start from the first row"
+    value: Optional[Union[datetime, int, float]] = None
+    id: Optional[str] = None
+    # "next" = rows after the cursor row, "prev" = rows before it
+    direction: Literal["next", "prev"]
+
+
+def encode_cursor(cursor: ChartListCursor) -> str:
+    data = cursor.model_dump_json().encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> ChartListCursor:
+    """Raises ValueError on anything that isn't a cursor we produced."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        cursor = ChartListCursor.model_validate(data)
+    except (ValueError, ValidationError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor.") from e
+
+    if cursor.value is None or cursor.id is None:
+        raise ValueError("Invalid cursor.")
+
+    # json loses the int/float/datetime distinction, restore it per column
+    if cursor.sort_by in ("created_at", "published_at"):
+        if not isinstance(cursor.value, datetime):
+            raise ValueError("Invalid cursor.")
+    elif cursor.sort_by == "decaying_likes":
+        cursor.value = float(cursor.value)
+    elif not isinstance(cursor.value, int):
+        raise ValueError("Invalid cursor.")
+    return cursor
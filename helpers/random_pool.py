@@ -0,0 +1,105 @@
+import asyncio, random, time
+from typing import Any, Hashable, Optional, Sequence
+
+from database import DBConnWrapper
+from database.query import SelectQuery
+
+
+class RandomPool:
+    """
+    Per-worker snapshot of ids to draw random samples from.
+
+    Replaces ORDER BY RANDOM() (which sorts every candidate row) with an
+    O(k) draw from an in-memory id list, followed by a batch lookup of the
+    drawn ids. Rows are (id, bucket); buckets let one pool answer filtered
+    draws (eg. staff picks) without a second snapshot.
+
+    The snapshot is refreshed in the background once older than
+    refresh_interval seconds; only the very first load blocks a request.
+    Callers must re-check the hydrated rows, since anything may have changed
+    since the snapshot was taken.
+    """
+
+    def __init__(self, query: SelectQuery, refresh_interval: float = 60):
+        # query must return (id, bucket) rows
+        self.query = query
+        self.refresh_interval = refresh_interval
+
+        self._buckets: dict[Hashable, Sequence[Any]] = {}
+        self._loaded_at: Optional[float] = None
+        self._stale = False
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+        self.refreshes = 0
+        self.draws = 0
+
+    async def _load(self, app) -> None:
+        async with app.db_acquire() as conn:
+            conn: DBConnWrapper
+            # can be a lot of rows, skip per-row model validation
+            records = await conn.conn.fetch(self.query.sql, *self.query.args)
+
+        buckets: dict[Hashable, list] = {}
+        for record in records:
+            buckets.setdefault(record[1], []).append(record[0])
+
+        self._buckets = buckets
+        self._loaded_at = time.monotonic()
+        self._stale = False
+        self.refreshes += 1
+
+    async def _refresh(self, app) -> None:
+        async with self._lock:
+            await self._load(app)
+
+    async def _ensure_loaded(self, app) -> None:
+        if self._loaded_at is None:
+            # first use: every request waits on the same load
+            async with self._lock:
+                if self._loaded_at is None:
+                    await self._load(app)
+            return
+
+        expired = time.monotonic() - self._loaded_at > self.refresh_interval
+        if (expired or self._stale) and not (
+            self._refresh_task and not self._refresh_task.done()
+        ):
+            self._refresh_task = asyncio.create_task(self._refresh(app))
+
+    def mark_stale(self) -> None:
+        """Refresh on next use, without waiting for the interval."""
+        self._stale = True
+
+    async def sample(self, app, k: int, bucket: Optional[Hashable] = None) -> list:
+        """Draw up to k distinct ids, from one bucket or (None) all of them."""
+        await self._ensure_loaded(app)
+        self.draws += 1
+
+        if bucket is not None:
+            population = [self._buckets.get(bucket, [])]
+        else:
+            population = list(self._buckets.values())
+
+        total = sum(len(ids) for ids in population)
+        picks = []
+        # random.sample over a range is O(k), map indices back to buckets
+        for index in random.sample(range(total), min(k, total)):
+            for ids in population:
+                if index < len(ids):
+                    picks.append(ids[index])
+                    break
+                index -= len(ids)
+        return picks
+
+    def stats(self) -> dict:
+        return {
+            "size": sum(len(ids) for ids in self._buckets.values()),
+            "age": (
+                round(time.monotonic() - self._loaded_at, 1)
+                if self._loaded_at is not None
+                else None
+            ),
+            "refreshes": self.refreshes,
+            "draws": self.draws,
+        }
@@ -0,0 +1,42 @@
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+# datetimes, dates, UUIDs and enums are native to orjson, and come out the way
+# jsonable_encoder writes them
+_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any) -> Any:
+    # the few types orjson doesn't know, as jsonable_encoder would have them
+    if isinstance(obj, Decimal):
+        return int(obj) if obj.as_tuple().exponent >= 0 else float(obj)
+    if isinstance(obj, BaseModel):
+        # json mode, like jsonable_encoder: UTC as Z, the model's json_encoders
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def render_json(content: Any) -> bytes:
+    """Encode a response body now, e.g. to cache it and send it as is later."""
+    return orjson.dumps(content, default=_default, option=_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson. The app's default response class.
+
+    Routes still pass through jsonable_encoder when they return a dict;
+    returning FastJSONResponse(...) directly skips that walk too. bytes
+    content is taken as already encoded JSON (see render_json).
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            return bytes(content)
+        return render_json(content)
@@ -38,21 +38,31 @@ class Session:
 
     async def user(self) -> Account:
         if not self._user_fetched:
-            query = accounts.get_account_from_session(
-                self.session_data.user_id, self.auth, self.session_data.type
-            )
+            cache = self.app.session_cache
+            result = cache.get(self.auth, self.session_data.type)
+
+            if not result:
+                query = accounts.get_account_from_session(
+                    self.session_data.user_id,
+                    self.session_data.id,
+                    self.auth,
+                    self.session_data.type,
+                )
 
-            async with self.app.db_acquire() as conn:
-                result = await conn.fetchrow(query)
+                async with self.app.db_acquire() as conn:
+                    result = await conn.fetchrow(query)
 
-                if not result and self.enforce_auth:
-                    raise HTTPException(
-                        status_code=status.HTTP_401_UNAUTHORIZED,
-                        detail="Not logged in.",
-                    )
+                if result:
+                    cache.set(self.auth, self.session_data.type, result)
+
+            if not result and self.enforce_auth:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Not logged in.",
+                )
 
-                self._user = result
-                self._user_fetched = True
+            self._user = result
+            self._user_fetched = True
 
         return self._user
 
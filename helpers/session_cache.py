@@ -0,0 +1,115 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from helpers.models import SessionAccount
+
+
+class SessionCache:
+    """
+    Per-worker cache of verified sessions.
+
+    Maps (session key, session type) to the account row returned by
+    accounts.get_account_from_session, so repeated requests with the same
+    key skip the database. Entries never outlive the session itself and
+    are capped at max_ttl seconds.
+
+    Routes invalidate the account they change here; the change feed
+    (notify_account_change) does it on every other worker for any change to
+    the account row or a live session being deleted. max_ttl bounds what
+    both miss (the change feed off or reconnecting).
+    """
+
+    def __init__(self, max_ttl: float = 60, max_size: int = 10000):
+        self.max_ttl = max_ttl
+        self.max_size = max_size
+
+        # (session_key, session_type) -> (monotonic expiry, account)
+        self._entries: OrderedDict[tuple[str, str], tuple[float, SessionAccount]] = (
+            OrderedDict()
+        )
+        # sonolus_id -> cache keys, for invalidating every session of an account
+        self._by_account: dict[str, set[tuple[str, str]]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_ttl > 0 and self.max_size > 0
+
+    def get(self, session_key: str, session_type: str) -> Optional[SessionAccount]:
+        key = (session_key, session_type)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, account = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return account
+
+    def set(self, session_key: str, session_type: str, account: SessionAccount) -> None:
+        if not self.enabled:
+            return
+
+        # session_expires is epoch ms
+        ttl = min(self.max_ttl, account.session_expires / 1000 - time.time())
+        if ttl <= 0:
+            return
+
+        key = (session_key, session_type)
+        self._remove(key)
+        self._entries[key] = (time.monotonic() + ttl, account)
+        self._by_account.setdefault(account.sonolus_id, set()).add(key)
+
+        while len(self._entries) > self.max_size:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+
+    def invalidate_session(self, session_key: str, session_type: str) -> None:
+        if (session_key, session_type) in self._entries:
+            self._remove((session_key, session_type))
+            self.invalidations += 1
+
+    def invalidate_account(self, sonolus_id: str) -> None:
+        """Drop every cached session of an account (ban, staff change, delete...)."""
+        keys = self._by_account.pop(sonolus_id, None)
+        if not keys:
+            return
+        for key in keys:
+            self._entries.pop(key, None)
+        self.invalidations += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_account.clear()
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, key: tuple[str, str]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        sonolus_id = entry[1].sonolus_id
+        keys = self._by_account.get(sonolus_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_account[sonolus_id]
@@ -0,0 +1,257 @@
+from typing import Optional, TYPE_CHECKING
+
+import orjson
+
+from database import DBConnWrapper, accounts, charts
+from helpers.cache_backends import (
+    CacheBackend,
+    CacheBackendError,
+    MemoryBackend,
+    RespBackend,
+    SharedMemoryBackend,
+)
+from helpers.config_loader import ConfigTypeCache
+from helpers.models import ChartByID, PublicAccount
+from helpers.responses import render_json
+
+if TYPE_CHECKING:
+    from core import ChartFastAPI
+
+
+def chart_tag(chart_id: str) -> str:
+    return f"chart:{chart_id}"
+
+
+def account_tag(sonolus_id: str) -> str:
+    return f"account:{sonolus_id}"
+
+
+class SharedCache:
+    """
+    Hot reads (chart rows, public accounts) shared by every worker using the
+    same backend (see helpers.cache_backends), with tag invalidation.
+
+    Each entry is stored with the versions its tags had *before* the data was
+    read, so an invalidation racing the read leaves the entry stale rather
+    than caching old data as new: stamp(), read the database, set().
+    invalidate() from any worker (or worker.py) bumps the tags for all of
+    them. Routes invalidate what they change, the change feed
+    (helpers.change_feed) catches everything else within milliseconds; ttl
+    bounds what both miss (the listener reconnecting).
+
+    Backend errors count as misses, the database is always the fallback.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float = 60, namespace: str = "uc"):
+        self.backend = backend
+        self.ttl = ttl
+        self.namespace = namespace
+
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.errors = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_config(cls, config: ConfigTypeCache) -> "SharedCache":
+        kind = config.get("backend", "memory")
+        if kind == "memory":
+            backend = MemoryBackend(max_size=config.get("memory-size", 10000))
+        elif kind == "shm":
+            backend = SharedMemoryBackend(
+                path=config.get("shm-path", "/dev/shm/uc-chart-cache"),
+                buckets=config.get("shm-buckets", 4096),
+                slot_size=config.get("shm-slot-size", 4096),
+            )
+        elif kind == "resp":
+            backend = RespBackend(
+                url=config.get("resp-url", "redis://127.0.0.1:6379/0"),
+                pool_size=config.get("resp-pool-size", 4),
+                timeout=config.get("resp-timeout", 0.25),
+            )
+        else:
+            raise ValueError(f"Unknown cache backend: {kind}")
+        return cls(
+            backend,
+            ttl=config.get("ttl", 60),
+            namespace=config.get("namespace", "uc"),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    @property
+    def shared(self) -> bool:
+        return self.backend.shared
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _tag(self, tag: str) -> str:
+        return f"{self.namespace}:tag:{tag}"
+
+    async def stamp(self, tags: list[str]) -> Optional[dict[str, str]]:
+        """Current versions of tags, to set() an entry with later."""
+        if not self.enabled:
+            return None
+        try:
+            versions = await self.backend.versions([self._tag(tag) for tag in tags])
+        except CacheBackendError:
+            self.errors += 1
+            return None
+        return {tag: version.decode() for tag, version in zip(tags, versions)}
+
+    async def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        if not self.enabled or not keys:
+            return [None] * len(keys)
+        try:
+            raw = await self.backend.get_many([self._key(key) for key in keys])
+
+            # entry: JSON object of tag versions, newline, payload
+            entries = []
+            for value in raw:
+                if value is None:
+                    entries.append(None)
+                    continue
+                stamp, _, payload = bytes(value).partition(b"\n")
+                entries.append((orjson.loads(stamp), payload))
+
+            tags = list({tag for entry in entries if entry for tag in entry[0]})
+            current = dict(
+                zip(
+                    tags,
+                    await self.backend.versions([self._tag(tag) for tag in tags]),
+                )
+            )
+        except CacheBackendError:
+            self.errors += 1
+            return [None] * len(keys)
+
+        values = []
+        for entry in entries:
+            if entry is None:
+                self.misses += 1
+                values.append(None)
+            elif any(
+                current[tag].decode() != version for tag, version in entry[0].items()
+            ):
+                self.stale += 1
+                values.append(None)
+            else:
+                self.hits += 1
+                values.append(entry[1])
+        return values
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return (await self.get_many([key]))[0]
+
+    async def set_many(
+        self, entries: list[tuple[str, bytes, Optional[dict[str, str]]]]
+    ) -> None:
+        """(key, payload, stamp) each, stamp from stamp() before the read."""
+        # no stamp: the backend failed or caching is off
+        items = [
+            (self._key(key), orjson.dumps(stamp) + b"\n" + payload)
+            for key, payload, stamp in entries
+            if stamp is not None
+        ]
+        if not items:
+            return
+        try:
+            await self.backend.set_many(items, self.ttl)
+        except CacheBackendError:
+            self.errors += 1
+
+    async def set(
+        self, key: str, payload: bytes, stamp: Optional[dict[str, str]]
+    ) -> None:
+        await self.set_many([(key, payload, stamp)])
+
+    async def invalidate(self, *tags: str) -> None:
+        if not self.enabled or not tags:
+            return
+        self.invalidations += 1
+        try:
+            await self.backend.bump([self._tag(tag) for tag in tags])
+        except CacheBackendError:
+            # nothing else to do, ttl bounds how long it's served stale
+            self.errors += 1
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.stale
+        return {
+            "backend": self.backend.name,
+            **self.backend.stats(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "errors": self.errors,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+async def cached_chart(app: "ChartFastAPI", chart_id: str) -> Optional[ChartByID]:
+    """
+    get_chart_by_id without the caller's like, shared between workers.
+    Invalidated with chart_tag(chart_id) by everything changing the chart,
+    its likes or its comments.
+    """
+    cache = app.cache
+    payload = await cache.get(chart_tag(chart_id))
+    if payload is not None:
+        return ChartByID.model_validate(orjson.loads(payload))
+
+    stamp = await cache.stamp([chart_tag(chart_id)])
+    async with app.db_acquire() as conn:
+        chart = await conn.fetchrow(charts.get_chart_by_id(chart_id))
+    if chart is not None:
+        await cache.set(chart_tag(chart_id), render_json(chart), stamp)
+    return chart
+
+
+async def cached_public_accounts(
+    app: "ChartFastAPI",
+    sonolus_ids: list[str],
+    conn: Optional[DBConnWrapper] = None,
+) -> dict[str, PublicAccount]:
+    """
+    get_public_account_batch by sonolus_id, only the misses go to the
+    database (on conn, or a connection taken only if something missed).
+    """
+    sonolus_ids = list(set(sonolus_ids))
+    if not sonolus_ids:
+        return {}
+
+    cache = app.cache
+    tags = [account_tag(sonolus_id) for sonolus_id in sonolus_ids]
+    found = {}
+    missing = []
+    for sonolus_id, payload in zip(sonolus_ids, await cache.get_many(tags)):
+        if payload is None:
+            missing.append(sonolus_id)
+        else:
+            found[sonolus_id] = PublicAccount.model_validate(orjson.loads(payload))
+    if not missing:
+        return found
+
+    stamp = await cache.stamp([account_tag(sonolus_id) for sonolus_id in missing])
+    query = accounts.get_public_account_batch(missing)
+    if conn is None:
+        async with app.db_acquire() as conn:
+            rows = await conn.fetch(query)
+    else:
+        rows = await conn.fetch(query)
+
+    entries = []
+    for account in rows:
+        found[account.sonolus_id] = account
+        tag = account_tag(account.sonolus_id)
+        entries.append((tag, render_json(account), stamp and {tag: stamp[tag]}))
+    await cache.set_many(entries)
+    return found
@@ -0,0 +1,25 @@
+from typing import List
+
+# windows chart_daily_stats is read for, in days
+TREND_WINDOWS = (7, 30, 90)
+
+
+def scale_trend(values: List[int]) -> List[int]:
+    """
+    Scale a list of cumulative totals into integers 1-100.
+    Day 1 maps to 1, last day maps to 100 (or less if flat).
+    """
+    if not values:
+        return [1] * 7  # fallback if empty
+
+    min_val = min(values)
+    max_val = max(values)
+
+    if max_val == min_val:
+        # All values equal → return all 1s
+        return [1] * len(values)
+
+    scaled = [
+        max(1, int(round(1 + 99 * (v - min_val) / (max_val - min_val)))) for v in values
+    ]
+    return scaled
@@ -0,0 +1,305 @@
+import asyncio
+import traceback
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+from core import ChartFastAPI
+from database import DBConnWrapper, accounts, charts, upload_jobs
+from helpers.models import Chart, ChartUploadData, UploadJob
+from helpers.hashing import calculate_sha1
+from helpers.chart_conversion import convert_chart
+from helpers.jacket_renders import render_jacket
+from helpers.uploads import StagedFile, StagingArea
+from helpers.blob_store import put_chart_files
+
+# raw upload inputs live here until their job is finished
+JOB_FILES_PREFIX = "upload_jobs"
+
+# content type each input is stored with, and what the worker stages it as
+JOB_FILE_TYPES = {
+    "jacket": "application/octet-stream",
+    "chart": "application/octet-stream",
+    "audio": "audio/mpeg",
+    "preview": "audio/mpeg",
+    "background": "image/png",
+}
+
+
+def job_file_key(job_id: str, name: str) -> str:
+    return f"{JOB_FILES_PREFIX}/{job_id}/{name}"
+
+
+async def _delete_job_files(bucket, job: UploadJob) -> None:
+    """
+    Best effort: the job's outcome is already decided, a failed delete only
+    leaves its inputs under upload_jobs/ and must not retry or fail it.
+    """
+    try:
+        await bucket.delete_objects(
+            Delete={
+                "Objects": [{"Key": job_file_key(job.id, name)} for name in job.files]
+            }
+        )
+    except Exception:
+        print(f"[upload_jobs] {job.id}: couldn't delete job files")
+        traceback.print_exc()
+
+
+async def _still_claimed(app: ChartFastAPI, job: UploadJob) -> bool:
+    async with app.db_acquire() as conn:
+        result = await conn.execute(upload_jobs.touch_upload_job(job.id, job.attempts))
+    return result == "UPDATE 1"
+
+
+@asynccontextmanager
+async def keep_claimed(app: ChartFastAPI, job: UploadJob):
+    """
+    Touch the job every third of upload-job-timeout while processing it, or
+    a job slower than the timeout is claimed (and processed) again.
+    """
+    interval = app.config["server"].get("upload-job-timeout", 600) / 3
+
+    async def beat() -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if not await _still_claimed(app, job):
+                    print(f"[upload_jobs] {job.id}: claim lost")
+                    return
+            except Exception:
+                # db away, the next beat may get through before the timeout
+                traceback.print_exc()
+
+    task = asyncio.create_task(beat())
+    try:
+        yield
+    finally:
+        task.cancel()
+
+
+async def _delete_chart_files(
+    app: ChartFastAPI, bucket, job: UploadJob, keys: list[str]
+) -> None:
+    """
+    Best effort, after the chart row wasn't created: drop what was written
+    for it. Only while the job is still this claim's, otherwise whoever took
+    it over may have written (and committed) the same keys.
+    """
+    try:
+        if not await _still_claimed(app, job):
+            return
+        await bucket.delete_objects(Delete={"Objects": [{"Key": key} for key in keys]})
+    except Exception:
+        print(f"[upload_jobs] {job.id}: couldn't delete chart files")
+        traceback.print_exc()
+
+
+async def _notify(conn: DBConnWrapper, job: UploadJob, title: str, content: str):
+    if ChartUploadData.model_validate_json(job.data).notify:
+        await conn.execute(accounts.add_notification(job.sonolus_id, title, content))
+
+
+async def fail_upload_job(app: ChartFastAPI, job: UploadJob, error: str) -> None:
+    """Mark a job failed for good, drop its inputs and tell the uploader."""
+    async with app.s3_session_getter() as s3:
+        bucket = await s3.Bucket(app.s3_bucket)
+        await _delete_job_files(bucket, job)
+
+    async with app.db_acquire() as conn:
+        async with conn.conn.transaction():
+            result = await conn.execute(
+                upload_jobs.finish_upload_job(job.id, "failed", error)
+            )
+            # finished already, nothing to tell
+            if result == "UPDATE 1":
+                await _notify(conn, job, "Chart upload failed", error)
+
+
+async def _convert_chart(app: ChartFastAPI, chart_bytes_raw: bytes) -> bytes:
+    try:
+        return await app.run_cpu(convert_chart, chart_bytes_raw)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+async def process_upload_job(app: ChartFastAPI, job: UploadJob) -> None:
+    """
+    Everything the upload route used to do after reading the files: CBR
+    re-encode, jacket/background rendering (see render_jacket), chart
+    conversion, hashing, S3 writes and creating the chart row.
+
+    Raises HTTPException (< 500) for uploads that can never succeed, anything
+    else is worth retrying.
+    """
+    data = ChartUploadData.model_validate_json(job.data)
+    sonolus_id = job.sonolus_id
+    chart_id = job.chart_id
+
+    staging = StagingArea(app.executor)
+    try:
+        async with app.s3_session_getter() as s3:
+            bucket = await s3.Bucket(app.s3_bucket)
+
+            paths: dict[str, str] = {}
+
+            async def download(name: str) -> None:
+                paths[name] = staging.new_path()
+                await bucket.download_file(job_file_key(job.id, name), paths[name])
+
+            await asyncio.gather(*(download(name) for name in job.files))
+
+            jacket_bytes_original, chart_bytes_raw = await asyncio.gather(
+                app.run_blocking(_read, paths["jacket"]),
+                app.run_blocking(_read, paths["chart"]),
+            )
+            audio_staged: StagedFile = await app.run_blocking(
+                staging.add_file, paths["audio"], JOB_FILE_TYPES["audio"]
+            )
+            cbr_path = staging.new_path()
+            if await app.cbr_encoder.ensure_cbr_file(audio_staged.path, cbr_path):
+                audio_staged = await app.run_blocking(
+                    staging.add_file, cbr_path, "audio/mpeg"
+                )
+
+            preview_staged: Optional[StagedFile] = None
+            background_staged: Optional[StagedFile] = None
+            if "preview" in paths:
+                preview_staged = await app.run_blocking(
+                    staging.add_file, paths["preview"], JOB_FILE_TYPES["preview"]
+                )
+            if "background" in paths:
+                background_staged = await app.run_blocking(
+                    staging.add_file, paths["background"], JOB_FILE_TYPES["background"]
+                )
+
+            (render, rendered), chart_bytes = await asyncio.gather(
+                render_jacket(app, jacket_bytes_original),
+                _convert_chart(app, chart_bytes_raw),
+            )
+            # None: the same jacket was rendered before, copied within S3
+            v1, v3, jacket_bytes = rendered or (None, None, None)
+            jacket_hash = render.jacket_hash
+            v1_hash = render.v1_hash
+            v3_hash = render.v3_hash
+
+            # staged files were hashed while being written
+            chart_hash = await app.run_blocking(calculate_sha1, chart_bytes)
+            audio_hash = audio_staged.sha1
+            preview_hash = preview_staged.sha1 if preview_staged else None
+            background_hash = background_staged.sha1 if background_staged else None
+
+            s3_uploads = [
+                {
+                    "path": f"{sonolus_id}/{chart_id}/{v1_hash}",
+                    "hash": v1_hash,
+                    "bytes": v1,
+                    "content-type": "image/png",
+                },
+                {
+                    "path": f"{sonolus_id}/{chart_id}/{v3_hash}",
+                    "hash": v3_hash,
+                    "bytes": v3,
+                    "content-type": "image/png",
+                },
+                {
+                    "path": f"{sonolus_id}/{chart_id}/{jacket_hash}",
+                    "hash": jacket_hash,
+                    "bytes": jacket_bytes,
+                    "content-type": "image/png",
+                },
+                {
+                    "path": f"{sonolus_id}/{chart_id}/{chart_hash}",
+                    "hash": chart_hash,
+                    "bytes": chart_bytes,
+                    "content-type": "application/gzip",
+                },
+                {
+                    "path": f"{sonolus_id}/{chart_id}/{audio_hash}",
+                    "hash": audio_hash,
+                    "staged": audio_staged,
+                },
+            ]
+
+            if preview_staged:
+                s3_uploads.append(
+                    {
+                        "path": f"{sonolus_id}/{chart_id}/{preview_hash}",
+                        "hash": preview_hash,
+                        "staged": preview_staged,
+                    }
+                )
+
+            if background_staged:
+                s3_uploads.append(
+                    {
+                        "path": f"{sonolus_id}/{chart_id}/{background_hash}",
+                        "hash": background_hash,
+                        "staged": background_staged,
+                    }
+                )
+
+            try:
+                # a retried job writes the same keys again, check before copying
+                register_blobs = await put_chart_files(
+                    app, bucket, s3_uploads, check_existing=job.attempts > 1
+                )
+
+                query = charts.create_chart(
+                    chart=Chart(
+                        id=chart_id,
+                        author=sonolus_id,
+                        rating=data.rating,
+                        chart_author=data.author,
+                        title=data.title,
+                        artists=data.artists,
+                        jacket_file_hash=jacket_hash,
+                        music_file_hash=audio_hash,
+                        chart_file_hash=chart_hash,
+                        background_v1_file_hash=v1_hash,
+                        background_v3_file_hash=v3_hash,
+                        tags=data.tags or [],
+                        description=data.description,
+                        preview_file_hash=preview_hash,
+                        background_file_hash=background_hash,
+                    )
+                )
+
+                # chart and job state change together, so a retry never sees
+                # a chart that already exists
+                async with app.db_acquire() as conn:
+                    async with conn.conn.transaction():
+                        await conn.fetchrow(query)
+                        await conn.execute(register_blobs)
+                        result = await conn.execute(
+                            upload_jobs.finish_upload_job(job.id, "done")
+                        )
+                        if result != "UPDATE 1":
+                            # rolls back the chart too
+                            raise RuntimeError(
+                                f"upload job {job.id} is no longer processing"
+                            )
+                        await _notify(
+                            conn,
+                            job,
+                            "Chart upload processed",
+                            f'"{data.title}" is ready.',
+                        )
+            except Exception:
+                # the chart row doesn't exist, neither should its files
+                await _delete_chart_files(
+                    app, bucket, job, list({file["path"] for file in s3_uploads})
+                )
+                raise
+
+            await _delete_job_files(bucket, job)
+    finally:
+        staging.cleanup()
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
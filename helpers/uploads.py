@@ -0,0 +1,147 @@
+import asyncio, hashlib, os, tempfile
+from concurrent.futures import Executor
+from functools import partial
+from typing import BinaryIO, Literal, Optional
+
+from boto3.s3.transfer import TransferConfig
+from fastapi import HTTPException, Request, UploadFile, status
+
+from helpers.file_checks import check_magic, MAGIC_HEADER_SIZE
+
+CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+# S3 uploads from disk: multipart above 8 MB, a few parts in flight at once
+S3_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=4,
+)
+
+
+class StagedFile:
+    """A file on local disk with its sha1 and size already known."""
+
+    def __init__(self, path: str, sha1: str, size: int, content_type: str):
+        self.path = path
+        self.sha1 = sha1
+        self.size = size
+        self.content_type = content_type
+
+    def open(self) -> BinaryIO:
+        return open(self.path, "rb")
+
+    def read_bytes(self) -> bytes:
+        with self.open() as f:
+            return f.read()
+
+
+def _write_chunk(out: BinaryIO, sha1, chunk: bytes) -> None:
+    sha1.update(chunk)
+    out.write(chunk)
+
+
+class StagingArea:
+    """
+    Temp files staged during one request, removed once it is done.
+
+    Use through get_staging_area() as a route dependency. stage() writes on
+    `executor` (the app's thread pool, or the loop's default one), never on
+    the event loop.
+    """
+
+    def __init__(self, executor: Optional[Executor] = None):
+        self.paths: list[str] = []
+        self.executor = executor
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, partial(func, *args)
+        )
+
+    def new_path(self, suffix: str = "") -> str:
+        """Reserve a temp path that is removed with the staging area."""
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        os.close(fd)
+        self.paths.append(path)
+        return path
+
+    def add_file(self, path: str, content_type: str) -> StagedFile:
+        """Hash and track a file written by something else (eg. ffmpeg)."""
+        sha1 = hashlib.sha1()
+        size = 0
+        with open(path, "rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                sha1.update(chunk)
+                size += len(chunk)
+        if path not in self.paths:
+            self.paths.append(path)
+        return StagedFile(path, sha1.hexdigest(), size, content_type)
+
+    async def stage(
+        self,
+        file: UploadFile,
+        expected_type: Optional[Literal["image/png", "image", "audio/mpeg"]],
+        max_size: int,
+        content_type: Optional[str] = None,
+    ) -> StagedFile:
+        """
+        Copy an upload to disk in CHUNK_SIZE pieces, checking its magic bytes
+        on the first chunk and hashing as it goes. Stops at max_size, so the
+        client-reported size doesn't have to be trusted.
+        """
+        path = self.new_path()
+        sha1 = hashlib.sha1()
+        size = 0
+        header = b""
+
+        await file.seek(0)
+        out = await self._run(open, path, "wb")
+        try:
+            while chunk := await file.read(CHUNK_SIZE):
+                if len(header) < MAGIC_HEADER_SIZE:
+                    header += chunk[: MAGIC_HEADER_SIZE - len(header)]
+                    if expected_type and len(header) >= MAGIC_HEADER_SIZE:
+                        check_magic(header, expected_type)
+                size += len(chunk)
+                if size > max_size:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+                        detail="Uploaded files exceed file size limit.",
+                    )
+                await self._run(_write_chunk, out, sha1, chunk)
+        finally:
+            await self._run(out.close)
+
+        if expected_type and len(header) < MAGIC_HEADER_SIZE:
+            check_magic(header, expected_type)
+
+        return StagedFile(
+            path, sha1.hexdigest(), size, content_type or expected_type or ""
+        )
+
+    def cleanup(self) -> None:
+        for path in self.paths:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        self.paths.clear()
+
+
+async def get_staging_area(request: Request):
+    staging = StagingArea(request.app.executor)
+    try:
+        yield staging
+    finally:
+        staging.cleanup()
+
+
+async def upload_staged_file(bucket, staged: StagedFile, key: str) -> None:
+    """Stream a staged file from disk to S3 (multipart when large)."""
+    with staged.open() as f:
+        await bucket.upload_fileobj(
+            Fileobj=f,
+            Key=key,
+            ExtraArgs={"ContentType": staged.content_type},
+            Config=S3_TRANSFER_CONFIG,
+        )
@@ -1,4 +1,4 @@
-import re, datetime
+import asyncio, re, datetime, time, traceback
 
 import aiohttp
 from typing import Optional, List, Dict
@@ -114,6 +114,31 @@ def hex_to_decimal_color(hex_color: str) -> int:
     return int(hex_color, 16)
 
 
+def serialize_embed(embed_obj: WebhookEmbed) -> dict:
+    embed = {}
+
+    if embed_obj.title:
+        embed["title"] = embed_obj.title
+    if embed_obj.description:
+        embed["description"] = embed_obj.description
+    if embed_obj.fields:
+        embed["fields"] = embed_obj.fields
+    if embed_obj.footer_text:
+        embed["footer"] = {"text": embed_obj.footer_text}
+        if embed_obj.footer_icon_url:
+            embed["footer"]["icon_url"] = embed_obj.footer_icon_url
+    if embed_obj.timestamp:
+        embed["timestamp"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    if embed_obj.thumbnail_url:
+        embed["thumbnail"] = {"url": embed_obj.thumbnail_url}
+    if embed_obj.color:
+        embed["color"] = hex_to_decimal_color(embed_obj.color)
+
+    if embed == {}:
+        embed["title"] = "​"
+    return embed
+
+
 async def discord_send(
     url: str,
     embeds: List[WebhookEmbed],
@@ -121,41 +146,150 @@ async def discord_send(
     username: Optional[str] = None,
     content: Optional[str] = None,
 ) -> str:
-    serialized_embeds = []
-
-    for embed_obj in embeds:
-        embed = {}
-
-        if embed_obj.title:
-            embed["title"] = embed_obj.title
-        if embed_obj.description:
-            embed["description"] = embed_obj.description
-        if embed_obj.fields:
-            embed["fields"] = embed_obj.fields
-        if embed_obj.footer_text:
-            embed["footer"] = {"text": embed_obj.footer_text}
-            if embed_obj.footer_icon_url:
-                embed["footer"]["icon_url"] = embed_obj.footer_icon_url
-        if embed_obj.timestamp:
-            embed["timestamp"] = datetime.datetime.now(
-                datetime.timezone.utc
-            ).isoformat()
-        if embed_obj.thumbnail_url:
-            embed["thumbnail"] = {"url": embed_obj.thumbnail_url}
-        if embed_obj.color:
-            embed["color"] = hex_to_decimal_color(embed_obj.color)
-
-        if embed == {}:
-            embed["title"] = "​"
-        serialized_embeds.append(embed)
-
     payload = {
         "username": username,
         "avatar_url": avatar_url,
         "content": content,
-        "embeds": serialized_embeds,
+        "embeds": [serialize_embed(embed) for embed in embeds],
     }
 
     async with aiohttp.ClientSession() as session:
         async with session.post(url, json=payload) as response:
             return await response.text()
+
+
+class _QueuedMessage:
+    def __init__(self, message: WebhookMessage):
+        self.url = message.url
+        self.avatar_url = message.avatar_url
+        self.username = message.username
+        self.content = message.content
+        # serialized now, so embed timestamps are when it happened
+        self.embeds = [serialize_embed(embed) for embed in message.embeds]
+
+    def batch_key(self) -> tuple:
+        # messages with text content are sent on their own
+        if self.content:
+            return (id(self),)
+        return (self.url, self.avatar_url, self.username)
+
+
+class WebhookDispatcher:
+    """
+    Sends WebhookMessages from a background task, so routes don't wait on
+    Discord. Per worker.
+
+    - one aiohttp session, so connections are reused
+    - messages queued within COALESCE_DELAY of each other for the same
+      webhook are merged, up to MAX_EMBEDS embeds per POST (a message's
+      embeds are never split up)
+    - 429s wait for retry_after, and a webhook whose bucket is empty
+      (X-RateLimit-Remaining: 0) isn't posted to again before it resets
+    - network errors and 5xx are retried with backoff, then dropped
+    """
+
+    MAX_EMBEDS = 10
+    COALESCE_DELAY = 1.0
+    MAX_ATTEMPTS = 5
+
+    def __init__(self):
+        self._queue: asyncio.Queue[_QueuedMessage] = asyncio.Queue()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._task: Optional[asyncio.Task] = None
+        self._reset_at: Dict[str, float] = {}
+
+        self.sent = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15))
+        self._task = asyncio.create_task(self._run())
+
+    def enqueue(self, message: WebhookMessage) -> None:
+        """Queue a message, returns immediately."""
+        self._queue.put_nowait(_QueuedMessage(message))
+
+    async def close(self, timeout: float = 5) -> None:
+        """Flush what is queued (for up to timeout seconds), then stop."""
+        if not self._task:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._task.cancel()
+        await self._session.close()
+
+    def stats(self) -> dict:
+        return {"queued": self._queue.qsize(), "sent": self.sent, "failed": self.failed}
+
+    async def _run(self) -> None:
+        while True:
+            pending = [await self._queue.get()]
+            await asyncio.sleep(self.COALESCE_DELAY)
+            while not self._queue.empty():
+                pending.append(self._queue.get_nowait())
+
+            for batch in self._batches(pending):
+                try:
+                    await self._post(batch)
+                    self.sent += 1
+                except Exception:
+                    self.failed += 1
+                    traceback.print_exc()
+
+            for _ in pending:
+                self._queue.task_done()
+
+    def _batches(self, pending: List[_QueuedMessage]) -> List[List[_QueuedMessage]]:
+        groups: Dict[tuple, List[List[_QueuedMessage]]] = {}
+        for message in pending:
+            batches = groups.setdefault(message.batch_key(), [[]])
+            size = sum(len(queued.embeds) for queued in batches[-1])
+            if batches[-1] and size + len(message.embeds) > self.MAX_EMBEDS:
+                batches.append([])
+            batches[-1].append(message)
+        return [batch for batches in groups.values() for batch in batches]
+
+    async def _post(self, batch: List[_QueuedMessage]) -> None:
+        first = batch[0]
+        payload = {
+            "username": first.username,
+            "avatar_url": first.avatar_url,
+            "content": first.content,
+            "embeds": [embed for message in batch for embed in message.embeds],
+        }
+
+        for attempt in range(self.MAX_ATTEMPTS):
+            wait = self._reset_at.get(first.url, 0) - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            try:
+                async with self._session.post(first.url, json=payload) as response:
+                    if response.headers.get("X-RateLimit-Remaining") == "0":
+                        reset_after = response.headers.get("X-RateLimit-Reset-After")
+                        if reset_after:
+                            self._reset_at[first.url] = time.monotonic() + float(
+                                reset_after
+                            )
+
+                    if response.status == 429:
+                        retry_after = response.headers.get("Retry-After")
+                        if retry_after is None and response.content_type == (
+                            "application/json"
+                        ):
+                            retry_after = (await response.json()).get("retry_after")
+                        retry_after = float(retry_after or 1)
+                        self._reset_at[first.url] = time.monotonic() + retry_after
+                        continue
+                    if response.status < 500:
+                        # 4xx other than 429 won't get better by retrying
+                        response.raise_for_status()
+                        return
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                pass
+
+            await asyncio.sleep(2**attempt)
+
+        raise RuntimeError(f"Webhook gave up after {self.MAX_ATTEMPTS} attempts.")
@@ -0,0 +1,137 @@
+"""
+Time to turn representative response bodies into JSON bytes:
+  stock     jsonable_encoder + JSONResponse (FastAPI's default before)
+  default   jsonable_encoder + FastJSONResponse (routes returning dicts)
+  direct    FastJSONResponse returned by the route
+  bytes     FastJSONResponse with a body encoded earlier (render_json)
+
+Usage: python scripts/bench_json_rendering.py [iterations]
+  Run from the project root. No database needed, the rows are made up.
+"""
+
+import sys
+import timeit
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, ".")
+from database.hydration import hydrate
+from helpers.models import (
+    ChartByID,
+    ChartDBResponseLiked,
+    LeaderboardRecordDBResponse,
+    PublicAccount,
+)
+from helpers.responses import FastJSONResponse, render_json
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+now = datetime.now(timezone.utc)
+chart_row = {
+    "id": "0" * 32,
+    "title": "Some chart title",
+    "artists": "Some artists",
+    "description": "A description that is a few words long.",
+    "tags": ["tag1", "tag2"],
+    "author": "1" * 64,
+    "staff_pick": False,
+    "jacket_file_hash": "a" * 40,
+    "music_file_hash": "b" * 40,
+    "chart_file_hash": "c" * 40,
+    "preview_file_hash": None,
+    "background_file_hash": None,
+    "background_v3_file_hash": "d" * 40,
+    "background_v1_file_hash": "e" * 40,
+    "status": "PUBLIC",
+    "rating": Decimal("27.5000"),
+    "like_count": 12,
+    "comment_count": 3,
+    "created_at": now,
+    "published_at": now,
+    "updated_at": now,
+    "log_like_score": 1.25,
+    "author_full": "someone#1234",
+    "author_handle": 1234,
+    "chart_design": "someone",
+    "scheduled_publish": None,
+    "liked": True,
+}
+account = PublicAccount(
+    sonolus_id="1" * 64,
+    sonolus_handle=1234,
+    sonolus_username="someone",
+    profile_hash="f" * 40,
+    banner_hash=None,
+    description="About me",
+)
+record = LeaderboardRecordDBResponse(
+    id=1,
+    submitter="1" * 64,
+    replay_data_hash="a" * 40,
+    replay_config_hash="b" * 40,
+    chart_id="0" * 32,
+    created_at=now,
+    chart_prefix="someone/" + "0" * 32,
+    engine="engine",
+    grade="fullCombo",
+    nperfect=900,
+    ngreat=40,
+    ngood=3,
+    nmiss=0,
+    arcade_score=1050000,
+    accuracy_score=990000,
+    speed=1.1,
+    display_name="someone#1234",
+    public_chart=True,
+)
+chart = hydrate(ChartByID, chart_row)
+
+# what the routes return
+PAGES = {
+    "/charts/ (10 rows)": {
+        "pageCount": 12,
+        "data": [hydrate(ChartDBResponseLiked, chart_row).model_dump()] * 10,
+        "asset_base_url": "https://example.com",
+    },
+    "/charts/{id}/": {
+        "data": chart.model_dump(),
+        "asset_base_url": "https://example.com",
+        "owner": False,
+    },
+    "/charts/leaderboards/ (10)": {
+        "data": [
+            {
+                "data": record.model_dump(),
+                "chart": chart,
+                "submitter": account,
+                "asset_base_url": "https://example.com",
+            }
+        ]
+        * 10,
+        "pageCount": 3,
+    },
+}
+
+WAYS = {
+    "stock": lambda page: JSONResponse(jsonable_encoder(page)),
+    "default": lambda page: FastJSONResponse(jsonable_encoder(page)),
+    "direct": lambda page: FastJSONResponse(page),
+}
+
+
+def per_call(func) -> float:
+    return min(timeit.repeat(func, number=ITERATIONS, repeat=3)) / ITERATIONS * 1e6
+
+
+if __name__ == "__main__":
+    for name, page in PAGES.items():
+        encoded = render_json(page)
+        timings = {way: per_call(lambda: render(page)) for way, render in WAYS.items()}
+        timings["bytes"] = per_call(lambda: FastJSONResponse(encoded))
+        print(
+            f"{name:<28}"
+            + "  ".join(f"{way} {us:8.1f} us" for way, us in timings.items())
+        )
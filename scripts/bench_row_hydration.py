@@ -0,0 +1,70 @@
+"""
+Per-row cost of turning a chart list row into a model, validated vs built
+directly (database/hydration.py), and of dumping it back to a dict like the
+listing routes do.
+
+Usage: python scripts/bench_row_hydration.py [rows]
+  Run from the project root. No database needed, the row is made up.
+"""
+
+import sys
+import timeit
+from datetime import datetime, timezone
+from decimal import Decimal
+
+sys.path.insert(0, ".")
+from database.hydration import hydrate
+from helpers.models import ChartDBResponseLiked
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+now = datetime.now(timezone.utc)
+# what asyncpg returns for get_chart_list with a session
+row = {
+    "id": "0" * 32,
+    "title": "Some chart title",
+    "artists": "Some artists",
+    "description": "A description that is a few words long.",
+    "tags": ["tag1", "tag2"],
+    "author": "1" * 64,
+    "staff_pick": False,
+    "jacket_file_hash": "a" * 40,
+    "music_file_hash": "b" * 40,
+    "chart_file_hash": "c" * 40,
+    "preview_file_hash": None,
+    "background_file_hash": None,
+    "background_v3_file_hash": "d" * 40,
+    "background_v1_file_hash": "e" * 40,
+    "status": "PUBLIC",
+    "rating": Decimal("27.5000"),
+    "like_count": 12,
+    "comment_count": 3,
+    "created_at": now,
+    "published_at": now,
+    "updated_at": now,
+    "log_like_score": 1.25,
+    "author_full": "someone#1234",
+    "author_handle": 1234,
+    "chart_design": "someone",
+    "scheduled_publish": None,
+    "liked": True,
+}
+
+
+def per_row(func) -> float:
+    return min(timeit.repeat(func, number=ROWS, repeat=3)) / ROWS * 1e6
+
+
+if __name__ == "__main__":
+    assert (
+        hydrate(ChartDBResponseLiked, row, True).model_dump()
+        == hydrate(ChartDBResponseLiked, row, False).model_dump()
+    )
+    for name, validate in (("validated", True), ("trusted", False)):
+        model = hydrate(ChartDBResponseLiked, row, validate)
+        build = per_row(lambda: hydrate(ChartDBResponseLiked, row, validate))
+        dump = per_row(model.model_dump)
+        print(
+            f"{name:>9}: {build:.2f} us/row to build, "
+            f"{build + dump:.2f} us/row with model_dump"
+        )
@@ -63,3 +63,12 @@ try:
     print("Response:", response.json())
 except Exception:
     print("Raw response:", response.text)
+
+if response.status_code == 202:
+    # processed by worker.py, wait for it
+    status_response = requests.get(
+        f"http://127.0.0.1:39000/api/charts/{response.json()['id']}/upload_status/",
+        params={"wait": 30},
+        headers={"authorization": response.request.headers["authorization"]},
+    )
+    print("Upload status:", status_response.json())
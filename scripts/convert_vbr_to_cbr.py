@@ -23,14 +23,13 @@ import yaml
 import asyncio
 import asyncpg
 import aioboto3
-from concurrent.futures import ThreadPoolExecutor
 
 sys.path.insert(0, ".")
-from helpers.audio import ensure_cbr_mp3
+from helpers.audio import CbrEncoder
 from helpers.hashing import calculate_sha1
 
 CONCURRENCY = 8  # max charts processed in parallel
-WORKERS = 4  # ffmpeg subprocess pool size
+WORKERS = 4  # ffmpeg processes at once
 CHANGES_FILE = "scripts/vbr_changes.json"
 
 with open("config.yml", "r") as file:
@@ -39,11 +38,13 @@ with open("config.yml", "r") as file:
 DRY_RUN = "--dry-run" in sys.argv
 
 
-def convert_and_hash(audio_bytes: bytes) -> tuple[bytes, str | None]:
-    new_bytes = ensure_cbr_mp3(audio_bytes)
+async def convert_and_hash(
+    encoder: CbrEncoder, audio_bytes: bytes
+) -> tuple[bytes, str | None]:
+    new_bytes = await encoder.ensure_cbr(audio_bytes)
     if new_bytes is audio_bytes:
         return audio_bytes, None
-    return new_bytes, calculate_sha1(new_bytes)
+    return new_bytes, await asyncio.to_thread(calculate_sha1, new_bytes)
 
 
 def format_time(seconds: float) -> str:
@@ -79,7 +80,7 @@ def print_progress(counters, total: int, start_time: float):
 
 
 async def process_chart(
-    chart, bucket, pool, executor, semaphore, loop, counters, total, start_time, changes
+    chart, bucket, pool, encoder, semaphore, counters, total, start_time, changes
 ):
     async with semaphore:
         chart_id = chart["id"]
@@ -95,9 +96,7 @@ async def process_chart(
                 resp = await obj.get()
                 audio_bytes = await resp["Body"].read()
 
-                new_bytes, new_hash = await loop.run_in_executor(
-                    executor, convert_and_hash, audio_bytes
-                )
+                new_bytes, new_hash = await convert_and_hash(encoder, audio_bytes)
 
                 if new_hash is None:
                     counters["skipped"] += 1
@@ -168,9 +167,7 @@ async def process_chart(
         #         resp = await obj.get()
         #         preview_bytes = await resp["Body"].read()
         #
-        #         new_bytes, new_hash = await loop.run_in_executor(
-        #             executor, convert_and_hash, preview_bytes
-        #         )
+        #         new_bytes, new_hash = await convert_and_hash(encoder, preview_bytes)
         #
         #         if new_hash is None:
         #             pass
@@ -242,7 +239,7 @@ async def main():
     else:
         print()
 
-    loop = asyncio.get_event_loop()
+    encoder = CbrEncoder(concurrency=WORKERS)
     semaphore = asyncio.Semaphore(CONCURRENCY)
     start_time = time.time()
     changes = []
@@ -257,23 +254,21 @@ async def main():
     async with session.resource("s3", endpoint_url=s3_config["endpoint"]) as s3:
         bucket = await s3.Bucket(bucket_name)
 
-        with ThreadPoolExecutor(max_workers=WORKERS) as executor:
-            tasks = [
-                process_chart(
-                    chart,
-                    bucket,
-                    pool,
-                    executor,
-                    semaphore,
-                    loop,
-                    counters,
-                    total,
-                    start_time,
-                    changes,
-                )
-                for chart in charts
-            ]
-            await asyncio.gather(*tasks)
+        tasks = [
+            process_chart(
+                chart,
+                bucket,
+                pool,
+                encoder,
+                semaphore,
+                counters,
+                total,
+                start_time,
+                changes,
+            )
+            for chart in charts
+        ]
+        await asyncio.gather(*tasks)
 
     elapsed = time.time() - start_time
 
@@ -1,8 +1,12 @@
+import sys
 import asyncio
 
 import asyncpg
 import yaml
 
+sys.path.insert(0, ".")
+from helpers.leaderboard_metrics import leaderboard_metrics_sql
+
 with open("config.yml", "r") as f:
     config = yaml.load(f, yaml.Loader)
 
@@ -110,6 +114,15 @@ END $$;""",
     content TEXT,
     is_read BOOL DEFAULT false,
     created_at timestamp with time zone DEFAULT (CURRENT_TIMESTAMP AT TIME ZONE 'UTC')
+);""",
+        """CREATE TABLE IF NOT EXISTS chart_daily_stats (
+    chart_id TEXT NOT NULL REFERENCES charts(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    -- likes/comments that exist now and were made on that day,
+    -- kept by trg_update_like_count and trg_update_comment_count
+    likes INTEGER NOT NULL DEFAULT 0,
+    comments INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (chart_id, day)
 );""",
         """CREATE OR REPLACE FUNCTION update_comment_count()
 RETURNS TRIGGER AS $$
@@ -122,12 +135,21 @@ BEGIN
             SET comment_count = comment_count + 1
             WHERE id = NEW.chart_id;
 
+            INSERT INTO chart_daily_stats (chart_id, day, comments)
+            VALUES (NEW.chart_id, NEW.created_at::date, 1)
+            ON CONFLICT (chart_id, day) DO UPDATE
+            SET comments = chart_daily_stats.comments + 1;
+
         ELSIF TG_OP = 'DELETE' THEN
             -- decrement comment_count
             UPDATE charts
             SET comment_count = comment_count - 1
             WHERE id = OLD.chart_id;
 
+            UPDATE chart_daily_stats
+            SET comments = comments - 1
+            WHERE chart_id = OLD.chart_id AND day = OLD.created_at::date;
+
         END IF;
 
     END IF;
@@ -161,51 +183,96 @@ EXECUTE FUNCTION update_comment_count();""",
     speed DECIMAL,
     created_at timestamp with time zone DEFAULT (CURRENT_TIMESTAMP AT TIME ZONE 'UTC')
 );""",
+        # log_like_score = LN(1 + SUM(EXP(a * (like time - anchor)))) over a chart's
+        # likes, a = 1 / 7 days. Every chart shares the anchor, so ordering by it
+        # is ordering by decayed like count "now", and a like is added or
+        # removed with a single log-sum-exp step instead of a rescan.
+        # The 1 + keeps charts without likes at 0, below every liked chart.
+        """CREATE TABLE IF NOT EXISTS like_score_anchor (
+    id BOOL PRIMARY KEY DEFAULT TRUE CHECK (id),
+    anchor timestamp with time zone NOT NULL
+);
+INSERT INTO like_score_anchor (anchor) VALUES (CURRENT_TIMESTAMP) ON CONFLICT DO NOTHING;""",
+        """CREATE OR REPLACE FUNCTION exact_log_like_score(p_chart_id TEXT, p_anchor TIMESTAMPTZ)
+RETURNS DOUBLE PRECISION AS $$
+    -- full recompute, for verification and recovering from drift
+    WITH x AS (
+        SELECT EXTRACT(EPOCH FROM (cl.created_at - p_anchor)) / 604800.0 AS x
+        FROM chart_likes cl
+        WHERE cl.chart_id = p_chart_id
+    ), m AS (
+        SELECT GREATEST(0, COALESCE(MAX(x), 0)) AS m FROM x
+    )
+    SELECT m.m + LN(EXP(-m.m) + COALESCE((SELECT SUM(EXP(x.x - m.m)) FROM x), 0))
+    FROM m;
+$$ LANGUAGE sql STABLE;""",
+        """CREATE OR REPLACE FUNCTION rebase_like_scores(new_anchor TIMESTAMPTZ)
+RETURNS VOID AS $$
+DECLARE
+    old_anchor TIMESTAMPTZ;
+    d DOUBLE PRECISION;
+BEGIN
+    -- likes wait, so scores and anchor move together
+    LOCK TABLE chart_likes IN SHARE MODE;
+    SELECT anchor INTO old_anchor FROM like_score_anchor FOR UPDATE;
+    d := EXTRACT(EPOCH FROM (new_anchor - old_anchor)) / 604800.0;
+
+    -- LN(1 + (EXP(s) - 1) * EXP(-d)), without EXP(s)
+    UPDATE charts
+    SET log_like_score = GREATEST(
+        0,
+        (log_like_score - d)
+            + LN(EXP(d - log_like_score) + 1 - EXP(-log_like_score))
+    )
+    WHERE log_like_score > 0;
+
+    UPDATE like_score_anchor SET anchor = new_anchor;
+END;
+$$ LANGUAGE plpgsql;""",
         """CREATE OR REPLACE FUNCTION update_like_count()
 RETURNS TRIGGER AS $$
 DECLARE
-    a DOUBLE PRECISION := 1.0 / EXTRACT(EPOCH FROM INTERVAL '7 days');
-    tnow DOUBLE PRECISION := EXTRACT(EPOCH FROM NOW());
-    s DOUBLE PRECISION;
+    anchor_time TIMESTAMPTZ;
+    x DOUBLE PRECISION;
 BEGIN
     IF EXISTS (SELECT 1 FROM charts WHERE id = COALESCE(NEW.chart_id, OLD.chart_id)) THEN
 
-        IF TG_OP = 'INSERT' THEN
-            -- increment like_count
-            UPDATE charts
-            SET like_count = like_count + 1
-            WHERE id = NEW.chart_id;
+        SELECT anchor INTO anchor_time FROM like_score_anchor;
 
-            -- update log_like_score
-            SELECT COALESCE(
-                LN(
-                    1 + EXP(a * (EXTRACT(EPOCH FROM NEW.created_at) - tnow)) /
-                        EXP(COALESCE(c.log_like_score, 0))
-                ),
-                a * (EXTRACT(EPOCH FROM NEW.created_at) - tnow)
-            )
-            INTO s
-            FROM charts c
-            WHERE c.id = NEW.chart_id;
+        IF TG_OP = 'INSERT' THEN
+            x := EXTRACT(EPOCH FROM (NEW.created_at - anchor_time)) / 604800.0;
 
+            -- increment like_count, add the like to log_like_score
             UPDATE charts
-            SET log_like_score = COALESCE(log_like_score, 0) + s
+            SET like_count = like_count + 1,
+                log_like_score = GREATEST(log_like_score, x)
+                    + LN(1 + EXP(-ABS(log_like_score - x)))
             WHERE id = NEW.chart_id;
 
+            INSERT INTO chart_daily_stats (chart_id, day, likes)
+            VALUES (NEW.chart_id, NEW.created_at::date, 1)
+            ON CONFLICT (chart_id, day) DO UPDATE
+            SET likes = chart_daily_stats.likes + 1;
+
         ELSIF TG_OP = 'DELETE' THEN
-            -- decrement like_count
+            x := EXTRACT(EPOCH FROM (OLD.created_at - anchor_time)) / 604800.0;
+
+            -- decrement like_count, take the like back out of log_like_score.
+            -- x < log_like_score unless rounding drifted, recompute then
             UPDATE charts
-            SET like_count = like_count - 1
+            SET like_count = like_count - 1,
+                log_like_score = CASE
+                    WHEN like_count <= 1 THEN 0
+                    WHEN x < log_like_score - 1e-9 THEN GREATEST(
+                        0, log_like_score + LN(1 - EXP(x - log_like_score))
+                    )
+                    ELSE exact_log_like_score(OLD.chart_id, anchor_time)
+                END
             WHERE id = OLD.chart_id;
 
-            -- recalc log_like_score from remaining likes
-            UPDATE charts c
-            SET log_like_score = COALESCE((
-                SELECT LN(SUM(EXP(a * (EXTRACT(EPOCH FROM cl.created_at) - tnow))))
-                FROM chart_likes cl
-                WHERE cl.chart_id = OLD.chart_id
-            ), 0)
-            WHERE c.id = OLD.chart_id;
+            UPDATE chart_daily_stats
+            SET likes = likes - 1
+            WHERE chart_id = OLD.chart_id AND day = OLD.created_at::date;
 
         END IF;
 
@@ -220,7 +287,236 @@ DROP TRIGGER IF EXISTS trg_update_like_count ON chart_likes;
 CREATE TRIGGER trg_update_like_count
 AFTER INSERT OR DELETE ON chart_likes
 FOR EACH ROW
-EXECUTE FUNCTION update_like_count();""",
+EXECUTE FUNCTION update_like_count();
+
+-- scores from before the anchor existed don't share one, recompute them all
+UPDATE charts c
+SET log_like_score = exact_log_like_score(c.id, a.anchor)
+FROM like_score_anchor a
+WHERE ABS(c.log_like_score - exact_log_like_score(c.id, a.anchor)) > 1e-9;""",
+        """-- (re)sync chart_daily_stats; the like/comment triggers keep it current after this
+LOCK TABLE chart_likes, comments IN SHARE MODE;
+DELETE FROM chart_daily_stats;
+INSERT INTO chart_daily_stats (chart_id, day, likes, comments)
+SELECT chart_id, day, SUM(likes), SUM(comments)
+FROM (
+    SELECT chart_id, created_at::date AS day, COUNT(*) AS likes, 0 AS comments
+    FROM chart_likes
+    GROUP BY 1, 2
+    UNION ALL
+    SELECT chart_id, created_at::date AS day, 0 AS likes, COUNT(*) AS comments
+    FROM comments
+    WHERE chart_id IS NOT NULL
+    GROUP BY 1, 2
+) daily
+GROUP BY chart_id, day;""",
+        """CREATE TABLE IF NOT EXISTS chart_status_counts (
+    status chart_status NOT NULL,
+    staff_pick BOOL NOT NULL,
+    total BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (status, staff_pick)
+);
+
+CREATE OR REPLACE FUNCTION update_chart_status_counts()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+        AND OLD.status = NEW.status
+        AND COALESCE(OLD.staff_pick, FALSE) = COALESCE(NEW.staff_pick, FALSE) THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE chart_status_counts
+        SET total = total - 1
+        WHERE status = OLD.status AND staff_pick = COALESCE(OLD.staff_pick, FALSE);
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'INSERT') THEN
+        INSERT INTO chart_status_counts (status, staff_pick, total)
+        VALUES (NEW.status, COALESCE(NEW.staff_pick, FALSE), 1)
+        ON CONFLICT (status, staff_pick)
+        DO UPDATE SET total = chart_status_counts.total + 1;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_chart_status_counts ON charts;
+
+CREATE TRIGGER trg_chart_status_counts
+AFTER INSERT OR DELETE OR UPDATE OF status, staff_pick ON charts
+FOR EACH ROW
+EXECUTE FUNCTION update_chart_status_counts();
+
+-- (re)sync from charts; the trigger keeps it current after this
+LOCK TABLE charts IN SHARE MODE;
+INSERT INTO chart_status_counts (status, staff_pick, total)
+SELECT status, COALESCE(staff_pick, FALSE), COUNT(*)
+FROM charts
+GROUP BY 1, 2
+ON CONFLICT (status, staff_pick) DO UPDATE SET total = EXCLUDED.total;
+UPDATE chart_status_counts csc
+SET total = 0
+WHERE NOT EXISTS (
+    SELECT 1 FROM charts c
+    WHERE c.status = csc.status AND COALESCE(c.staff_pick, FALSE) = csc.staff_pick
+);""",
+        """CREATE TABLE IF NOT EXISTS chart_search (
+    chart_id TEXT PRIMARY KEY REFERENCES charts(id) ON DELETE CASCADE,
+    title TEXT,
+    artists TEXT,
+    description TEXT,
+    author_full TEXT, -- chart_author || '#' || sonolus_handle
+    document tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', COALESCE(title, '')), 'A') ||
+        setweight(to_tsvector('simple', COALESCE(artists, '')), 'B') ||
+        setweight(to_tsvector('simple', COALESCE(author_full, '')), 'B') ||
+        setweight(to_tsvector('simple', COALESCE(description, '')), 'C')
+    ) STORED,
+    -- newline separated so substring matches can't span two fields
+    search_text TEXT GENERATED ALWAYS AS (
+        LOWER(
+            COALESCE(title, '') || E'\\n' ||
+            COALESCE(artists, '') || E'\\n' ||
+            COALESCE(author_full, '') || E'\\n' ||
+            COALESCE(description, '')
+        )
+    ) STORED
+);
+
+CREATE INDEX IF NOT EXISTS idx_chart_search_document ON chart_search USING GIN (document);
+CREATE INDEX IF NOT EXISTS idx_chart_search_text_trgm ON chart_search USING GIN (search_text gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_chart_search_author_trgm ON chart_search USING GIN (LOWER(author_full) gin_trgm_ops);
+
+CREATE OR REPLACE FUNCTION sync_chart_search()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO chart_search (chart_id, title, artists, description, author_full)
+    SELECT NEW.id, NEW.title, NEW.artists, NEW.description,
+        NEW.chart_author || '#' || a.sonolus_handle
+    FROM accounts a
+    WHERE a.sonolus_id = NEW.author
+    ON CONFLICT (chart_id) DO UPDATE
+    SET title = EXCLUDED.title,
+        artists = EXCLUDED.artists,
+        description = EXCLUDED.description,
+        author_full = EXCLUDED.author_full;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_sync_chart_search ON charts;
+
+CREATE TRIGGER trg_sync_chart_search
+AFTER INSERT OR UPDATE OF title, artists, description, chart_author, author ON charts
+FOR EACH ROW
+EXECUTE FUNCTION sync_chart_search();
+
+CREATE OR REPLACE FUNCTION sync_chart_search_author()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE chart_search cs
+    SET author_full = c.chart_author || '#' || NEW.sonolus_handle
+    FROM charts c
+    WHERE c.author = NEW.sonolus_id AND cs.chart_id = c.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_sync_chart_search_author ON accounts;
+
+CREATE TRIGGER trg_sync_chart_search_author
+AFTER UPDATE OF sonolus_handle ON accounts
+FOR EACH ROW
+WHEN (OLD.sonolus_handle IS DISTINCT FROM NEW.sonolus_handle)
+EXECUTE FUNCTION sync_chart_search_author();
+
+-- backfill charts created before the trigger existed
+INSERT INTO chart_search (chart_id, title, artists, description, author_full)
+SELECT c.id, c.title, c.artists, c.description, c.chart_author || '#' || a.sonolus_handle
+FROM charts c
+JOIN accounts a ON c.author = a.sonolus_id
+ON CONFLICT (chart_id) DO NOTHING;""",
+        """CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY, -- sha1 of the file, same as the charts.*_file_hash columns
+    size BIGINT,
+    key TEXT NOT NULL -- an S3 key known to hold this blob, source for server-side copies
+);
+
+CREATE OR REPLACE FUNCTION chart_file_hashes(c charts)
+RETURNS TEXT[] AS $$
+    SELECT COALESCE(array_agg(DISTINCT h), '{}')
+    FROM unnest(ARRAY[
+        c.jacket_file_hash,
+        c.music_file_hash,
+        c.chart_file_hash,
+        c.preview_file_hash,
+        c.background_file_hash,
+        c.background_v1_file_hash,
+        c.background_v3_file_hash
+    ]) AS h
+    WHERE h IS NOT NULL;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- finds another chart still holding a released hash
+CREATE INDEX IF NOT EXISTS idx_charts_file_hashes
+    ON charts USING GIN (chart_file_hashes(charts));
+
+-- the chart's copy of a hash it lets go of is deleted from S3 along with it,
+-- so point the blob at another chart's copy, or forget it if none is left
+CREATE OR REPLACE FUNCTION forget_released_blobs()
+RETURNS TRIGGER AS $$
+DECLARE
+    new_hashes TEXT[] := '{}';
+    released TEXT;
+    holder TEXT;
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        new_hashes := chart_file_hashes(NEW);
+    END IF;
+
+    FOR released IN
+        SELECT hash FROM blobs
+        WHERE hash = ANY(chart_file_hashes(OLD))
+            AND NOT hash = ANY(new_hashes)
+            AND key = OLD.author || '/' || OLD.id || '/' || hash
+    LOOP
+        SELECT c.author || '/' || c.id || '/' || released INTO holder
+        FROM charts c
+        WHERE chart_file_hashes(c) @> ARRAY[released]
+            AND c.id <> OLD.id
+        LIMIT 1;
+
+        IF holder IS NULL THEN
+            DELETE FROM blobs WHERE hash = released;
+        ELSE
+            UPDATE blobs SET key = holder WHERE hash = released;
+        END IF;
+    END LOOP;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_forget_released_blobs ON charts;
+
+CREATE TRIGGER trg_forget_released_blobs
+AFTER DELETE OR UPDATE OF
+    jacket_file_hash, music_file_hash, chart_file_hash, preview_file_hash,
+    background_file_hash, background_v1_file_hash, background_v3_file_hash
+ON charts
+FOR EACH ROW
+EXECUTE FUNCTION forget_released_blobs();
+
+-- backfill charts created before blobs existed (sizes stay unknown)
+INSERT INTO blobs (hash, key)
+SELECT h, MIN(c.author || '/' || c.id || '/' || h)
+FROM charts c
+CROSS JOIN LATERAL unnest(chart_file_hashes(c)) AS h
+GROUP BY h
+ON CONFLICT (hash) DO NOTHING;""",
         """-- Scalar columns: B-Tree
 CREATE INDEX IF NOT EXISTS idx_charts_status ON charts(status);
 CREATE INDEX IF NOT EXISTS idx_charts_rating ON charts(rating);
@@ -250,7 +546,8 @@ CREATE INDEX IF NOT EXISTS idx_comments_chart_created ON comments(chart_id, crea
 -- Leaderboards
 CREATE INDEX IF NOT EXISTS idx_leaderboards_chart_id ON leaderboards(chart_id);
 CREATE INDEX IF NOT EXISTS idx_leaderboards_submitter ON leaderboards(submitter);
-CREATE INDEX IF NOT EXISTS idx_leaderboards_chart_score ON leaderboards(chart_id, arcade_score DESC);
+-- replaced by idx_leaderboards_chart_arcade_score, see below
+DROP INDEX IF EXISTS idx_leaderboards_chart_score;
 
 -- Accounts
 CREATE INDEX IF NOT EXISTS idx_accounts_handle ON accounts(sonolus_handle);
@@ -258,6 +555,8 @@ CREATE INDEX IF NOT EXISTS idx_accounts_handle ON accounts(sonolus_handle);
 -- Notifications
 CREATE INDEX IF NOT EXISTS idx_notifications_user_id ON notifications(user_id, created_at DESC);
 """,
+        # ranking metric columns and one index per leaderboard_type
+        leaderboard_metrics_sql(),
         """CREATE TABLE IF NOT EXISTS staff_actions (
     id SERIAL PRIMARY KEY,
     actor_id TEXT REFERENCES accounts(sonolus_id) ON DELETE SET NULL,
@@ -275,6 +574,149 @@ CREATE INDEX IF NOT EXISTS idx_staff_actions_created_at ON staff_actions(created
     expires_at timestamp with time zone DEFAULT ((CURRENT_TIMESTAMP + INTERVAL '6 minutes') AT TIME ZONE 'UTC')
 );
 CREATE INDEX IF NOT EXISTS idx_expires_at ON external_login_ids (expires_at);""",
+        """CREATE TABLE IF NOT EXISTS account_sessions (
+    id UUID PRIMARY KEY, -- "id" inside the signed session key
+    sonolus_id TEXT NOT NULL REFERENCES accounts(sonolus_id) ON DELETE CASCADE,
+    type TEXT NOT NULL CHECK (type IN ('game', 'external')),
+    session_key TEXT NOT NULL,
+    expires BIGINT NOT NULL, -- epoch ms
+    created_at timestamp with time zone DEFAULT (CURRENT_TIMESTAMP AT TIME ZONE 'UTC')
+);
+CREATE INDEX IF NOT EXISTS idx_account_sessions_account
+    ON account_sessions (sonolus_id, type, expires DESC);
+CREATE INDEX IF NOT EXISTS idx_account_sessions_expires ON account_sessions (expires);""",
+        """CREATE TABLE IF NOT EXISTS jacket_renders (
+    source_hash TEXT NOT NULL, -- sha1 of the jacket as uploaded
+    compress_level SMALLINT NOT NULL, -- server.png-compress-level it was rendered with
+    jacket_hash TEXT NOT NULL,
+    v1_hash TEXT NOT NULL,
+    v3_hash TEXT NOT NULL,
+    created_at timestamp with time zone DEFAULT (CURRENT_TIMESTAMP AT TIME ZONE 'UTC'),
+    PRIMARY KEY (source_hash, compress_level)
+);
+-- if the background generator changes, TRUNCATE jacket_renders""",
+        """CREATE TABLE IF NOT EXISTS upload_jobs (
+    id UUID PRIMARY KEY,
+    chart_id TEXT NOT NULL UNIQUE, -- reserved at upload, the chart row is created when done
+    sonolus_id TEXT NOT NULL REFERENCES accounts(sonolus_id) ON DELETE CASCADE,
+    status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'processing', 'done', 'failed')),
+    data JSONB NOT NULL, -- ChartUploadData
+    files TEXT[] NOT NULL, -- raw inputs, stored at upload_jobs/{id}/{name} until done
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    locked_at timestamp with time zone,
+    created_at timestamp with time zone DEFAULT (CURRENT_TIMESTAMP AT TIME ZONE 'UTC'),
+    finished_at timestamp with time zone
+);
+CREATE INDEX IF NOT EXISTS idx_upload_jobs_pending
+    ON upload_jobs (created_at) WHERE status IN ('queued', 'processing');""",
+        """CREATE OR REPLACE FUNCTION notify_chart_change()
+RETURNS TRIGGER AS $$
+DECLARE
+    row_data JSONB;
+    payload JSONB;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        row_data := to_jsonb(OLD);
+    ELSE
+        IF TG_OP = 'UPDATE' AND OLD IS NOT DISTINCT FROM NEW THEN
+            RETURN NULL;
+        END IF;
+        row_data := to_jsonb(NEW);
+    END IF;
+
+    -- TG_ARGV[0]: the column holding the chart id
+    payload := jsonb_build_object(
+        'table', TG_TABLE_NAME,
+        'op', TG_OP,
+        'chart_id', row_data ->> TG_ARGV[0]
+    );
+    -- charts: status and staff_pick, when new or changed (listings, list
+    -- counts and random pools depend on them)
+    IF TG_TABLE_NAME = 'charts' THEN
+        IF TG_OP <> 'UPDATE' OR OLD.status <> NEW.status THEN
+            payload := payload || jsonb_build_object('status', row_data -> 'status');
+        END IF;
+        IF TG_OP <> 'UPDATE' OR OLD.staff_pick IS DISTINCT FROM NEW.staff_pick THEN
+            payload := payload || jsonb_build_object(
+                'staff_pick', COALESCE(row_data -> 'staff_pick', 'false'::jsonb)
+            );
+        END IF;
+    END IF;
+
+    -- delivered on commit, identical payloads once per transaction
+    PERFORM pg_notify('chart_changes', payload::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_notify_chart_change ON charts;
+CREATE TRIGGER trg_notify_chart_change
+AFTER INSERT OR UPDATE OR DELETE ON charts
+FOR EACH ROW
+EXECUTE FUNCTION notify_chart_change('id');
+
+DROP TRIGGER IF EXISTS trg_notify_chart_change ON chart_likes;
+CREATE TRIGGER trg_notify_chart_change
+AFTER INSERT OR UPDATE OR DELETE ON chart_likes
+FOR EACH ROW
+EXECUTE FUNCTION notify_chart_change('chart_id');
+
+DROP TRIGGER IF EXISTS trg_notify_chart_change ON comments;
+CREATE TRIGGER trg_notify_chart_change
+AFTER INSERT OR UPDATE OR DELETE ON comments
+FOR EACH ROW
+EXECUTE FUNCTION notify_chart_change('chart_id');
+
+-- nothing cached depends on leaderboards
+DROP TRIGGER IF EXISTS trg_notify_chart_change ON leaderboards;
+
+-- same channel, for cached sessions and public accounts
+CREATE OR REPLACE FUNCTION notify_account_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD IS NOT DISTINCT FROM NEW THEN
+        RETURN NULL;
+    END IF;
+
+    PERFORM pg_notify('chart_changes', jsonb_build_object(
+        'table', TG_TABLE_NAME,
+        'op', TG_OP,
+        'sonolus_id', OLD.sonolus_id
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_notify_account_change ON accounts;
+CREATE TRIGGER trg_notify_account_change
+AFTER UPDATE OR DELETE ON accounts
+FOR EACH ROW
+EXECUTE FUNCTION notify_account_change();
+
+-- logout, eviction past MAX_SESSIONS_PER_TYPE. expired sessions aren't
+-- served from cache anyway
+DROP TRIGGER IF EXISTS trg_notify_account_change ON account_sessions;
+CREATE TRIGGER trg_notify_account_change
+AFTER DELETE ON account_sessions
+FOR EACH ROW
+WHEN (OLD.expires > EXTRACT(EPOCH FROM NOW()) * 1000)
+EXECUTE FUNCTION notify_account_change();""",
+        # """SELECT cron.schedule(
+        #     'delete_finished_upload_jobs',
+        #     '0 * * * *', -- every hour
+        #     $$DELETE FROM upload_jobs WHERE finished_at < CURRENT_TIMESTAMP - INTERVAL '7 days';$$
+        # );""",
+        # """SELECT cron.schedule(
+        #     'delete_expired_account_sessions',
+        #     '0 * * * *', -- every hour
+        #     'DELETE FROM account_sessions WHERE expires < EXTRACT(EPOCH FROM NOW()) * 1000;'
+        # );""",
+        # """SELECT cron.schedule(
+        #     'rebase_like_scores',
+        #     '0 4 1 * *', -- monthly, keeps log_like_score small
+        #     $$SELECT rebase_like_scores(CURRENT_TIMESTAMP - INTERVAL '7 days');$$
+        # );""",
         # """SELECT cron.schedule(
         #     'delete_expired_login_ids',
         #     '* * * * *', -- every minute
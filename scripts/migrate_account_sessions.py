@@ -0,0 +1,134 @@
+"""
+Copy live sessions from accounts.sonolus_sessions (JSONB slots) into the
+account_sessions table.
+
+Usage: python scripts/migrate_account_sessions.py
+  Run from the project root (needs config.yml), after database_setup.py
+  has created account_sessions.
+
+  Safe to run repeatedly; existing rows are left alone. Run it once before
+  deploying the new session code and once after, so sessions issued by old
+  workers in between are not lost.
+
+  --dry-run        Only count what would be copied.
+  --clear-legacy   After copying, set accounts.sonolus_sessions to NULL.
+                   Only use once no old workers are running.
+"""
+
+import sys
+import json
+import base64
+import uuid
+import time
+import asyncio
+import asyncpg
+import yaml
+
+BATCH_SIZE = 1000
+
+with open("config.yml", "r") as file:
+    config = yaml.safe_load(file)
+
+DRY_RUN = "--dry-run" in sys.argv
+CLEAR_LEGACY = "--clear-legacy" in sys.argv
+
+
+def session_id_from_key(session_key: str) -> str | None:
+    # keys are base64url(json).signature, the json carries the session uuid.
+    # signatures were checked when the key was issued, no need to redo it here
+    try:
+        encoded_data, _ = session_key.rsplit(".", 1)
+        data = json.loads(base64.urlsafe_b64decode(encoded_data).decode())
+        return str(uuid.UUID(data["id"]))
+    except Exception:
+        return None
+
+
+async def main():
+    psql = config["psql"]
+    pool = await asyncpg.create_pool(
+        host=psql["host"],
+        user=psql["user"],
+        database=psql["database"],
+        password=psql["password"],
+        port=psql["port"],
+        min_size=1,
+        max_size=2,
+        ssl="disable",
+    )
+
+    now_ms = int(time.time() * 1000)
+    counters = {"copied": 0, "expired": 0, "invalid": 0, "existing": 0}
+
+    async with pool.acquire() as conn:
+        accounts = await conn.fetch(
+            """
+            SELECT sonolus_id, sonolus_sessions
+            FROM accounts
+            WHERE sonolus_sessions IS NOT NULL;
+            """
+        )
+        print(f"{len(accounts)} accounts with legacy sessions")
+
+        rows = []
+        for account in accounts:
+            sessions = account["sonolus_sessions"]
+            if isinstance(sessions, str):
+                sessions = json.loads(sessions)
+            for session_type in ("game", "external"):
+                for slot in (sessions.get(session_type) or {}).values():
+                    if not slot or slot.get("expires", 0) <= now_ms:
+                        counters["expired"] += 1
+                        continue
+                    session_id = session_id_from_key(slot.get("session_key", ""))
+                    if not session_id:
+                        counters["invalid"] += 1
+                        continue
+                    rows.append(
+                        (
+                            session_id,
+                            account["sonolus_id"],
+                            session_type,
+                            slot["session_key"],
+                            int(slot["expires"]),
+                        )
+                    )
+
+        if DRY_RUN:
+            print(f"Would copy up to {len(rows)} sessions. {counters}")
+            await pool.close()
+            return
+
+        for i in range(0, len(rows), BATCH_SIZE):
+            batch = rows[i : i + BATCH_SIZE]
+            inserted = await conn.fetchval(
+                """
+                WITH ins AS (
+                    INSERT INTO account_sessions (id, sonolus_id, type, session_key, expires)
+                    SELECT * FROM unnest($1::uuid[], $2::text[], $3::text[], $4::text[], $5::bigint[])
+                    ON CONFLICT (id) DO NOTHING
+                    RETURNING 1
+                )
+                SELECT COUNT(*) FROM ins;
+                """,
+                [r[0] for r in batch],
+                [r[1] for r in batch],
+                [r[2] for r in batch],
+                [r[3] for r in batch],
+                [r[4] for r in batch],
+            )
+            counters["copied"] += inserted
+            counters["existing"] += len(batch) - inserted
+
+        if CLEAR_LEGACY:
+            result = await conn.execute(
+                "UPDATE accounts SET sonolus_sessions = NULL WHERE sonolus_sessions IS NOT NULL;"
+            )
+            print(f"Cleared legacy sessions: {result}")
+
+    await pool.close()
+    print(f"Done! {counters}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+"""
+A tiny in-memory Redis protocol server, for running the cache's resp backend
+(helpers/cache_backends.py) without a Redis install: local development, or
+checking several workers share entries and invalidations.
+
+Only what the backend sends: PING, AUTH, SELECT, GET, MGET, SET (EX, PX, NX),
+DEL, FLUSHALL, DBSIZE. One database, nothing persisted.
+
+Usage: python scripts/resp_stand_in.py [port]
+  Then in config.yml:
+    cache:
+      backend: resp
+      resp-url: "redis://127.0.0.1:6379/0"
+"""
+
+import asyncio
+import sys
+import time
+from typing import Optional
+
+PORT = int(sys.argv[1]) if len(sys.argv) > 1 else 6379
+
+# key -> (monotonic expiry or None, value)
+store: dict[bytes, tuple[Optional[float], bytes]] = {}
+
+
+def lookup(key: bytes) -> Optional[bytes]:
+    entry = store.get(key)
+    if entry is None:
+        return None
+    expires, value = entry
+    if expires is not None and expires <= time.monotonic():
+        del store[key]
+        return None
+    return value
+
+
+def bulk(value: Optional[bytes]) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def command_set(args: list[bytes]) -> bytes:
+    key, value, options = args[0], args[1], [a.upper() for a in args[2:]]
+    expires = None
+    if b"EX" in options:
+        expires = time.monotonic() + int(args[2 + options.index(b"EX") + 1])
+    if b"PX" in options:
+        expires = time.monotonic() + int(args[2 + options.index(b"PX") + 1]) / 1000
+    if b"NX" in options and lookup(key) is not None:
+        return b"$-1\r\n"
+    store[key] = (expires, value)
+    return b"+OK\r\n"
+
+
+def run(command: list[bytes]) -> bytes:
+    name, args = command[0].upper(), command[1:]
+    if name == b"PING":
+        return b"+PONG\r\n"
+    if name in (b"AUTH", b"SELECT"):
+        return b"+OK\r\n"
+    if name == b"GET":
+        return bulk(lookup(args[0]))
+    if name == b"MGET":
+        return b"*%d\r\n" % len(args) + b"".join(bulk(lookup(key)) for key in args)
+    if name == b"SET":
+        return command_set(args)
+    if name == b"DEL":
+        return b":%d\r\n" % sum(store.pop(key, None) is not None for key in args)
+    if name == b"FLUSHALL":
+        store.clear()
+        return b"+OK\r\n"
+    if name == b"DBSIZE":
+        return b":%d\r\n" % len(store)
+    return b"-ERR unknown command '%s'\r\n" % name
+
+
+async def read_command(reader: asyncio.StreamReader) -> list[bytes]:
+    line = await reader.readuntil(b"\r\n")
+    if not line.startswith(b"*"):
+        # inline command, e.g. from telnet
+        return line.split()
+    command = []
+    for _ in range(int(line[1:-2])):
+        length = int((await reader.readuntil(b"\r\n"))[1:-2])
+        command.append((await reader.readexactly(length + 2))[:-2])
+    return command
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while True:
+            command = await read_command(reader)
+            if command:
+                writer.write(run(command))
+                await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def main():
+    server = await asyncio.start_server(handle, "127.0.0.1", PORT)
+    print(f"RESP stand-in listening on 127.0.0.1:{PORT}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
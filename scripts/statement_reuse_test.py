@@ -0,0 +1,80 @@
+"""
+Run the same query shapes through DBConnWrapper in two db_acquire() style
+blocks on a one-connection pool, so the second block gets the connection the
+first one released, with its prepared statements.
+
+Usage: python scripts/statement_reuse_test.py
+  Run from the project root (needs config.yml). Only reads, any database
+  the config points at will do.
+"""
+
+import sys
+import asyncio
+import asyncpg
+import yaml
+from pydantic import BaseModel
+
+sys.path.insert(0, ".")
+
+from database import DBConnWrapper, StatementRegistry
+from database.query import SelectQuery, ExecutableQuery
+
+with open("config.yml", "r") as file:
+    config = yaml.safe_load(file)
+
+
+class Row(BaseModel):
+    n: int
+    label: str
+
+
+# same shape, formatted differently: one canonical text, one statement
+SHAPES = [
+    "SELECT $1::int AS n, $2::text AS label;",
+    """
+    SELECT $1::int AS n,
+        $2::text AS label -- comment
+    """,
+]
+
+
+async def main():
+    psql = config["psql"]
+    pool = await asyncpg.create_pool(
+        host=psql["host"],
+        user=psql["user"],
+        database=psql["database"],
+        password=psql["password"],
+        port=psql["port"],
+        min_size=1,
+        max_size=1,
+        ssl="disable",
+        statement_cache_size=psql.get("statement-cache-size", 256),
+    )
+    statements = StatementRegistry()
+
+    try:
+        for block in range(2):
+            async with pool.acquire() as conn:
+                db = DBConnWrapper(conn, statements)
+                for i, sql in enumerate(SHAPES):
+                    row = await db.fetchrow(SelectQuery(Row, sql, i, f"block {block}"))
+                    assert row == Row(n=i, label=f"block {block}"), row
+                    rows = await db.fetch(SelectQuery(Row, sql, i, "fetch"))
+                    assert rows == [Row(n=i, label="fetch")], rows
+                    status = await db.execute(ExecutableQuery(sql, i, "execute"))
+                    assert status == "SELECT 1", status
+            print(f"block {block}: OK")
+    finally:
+        await pool.close()
+
+    # one shape: prepared by the first query, reused by every other one,
+    # in the second block too
+    stats = statements.stats()
+    assert stats["prepared"] == 1, stats
+    assert stats["reused"] == 2 * len(SHAPES) * 3 - 1, stats
+    print(f"OK {stats}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+"""
+Compare charts.log_like_score, kept incrementally by the like trigger, with a
+full recompute from chart_likes (exact_log_like_score).
+
+Usage: python scripts/verify_like_scores.py
+  Run from the project root (needs config.yml), after database_setup.py
+  has created like_score_anchor and its functions.
+
+  --fix      Rewrite scores that drifted more than TOLERANCE.
+  --rebase   Move the anchor to 7 days ago first (what the monthly cron
+             job does), then verify.
+"""
+
+import sys
+import asyncio
+import asyncpg
+import yaml
+
+# scores are natural logs of decayed like counts, 1e-6 is far below a like
+TOLERANCE = 1e-6
+SHOW = 20
+
+with open("config.yml", "r") as file:
+    config = yaml.safe_load(file)
+
+FIX = "--fix" in sys.argv
+REBASE = "--rebase" in sys.argv
+
+
+async def main():
+    psql = config["psql"]
+    pool = await asyncpg.create_pool(
+        host=psql["host"],
+        user=psql["user"],
+        database=psql["database"],
+        password=psql["password"],
+        port=psql["port"],
+        min_size=1,
+        max_size=2,
+        ssl="disable",
+    )
+
+    async with pool.acquire() as conn:
+        if REBASE:
+            await conn.execute(
+                "SELECT rebase_like_scores(CURRENT_TIMESTAMP - INTERVAL '7 days');"
+            )
+            print("Rebased like scores")
+
+        anchor = await conn.fetchval("SELECT anchor FROM like_score_anchor;")
+        print(f"Anchor: {anchor}")
+
+        rows = await conn.fetch(
+            """
+            SELECT c.id, c.like_count, c.log_like_score AS stored,
+                exact_log_like_score(c.id, a.anchor) AS exact
+            FROM charts c, like_score_anchor a;
+            """
+        )
+        drifted = [r for r in rows if abs(r["stored"] - r["exact"]) > TOLERANCE]
+        max_diff = max((abs(r["stored"] - r["exact"]) for r in rows), default=0)
+        print(
+            f"{len(rows)} charts, {len(drifted)} drifted, max difference {max_diff:.3g}"
+        )
+
+        drifted.sort(key=lambda r: abs(r["stored"] - r["exact"]), reverse=True)
+        for r in drifted[:SHOW]:
+            print(
+                f"  {r['id']}: {r['like_count']} likes, "
+                f"stored {r['stored']:.9f}, exact {r['exact']:.9f}"
+            )
+
+        if FIX and drifted:
+            result = await conn.execute(
+                """
+                UPDATE charts c
+                SET log_like_score = exact_log_like_score(c.id, a.anchor)
+                FROM like_score_anchor a
+                WHERE c.id = ANY($1::text[]);
+                """,
+                [r["id"] for r in drifted],
+            )
+            print(f"Fixed: {result}")
+
+    await pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,5 +1,6 @@
 from .helper import *
 from json import dumps
+import requests
 from requests import Response
 
 test = Test()
@@ -205,6 +206,21 @@ def upload_chart():
     yield response.json()["id"]
 
 
+@test.route(
+    "/charts/{id}/upload_status/",
+    "GET",
+    dependencies=[
+        After(external_auth, use_for_auth=True),
+        After(upload_chart, value="id"),
+    ],
+)
+def upload_status(id: str):
+    # routes below need the chart, which exists once worker.py is done
+    response: Response = yield Body(params={"wait": 30}, format_path={"id": id})
+    if response.json()["status"] != "done":
+        raise Exception(f"upload not processed: {response.json()}")
+
+
 @test.route(
     "/charts/{id}/edit/",
     "PATCH",
@@ -233,6 +249,23 @@ def get_chart(id: str):
         raise SkipRoute
 
 
+@test.route(
+    "/charts/{id}/overview/",
+    "GET",
+    dependencies=[
+        After(external_auth, use_for_auth=True),
+        After(upload_chart, value="id"),
+    ],
+)
+def get_chart_overview(id: str):
+    response: Response = yield Body(
+        params={"fields": "chart,comments,trends"}, format_path={"id": id}
+    )
+
+    assert response.json()["chart"]["data"]["id"] == id
+    assert "leaderboard" not in response.json()
+
+
 @test.route(
     "/charts/{id}/like/",
     "POST",
@@ -401,6 +434,81 @@ def get_public_leaderboards(lb_id: int):
     yield
 
 
+def upload_rival_replay(chart_id: str, sonolus_id: str, speed: float) -> None:
+    """Another account's record on the chart, ranked by speed against ours."""
+    headers = {config["server"]["auth-header"]: config["server"]["auth"]}
+    response = requests.post(
+        f"{test.url}/accounts/session/",
+        json={
+            "type": "game",
+            "id": sonolus_id,
+            "handle": "222222",
+            "name": sonolus_id,
+            "avatarType": "default",
+            "avatarForegroundType": "player",
+            "avatarForegroundColor": "#ffffffff",
+            "avatarBackgroundType": "default",
+            "avatarBackgroundColor": "#000020ff",
+            "bannerType": "none",
+            "aboutMe": "hii",
+            "favorites": [],
+        },
+        headers=headers,
+    )
+    response.raise_for_status()
+
+    response = requests.post(
+        f"{test.url}/charts/{chart_id}/leaderboards/",
+        data={
+            "user_id": sonolus_id,
+            "display_name": f"{sonolus_id}#222222",
+            "engine_name": "NextRUSH_P",
+            "speed": speed,
+        },
+        files={
+            "replay_data": (
+                "replay_data",
+                open("assets/replay_data", "rb"),
+                "application/gzip",
+            ),
+            "replay_config": (
+                "replay_config",
+                open("assets/replay_config", "rb"),
+                "application/gzip",
+            ),
+        },
+        headers=headers,
+    )
+    response.raise_for_status()
+
+
+@test.route(
+    "/charts/{id}/leaderboards/around/",
+    "GET",
+    dependencies=[
+        After(game_auth, use_for_auth=True),
+        After(upload_chart, value="id"),
+        After(get_chart_leaderboards, value="lb_id"),
+    ],
+)
+def get_leaderboard_around(id: str, lb_id: int):
+    # same replay as ours (speed 1.1): faster ranks above, slower below
+    above, below = f"rival_above_{id[:8]}", f"rival_below_{id[:8]}"
+    upload_rival_replay(id, above, 1.5)
+    upload_rival_replay(id, below, 0.8)
+
+    response: Response = yield Body(params={"radius": 2}, format_path={"id": id})
+
+    data = response.json()
+    rows = data["data"]
+    assert data["rank"] == 2, data["rank"]
+    assert data["total"] == 3, data["total"]
+    assert [row["submitter"] for row in rows[::2]] == [above, below], rows
+    assert rows[1]["id"] == lb_id, rows
+    assert [row["rank"] for row in rows] == [1, 2, 3], rows
+    assert [row["owner"] for row in rows] == [False, True, False], rows
+
+
 @test.route(
     "/charts/{chart_id}/leaderboards/{lb_id}/",
     "DELETE",
@@ -0,0 +1,98 @@
+import asyncio, traceback
+
+from fastapi import HTTPException, status
+
+from core import ChartFastAPI
+from database import upload_jobs
+from helpers.config_loader import get_config
+from helpers.models import UploadJob
+from helpers.upload_jobs import fail_upload_job, keep_claimed, process_upload_job
+
+# Processes queued chart uploads (see helpers/upload_jobs.py).
+# Run as many of these as needed, next to or apart from the API: python worker.py
+
+
+async def handle_job(app: ChartFastAPI, job: UploadJob, max_attempts: int) -> None:
+    try:
+        async with keep_claimed(app, job):
+            await process_upload_job(app, job)
+        print(f"[upload_jobs] {job.id} done")
+        return
+    except HTTPException as e:
+        # the upload itself is bad, retrying won't help
+        if e.status_code < 500 and e.status_code != status.HTTP_429_TOO_MANY_REQUESTS:
+            print(f"[upload_jobs] {job.id} failed: {e.detail}")
+            await fail_upload_job(app, job, str(e.detail))
+            return
+        traceback.print_exc()
+    except Exception:
+        traceback.print_exc()
+
+    if job.attempts >= max_attempts:
+        await fail_upload_job(app, job, "Error while processing upload.")
+    else:
+        async with app.db_acquire() as conn:
+            await conn.execute(upload_jobs.requeue_upload_job(job.id))
+
+
+async def run_jobs(app: ChartFastAPI, wake: asyncio.Event) -> None:
+    server_config = app.config["server"]
+    poll_interval = server_config.get("upload-job-poll", 5)
+    lock_timeout = server_config.get("upload-job-timeout", 600)
+    max_attempts = server_config.get("upload-job-attempts", 3)
+
+    while True:
+        wake.clear()
+        try:
+            async with app.db_acquire() as conn:
+                job = await conn.fetchrow(
+                    upload_jobs.claim_upload_job(lock_timeout, max_attempts)
+                )
+                abandoned = (
+                    await conn.fetch(
+                        upload_jobs.claim_abandoned_upload_jobs(
+                            lock_timeout, max_attempts
+                        )
+                    )
+                    if not job
+                    else []
+                )
+            for abandoned_job in abandoned:
+                await fail_upload_job(
+                    app, abandoned_job, "Error while processing upload."
+                )
+        except Exception:
+            # db or s3 away, try again later
+            traceback.print_exc()
+            job = None
+
+        if job:
+            await handle_job(app, job, max_attempts)
+            continue
+
+        try:
+            await asyncio.wait_for(wake.wait(), poll_interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def main() -> None:
+    app = ChartFastAPI(config=get_config())
+    # nothing here reads the caches the change feed keeps fresh
+    await app.init(change_feed=False)
+
+    wake = asyncio.Event()
+    listener = await app.db.acquire()
+    await listener.add_listener("upload_jobs", lambda *args: wake.set())
+
+    concurrency = app.config["server"].get("upload-job-concurrency", 2)
+    print(f"[upload_jobs] worker started, {concurrency} jobs at a time")
+    try:
+        await asyncio.gather(*(run_jobs(app, wake) for _ in range(concurrency)))
+    finally:
+        await app.db.release(listener)
+        await app.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())